@@ -5,14 +5,17 @@
 
 import matplotlib.pyplot as plt
 import matplotlib.image as mpimg
-import pickle
 import sys
 
+sys.path.append('.')
+import taxisim
+taxisim.runner.check_requests()
+
 def long2x(long):
-    return int(10000*long + 740300)
+    return (10000*long + 740300).astype(int)
 
 def lat2y(lat):
-    return int(-13536.84*lat + 553386.1)
+    return (-13536.84*lat + 553386.1).astype(int)
 
 img = mpimg.imread('data/map.png')
 fig, ax = plt.subplots(figsize=(6, 8))
@@ -32,20 +35,18 @@ ax.set_xlabel('Longitude', fontweight='bold', labelpad=15)
 
 if 'pickups' in sys.argv:
     for day in range(1, 8):
-        with open(f"data/requests/2016-02-{day:02d}.pickle", 'rb') as file:
-            requests = pickle.load(file)
-        for request in requests:
-            x = long2x(request[2][1])
-            y = lat2y(request[2][0])
+        with taxisim.runner.open_requests(day) as requests:
+            columns = requests.arrays()
+            x = long2x(columns["src_long"])
+            y = lat2y(columns["src_lat"])
             ax.plot(x, y, 'g,')
 
 if 'dropoffs' in sys.argv:
     for day in range(1, 8):
-        with open(f"data/requests/2016-02-{day:02d}.pickle", 'rb') as file:
-            requests = pickle.load(file)
-        for request in requests:
-            x = long2x(request[3][1])
-            y = lat2y(request[3][0])
+        with taxisim.runner.open_requests(day) as requests:
+            columns = requests.arrays()
+            x = long2x(columns["dst_long"])
+            y = lat2y(columns["dst_lat"])
             ax.plot(x, y, 'C3,')
 
 plt.tight_layout()
@@ -24,16 +24,19 @@ colors2 = [
 with open(f"data/q-training-log-{num_runs}.pickle", 'rb') as file:
     log = pickle.load(file)
 
+# Training may have stopped early, before num_runs.
+last_run = max(log['runs'])
+
 # ----------------------------------------------------------------------------------------
 # Stacked area plot
 # ----------------------------------------------------------------------------------------
 
 sizedict = {size: [] for size in range(1, max_size + 1)}
-for run_num in range(0, num_runs + 1):
+for run_num in range(0, last_run + 1):
     for size in range(1, max_size + 1):
         sizedict[size].append(log['runs'][run_num]['sizes'].get(size, 0))
 
-x = range(0, num_runs + 1)
+x = range(0, last_run + 1)
 y = [sizedict[size] for size in range(1, max_size + 1)]
 labels = [str(size) for size in range(1, max_size + 1)]
 
@@ -53,7 +56,7 @@ if 'area' in sys.argv:
 # ----------------------------------------------------------------------------------------
 
 sizes = range(1, max_size + 1)
-counts = [log['runs'][num_runs]['sizes'].get(size, 0) for size in sizes]
+counts = [log['runs'][last_run]['sizes'].get(size, 0) for size in sizes]
 labels = [str(size) for size in sizes]
 
 if 'bars' in sys.argv:
@@ -70,8 +73,8 @@ if 'bars' in sys.argv:
 # ----------------------------------------------------------------------------------------
 
 
-runs = range(1, num_runs + 1)
-timeouts = [log['runs'][run_num]['timeout_percent'] for run_num in range(1, num_runs + 1)]
+runs = range(1, last_run + 1)
+timeouts = [log['runs'][run_num]['timeout_percent'] for run_num in range(1, last_run + 1)]
 
 if 'timeouts' in sys.argv:
     fig, ax = plt.subplots(figsize=(10, 5))
@@ -86,8 +89,8 @@ if 'timeouts' in sys.argv:
 # MWT
 # ----------------------------------------------------------------------------------------
 
-runs = range(1, num_runs + 1)
-times = [log['runs'][run_num]['mean_wait'] for run_num in range(1, num_runs + 1)]
+runs = range(1, last_run + 1)
+times = [log['runs'][run_num]['mean_wait'] for run_num in range(1, last_run + 1)]
 
 if 'mwt' in sys.argv:
     fig, ax = plt.subplots(figsize=(10, 5))
@@ -0,0 +1,39 @@
+#! /usr/bin/env python3
+# ----------------------------------------------------------------------------------------
+# This script converts the pickled lists of request tuples produced by older versions of
+# run_filter.py into columnar request files, i.e. data/requests/2016-02-DD.pickle becomes
+# data/requests/2016-02-DD.requests. Days with no pickle are skipped. Scripts that read
+# requests through runner.open_requests() also convert a day's pickle on first use.
+# ----------------------------------------------------------------------------------------
+
+import os
+import pickle
+import sys
+
+# -------- Settings -------- #
+input_dir = "data/requests"
+start_day = 1
+end_day = 29
+# -------------------------- #
+
+sys.path.append('.')
+import taxisim
+from taxisim import requestfile
+
+if start_day < 1 or end_day > 29:
+    sys.exit("Error: check your calender.")
+
+for day in range(start_day, end_day + 1):
+    filename = os.path.join(input_dir, f"2016-02-{day:02d}")
+    if not os.path.exists(filename + ".pickle"):
+        continue
+    num_requests = requestfile.convert_pickle(filename + ".pickle", filename + ".requests")
+
+    # Check the conversion by reading the file back.
+    with open(filename + ".pickle", 'rb') as file:
+        requests = pickle.load(file)
+    with taxisim.RequestFile(filename + ".requests") as converted:
+        expected = taxisim.utils.convert_requests(requests)
+        if len(converted) != len(expected) or list(converted) != expected:
+            sys.exit(f"Error: conversion check failed for {filename}.requests.")
+    print(f"Day {day:2d}: {num_requests} requests")
@@ -16,12 +16,12 @@ save_taxipaths = False
 
 sys.path.append('.')
 import taxisim
+taxisim.runner.check_requests()
 
 if day < 1 or day > 29:
     sys.exit("Error: check your calender.")
 
-with open(f"data/requests/2016-02-{day:02d}.pickle", 'rb') as file:
-    requests = pickle.load(file)
+requests = taxisim.runner.open_requests(day)
 
 taxis = taxisim.make_taxis(num_taxis, logging=save_taxipaths)
 
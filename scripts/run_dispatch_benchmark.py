@@ -0,0 +1,49 @@
+#! /usr/bin/env pypy3
+# ----------------------------------------------------------------------------------------
+# This script benchmarks dispatch in the congested ridesharing case: an undersized fleet
+# with ridesharing enabled, where the dispatch queue grows to thousands of groups and most
+# candidate taxis are dropoff taxis that have to pass the ridesharing check. The same
+# requests are run in tick mode and in event-driven mode from the same seed, and the time
+# and number of dispatch rounds are reported alongside the metrics. Set num_requests to
+# None to run the whole morning.
+# ----------------------------------------------------------------------------------------
+
+import datetime as dt
+import itertools
+import random
+import sys
+import time
+
+# -------- Settings -------- #
+day = 1
+num_taxis = 600
+num_requests = 6000
+enable_sharing = True
+seed = 0
+# -------------------------- #
+
+sys.path.append('.')
+import taxisim
+from taxisim import runner
+runner.check_requests()
+
+if day < 1 or day > 29:
+    sys.exit("Error: check your calender.")
+
+print(f"Dispatch Benchmark ({num_taxis} taxis, {num_requests} requests)")
+print("------------------------------------------------")
+
+for mode in ("tick", "event"):
+    random.seed(runner.get_day_seed(seed, day))
+    world = taxisim.World(ridesharing=enable_sharing, event_driven=(mode == "event"))
+    world.add_taxis(taxisim.make_taxis(num_taxis))
+    world.time = dt.datetime(2016, 2, day, 8)
+    with runner.open_requests(day) as requests:
+        world.add_requests(itertools.islice(requests, num_requests))
+        start = time.time()
+        world.run()
+        elapsed = time.time() - start
+    msg = f"{mode:5s}    Time: {elapsed:6.2f}s    Rounds: {world.num_rounds:4d}    "
+    msg += f"TO: {world.timeout_percent:6.2f}%    MW: {world.mean_wait_time:5.2f}    "
+    msg += f"MJ: {world.mean_journey_time:5.2f}"
+    print(msg)
@@ -0,0 +1,57 @@
+#! /usr/bin/env pypy3
+# ----------------------------------------------------------------------------------------
+# This script compares event-driven mode with tick mode on a sparse schedule: a thinned-out
+# morning of requests served by a fleet that spends most of its time idle or repositioning.
+# In tick mode every moving taxi is moved on every tick. In event-driven mode a taxi is only
+# moved when it enters a new zone or arrives, and dispatch scores candidates at their
+# current positions without moving them. The same requests are run in both modes from the
+# same seed and the time, the number of ticks stepped and the metrics are reported. Set
+# enable_repositioning to False to skip the random repositioning, in which case the two
+# modes should report the same metrics.
+# ----------------------------------------------------------------------------------------
+
+import datetime as dt
+import itertools
+import math
+import random
+import sys
+import time
+
+# -------- Settings -------- #
+day = 1
+num_taxis = 2000
+every_nth_request = 200
+enable_repositioning = True
+seed = 0
+# -------------------------- #
+
+sys.path.append('.')
+import taxisim
+from taxisim import params
+from taxisim import runner
+runner.check_requests()
+
+if day < 1 or day > 29:
+    sys.exit("Error: check your calender.")
+
+if not enable_repositioning:
+    params.MEAN_REPO_TIME = math.inf
+    params.derive()
+
+print(f"Event Benchmark ({num_taxis} taxis, every {every_nth_request}th request)")
+print("------------------------------------------------")
+
+for mode in ("tick", "event"):
+    random.seed(runner.get_day_seed(seed, day))
+    world = taxisim.World(event_driven=(mode == "event"))
+    world.add_taxis(taxisim.make_taxis(num_taxis))
+    world.time = dt.datetime(2016, 2, day, 8)
+    with runner.open_requests(day) as requests:
+        world.add_requests(itertools.islice(requests, 0, None, every_nth_request))
+        start = time.time()
+        world.run()
+        elapsed = time.time() - start
+    msg = f"{mode:5s}    Time: {elapsed:6.2f}s    Ticks: {world.num_rounds:4d}    "
+    msg += f"TO: {world.timeout_percent:6.2f}%    MW: {world.mean_wait_time:5.2f}    "
+    msg += f"MJ: {world.mean_journey_time:5.2f}"
+    print(msg)
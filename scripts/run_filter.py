@@ -1,89 +1,46 @@
 #! /usr/bin/env python3
 # ----------------------------------------------------------------------------------------
-# This script filters the raw New York taxi data, producing a pickled list of request
-# tuples for each day. Each request tuple has the form: (time, size, source, destination).
+# This script filters the raw New York taxi data, producing a request file for each day
+# containing a list of request tuples of the form: (time, size, source, destination). The
+# CSV file is split into chunks which are parsed and filtered in parallel worker processes.
+# Each input file is filtered into a cache keyed by a hash of its contents and the filter
+# settings, so re-running with unchanged inputs, or adding a new month, only filters the files
+# which haven't been filtered with the same settings before. The output directory's manifest
+# records the input files so other scripts can warn when their requests are out of date.
 # ----------------------------------------------------------------------------------------
 
-import datetime as dt
-import pickle
 import sys
 import itertools
-import os
 
 # -------- Settings -------- #
-input_file = "data/yellow_tripdata_2016-02.csv"
+input_files = ["data/yellow_tripdata_2016-02.csv"]
 output_dir = "requests"
+cache_dir = "data/cache"
+start_hour = 8
+end_hour = 12
+num_workers = None
 # -------------------------- #
 
 sys.path.append('.')
 import taxisim
-
-mean_speed = 0
-requests = {}
-num_requests = 0
-num_big_requests = 0
-max_request_size = 0
-sizes = {}
-zones = {}
-
-with open(input_file) as csvfile:
-    headers = csvfile.readline()
-    for line in csvfile:
-        elements = line.split(',')
-        if len(elements) != 19:
-            continue
-
-        try:
-            pu_time = dt.datetime.fromisoformat(elements[1])
-            do_time = dt.datetime.fromisoformat(elements[2])
-            size = int(elements[3])
-            pu_long = float(elements[5])
-            pu_lat = float(elements[6])
-            do_long = float(elements[9])
-            do_lat = float(elements[10])
-        except Exception as e:
-            print(e)
-            continue
-
-        if pu_time.year != 2016:
-            continue
-        if pu_time.month != 2:
-            continue
-        if pu_time.hour < 8 or pu_time.hour >= 12:
-            continue
-
-        duration = (do_time - pu_time).total_seconds()
-        if duration < 60 or duration > 3600:
-            continue
-
-        src_pos = (pu_lat, pu_long)
-        dst_pos = (do_lat, do_long)
-        if not taxisim.in_manhattan(src_pos):
-            continue
-        if not taxisim.in_manhattan(dst_pos):
-            continue
-
-        if size < 1 or size > 8:
-            continue
-        if size > 4:
-            num_big_requests += 1
-        if size > max_request_size:
-            max_request_size = size
-
-        num_requests += 1
-        distance = taxisim.distance(src_pos, dst_pos)
-        speed = distance / duration
-        mean_speed += (speed - mean_speed) / num_requests
-        sizes[size] = sizes.get(size, 0) + 1
-        zone = taxisim.utils.get_zone(src_pos)
-        zones[zone] = zones.get(zone, 0) + 1
-
-        requests.setdefault(pu_time.day, []).append(
-            (pu_time, size, src_pos, dst_pos)
-        )
-
-for day, reqlist in requests.items():
-    reqlist.sort(key=lambda req: req[0])
+from taxisim import dataset
+
+keys = []
+for input_file in input_files:
+    key, _ = dataset.build(
+        input_file,
+        settings={"start_hour": start_hour, "end_hour": end_hour},
+        workers=num_workers,
+        cache_dir=cache_dir,
+    )
+    keys.append(key)
+stats = dataset.export(keys, output_dir, cache_dir, input_files)
+num_requests = stats["num_requests"]
+num_big_requests = stats["num_big_requests"]
+max_request_size = stats["max_request_size"]
+mean_speed = stats["mean_speed"]
+sizes = stats["sizes"]
+zones = stats["zones"]
 
 print("\nMetadata\n--------")
 print(f"Total requests: {num_requests}")
@@ -99,15 +56,8 @@ for size, count in sorted(sizes.items()):
 
 print()
 print("Request Count By Day\n--------------------")
-for day in sorted(requests.keys()):
-    print(f"Day {day:2d}: {len(requests[day])} requests")
-
-if not os.path.isdir(output_dir):
-    os.makedirs(output_dir)
-
-for day, reqlist in requests.items():
-    with open(output_dir + f"/2016-02-{day:02d}.pickle", 'wb') as picklefile:
-        pickle.dump(reqlist, picklefile)
+for (year, month, day), count in sorted(stats["days"].items()):
+    print(f"{year}-{month:02d}-{day:02d}: {count} requests")
 
 zones_total = 0
 for zone in list(zones.keys()):
@@ -126,8 +76,10 @@ for zone, count in zones.items():
     weights.append(count/zones_total)
 
 cum_weights = list(itertools.accumulate(weights))
-with open(output_dir + "/locations.py", 'w') as locfile:
-    locfile.write(f"locations = {str(locations)}\n")
-    locfile.write(f"counts = {repr(counts)}\n")
-    locfile.write(f"weights = {repr(weights)}\n")
-    locfile.write(f"cum_weights = {repr(cum_weights)}\n")
+dataset.write_text(
+    output_dir + "/locations.py",
+    f"locations = {str(locations)}\n" +
+    f"counts = {repr(counts)}\n" +
+    f"weights = {repr(weights)}\n" +
+    f"cum_weights = {repr(cum_weights)}\n"
+)
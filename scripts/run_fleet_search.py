@@ -0,0 +1,52 @@
+#! /usr/bin/env pypy3
+# ----------------------------------------------------------------------------------------
+# This script searches for the smallest fleet that meets the service thresholds -- a
+# timeout rate of at most 0.5% and a mean wait of at most 5 minutes -- on every day in the
+# interval. Each candidate fleet runs the days in order and fails at the first day that
+# misses a threshold; a day is aborted as soon as its timeouts guarantee a miss.
+# ----------------------------------------------------------------------------------------
+
+import sys
+import time
+
+# -------- Settings -------- #
+start_day = 1
+end_day = 29
+enable_sharing = True
+taxi_size = 4
+start_taxis = 2000
+resolution = 50
+seed = 0
+# -------------------------- #
+
+sys.path.append('.')
+import taxisim
+from taxisim import runner, search
+runner.check_requests()
+
+if start_day < 1 or end_day > 29:
+    sys.exit("Error: check your calender.")
+
+days = runner.get_available_days(start_day, end_day)
+start_time = time.time()
+
+print(f"Searching fleet sizes, ridesharing = {enable_sharing}\n")
+
+result = None
+for num_taxis, passed, metrics in search.iter_search(
+    days, enable_sharing, start_taxis, resolution, seed=seed, taxi_size=taxi_size
+):
+    run_time = (time.time() - start_time) / 60
+    day = max(metrics)
+    stats = f"TO: {metrics[day]['timeouts']:.4f}%    MW: {metrics[day]['wait_time']:.2f}"
+    if passed:
+        result = num_taxis
+        outcome = "passed"
+    elif metrics[day]['aborted']:
+        outcome = f"failed day {day:2d} (aborted)"
+    else:
+        outcome = f"failed day {day:2d}"
+    print(f"[{run_time:.2f}m]    Taxis: {num_taxis:5d}    {outcome:24s}    {stats}")
+
+print(f"\nFleet size:  {result}")
+print(f"Sim time:    {(time.time() - start_time) / 60:.2f}m")
@@ -0,0 +1,56 @@
+#! /usr/bin/env pypy3
+# ----------------------------------------------------------------------------------------
+# This script runs a day up to the fork time, saves a snapshot of the world, then runs a
+# number of what-if continuations of the snapshot in parallel, one per variant. Each
+# variant can reseed the random number generator and override any direct parameter in
+# taxisim.params for the rest of the day.
+# ----------------------------------------------------------------------------------------
+
+import datetime as dt
+import random
+import sys
+import time
+
+# -------- Settings -------- #
+day = 1
+fork_hour = 10
+num_taxis = 3600
+enable_sharing = True
+snapshot_file = "snapshot.bin"
+variants = [
+    {"seed": 1},
+    {"seed": 2},
+    {"seed": 1, "params": {"TIMEOUT": 15}},
+    {"seed": 1, "params": {"RIDESHARE_MULTIPLIER": 1.2}},
+]
+num_workers = None
+seed = 0
+# -------------------------- #
+
+sys.path.append('.')
+import taxisim
+from taxisim import runner, snapshot
+runner.check_requests()
+
+if day < 1 or day > 29:
+    sys.exit("Error: check your calender.")
+
+start_time = time.time()
+random.seed(runner.get_day_seed(seed, day))
+
+world = taxisim.World(ridesharing=enable_sharing)
+world.add_taxis(taxisim.make_taxis(num_taxis))
+world.time = dt.datetime(2016, 2, day, 8)
+world.add_requests(runner.open_requests(day))
+world.run(until=dt.datetime(2016, 2, day, fork_hour))
+data = snapshot.dumps(world)
+with open(snapshot_file, 'wb') as file:
+    file.write(data)
+
+run_time = (time.time() - start_time) / 60
+print(f"[{run_time:.2f}m]    Snapshot at {world.time}    {world}\n")
+
+for index, metrics in snapshot.iter_forks(data, variants, num_workers):
+    run_time = (time.time() - start_time) / 60
+    stats = f"TO: {metrics['timeouts']:.4f}%    MW: {metrics['wait_time']:.2f}"
+    print(f"[{run_time:.2f}m]    Variant: {variants[index]}    {stats}")
@@ -0,0 +1,71 @@
+#! /usr/bin/env pypy3
+# ----------------------------------------------------------------------------------------
+# This script validates the planar geometry backend against the default spherical backend
+# over a full month of requests. For each day it reports the drift in trip distances
+# (source to destination) and in the midpoint positions interpolated along each trip.
+# ----------------------------------------------------------------------------------------
+
+import os
+import pickle
+import sys
+
+# -------- Settings -------- #
+start_day = 1
+end_day = 29
+# -------------------------- #
+
+sys.path.append('.')
+import taxisim
+from taxisim import utils
+
+if start_day < 1 or end_day > 29:
+    sys.exit("Error: check your calender.")
+
+s_distance, s_interpolate, _ = utils.geometries["spherical"]
+p_distance, p_interpolate, _ = utils.geometries["planar"]
+
+print("Day    Trips    Mean Dist    Mean Drift    Max Drift    Max Error    Max Midpoint")
+print("-----  -------  -----------  ------------  -----------  -----------  ------------")
+
+totals = [0, 0, 0, 0, 0, 0]
+for day in range(start_day, end_day + 1):
+    filename = f"data/requests/2016-02-{day:02d}.pickle"
+    if not os.path.exists(filename):
+        continue
+    with open(filename, 'rb') as file:
+        requests = pickle.load(file)
+
+    num_trips, sum_dist, sum_drift, max_drift, max_error, max_offset = 0, 0, 0, 0, 0, 0
+    for _, _, src_pos, dst_pos in requests:
+        s_dist = s_distance(src_pos, dst_pos)
+        if s_dist == 0:
+            continue
+        p_dist = p_distance(src_pos, dst_pos)
+        drift = (p_dist - s_dist) / s_dist
+        s_mid = s_interpolate(src_pos, dst_pos, s_dist / 2)
+        p_mid = p_interpolate(src_pos, dst_pos, p_dist / 2)
+        num_trips += 1
+        sum_dist += s_dist
+        sum_drift += drift
+        max_drift = max(max_drift, abs(drift))
+        max_error = max(max_error, abs(p_dist - s_dist))
+        max_offset = max(max_offset, s_distance(s_mid, p_mid))
+
+    msg = f"02-{day:02d}  {num_trips:7d}  {sum_dist/num_trips:9.1f}m  "
+    msg += f"{100*sum_drift/num_trips:11.5f}%  {100*max_drift:10.5f}%  "
+    msg += f"{max_error:10.3f}m  {max_offset:11.3f}m"
+    print(msg)
+
+    totals[0] += num_trips
+    totals[1] += sum_dist
+    totals[2] += sum_drift
+    totals[3] = max(totals[3], max_drift)
+    totals[4] = max(totals[4], max_error)
+    totals[5] = max(totals[5], max_offset)
+
+if totals[0]:
+    print()
+    msg = f"Month  {totals[0]:7d}  {totals[1]/totals[0]:9.1f}m  "
+    msg += f"{100*totals[2]/totals[0]:11.5f}%  {100*totals[3]:10.5f}%  "
+    msg += f"{totals[4]:10.3f}m  {totals[5]:11.3f}m"
+    print(msg)
@@ -1,10 +1,11 @@
 #! /usr/bin/env pypy3
 # ----------------------------------------------------------------------------------------
 # This script runs the simulation for one full month, or for any specified interval of
-# days within the month. No training takes place.
+# days within the month. No training takes place. Days are independent so they're run in
+# parallel, one per worker process; each day's random number generator is seeded from the
+# base seed and the day so results don't depend on the number of workers.
 # ----------------------------------------------------------------------------------------
 
-import datetime as dt
 import sys
 import pickle
 import time
@@ -15,59 +16,41 @@ end_day = 29
 num_taxis = 3600
 enable_sharing = True
 save_metrics = False
+num_workers = None
+seed = 0
 # -------------------------- #
 
 sys.path.append('.')
 import taxisim
+from taxisim import runner
+runner.check_requests()
 
 if start_day < 1 or end_day > 29:
     sys.exit("Error: check your calender.")
 
-max_timeout = 0
-max_wait = 0
 start_time = time.time()
-metrics = dict()
-
-requests = {}
-for day in range(start_day, end_day + 1):
-    filename = f"data/requests/2016-02-{day:02d}.pickle"
-    with open(filename, 'rb') as file:
-        requests[day] = pickle.load(file)
 
 if num_taxis == 'trained':
     with open("data/q-training-log-2000.pickle", 'rb') as file:
         logfile = pickle.load(file)
-    taxis = []
-    for size, count in logfile['runs'][2000]['sizes'].items():
-        taxis.extend(taxisim.make_taxis(count, size=size))
+    fleet = logfile['runs'][max(logfile['runs'])]['sizes']
 else:
-    taxis = taxisim.make_taxis(num_taxis)
+    fleet = {4: num_taxis}
 
-world = taxisim.World(ridesharing=enable_sharing)
-world.add_taxis(taxis)
+days = runner.get_available_days(start_day, end_day)
 
 print(f"Running month, {num_taxis} taxis, ridesharing = {enable_sharing}\n")
 
-for day in range(start_day, end_day + 1):
-    day_start = time.time()
-    world.time = dt.datetime(2016, 2, day, 8)
-    world.add_requests(requests[day])
-    world.reset_taxis()
-    world.reset_metrics()
-    world.run()
-    day_time = (time.time() - day_start) / 60
-    stats = f"TO: {world.timeout_percent:.4f}%    MW: {world.mean_wait_time:.2f}"
-    print(f"[{day_time:.2f}m]    Day: {day:2d}    {stats}")
-    if world.timeout_percent > max_timeout:
-        max_timeout = world.timeout_percent
-    if world.mean_wait_time > max_wait:
-        max_wait = world.mean_wait_time
-    metrics[day] = {
-        'timeouts': world.timeout_percent,
-        'wait_time': world.mean_wait_time,
-        'journey_time': world.mean_journey_time,
-    }
-
+metrics = dict()
+for day, day_metrics in runner.iter_days(days, fleet, enable_sharing, seed, num_workers):
+    run_time = (time.time() - start_time) / 60
+    stats = f"TO: {day_metrics['timeouts']:.4f}%    MW: {day_metrics['wait_time']:.2f}"
+    print(f"[{run_time:.2f}m]    Day: {day:2d}    {stats}")
+    metrics[day] = day_metrics
+metrics = {day: metrics[day] for day in sorted(metrics)}
+
+max_timeout = max((m['timeouts'] for m in metrics.values()), default=0)
+max_wait = max((m['wait_time'] for m in metrics.values()), default=0)
 sim_time = (time.time() - start_time) / 60
 
 print(f"\nMax timeout: {max_timeout:.2f}%")
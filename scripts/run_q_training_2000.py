@@ -1,8 +1,10 @@
 #! /usr/bin/env pypy3
 # ----------------------------------------------------------------------------------------
 # This script runs the Q-learning algorithm for 2,000 days. Training can be stopped at any
-# point by hitting Ctrl-C and restarted by running this script again. Data is collected in
-# a `training` directory.
+# point by hitting Ctrl-C and restarted by running this script again. Early stopping is
+# off by default. When enabled, exploration starts to decay as soon as the policy is stable
+# and training ends once the policy is stable again with exploration switched off, so the
+# log may end before the final run. Data is collected in a `training` directory.
 # ----------------------------------------------------------------------------------------
 
 import datetime as dt
@@ -18,12 +20,17 @@ max_runs = 2000
 num_taxis = 3600
 enable_sharing = True
 max_taxi_size = 16
+early_stopping = False
+convergence_window = 50
 # -------------------------- #
 
 
 sys.path.append('.')
 import taxisim
+from taxisim import learning
+from taxisim import checkpoint
 taxisim.params.MAXSIZE = max_taxi_size
+taxisim.runner.check_requests()
 
 
 class TrainingThread(threading.Thread):
@@ -31,21 +38,30 @@ class TrainingThread(threading.Thread):
     def run(self):
         requests = {}
         for day in range(1, 30):
-            with open(f"data/requests/2016-02-{day:02d}.pickle", 'rb') as file:
-                requests[day] = pickle.load(file)
+            requests[day] = taxisim.runner.open_requests(day)
 
         with open("training/log.pickle", 'rb') as file:
-            logdict = pickle.load(file)
+            logdict = checkpoint.read_log("training", pickle.load(file))
 
         run_num = logdict["run_count"]
-        with open(f"training/taxis-{run_num:04d}.pickle", 'rb') as file:
-            taxis = pickle.load(file)
+        if checkpoint.exists("training", run_num):
+            state = checkpoint.load("training", run_num)
+            q_tensor = learning.QTensor.from_state(state)
+        else:
+            # A training directory from before checkpoints, with pickled taxis.
+            state = None
+            q_tensor = learning.QTensor(checkpoint.load_taxis("training", run_num))
+        taxis = q_tensor.taxis
+        checkpointer = checkpoint.Checkpointer("training", base=state)
 
         logfile = open("training/log.txt", 'a');
 
         world = taxisim.World(ridesharing=enable_sharing)
         world.add_taxis(taxis)
 
+        monitor = learning.ConvergenceMonitor(convergence_window)
+        decay_start = 1000 if taxis[0].p_explore == 1 else min(1000, run_num)
+
         while run_num < max_runs:
             if self.halt:
                 break
@@ -64,26 +80,26 @@ class TrainingThread(threading.Thread):
             world.reset_taxis()
             world.add_requests(requests[day])
 
-            for taxi in taxis:
-                if run_num > 1000 and run_num <= 1500:
-                    taxi.p_explore -= delta_p
-                taxi.choose_action()
+            if run_num > decay_start and taxis[0].p_explore > 0:
+                for taxi in taxis:
+                    taxi.p_explore = max(taxi.p_explore - delta_p, 0)
+            q_tensor.choose_actions()
 
             world.run()
 
-            for taxi in taxis:
-                taxi.update_q_table()
+            q_tensor.update()
 
-            with open(f"training/taxis-{run_num:04d}.pickle", 'wb') as file:
-                pickle.dump(taxis, file)
-            print("* Taxis saved.")
+            sizes_array = [taxi.size for taxi in taxis]
+            changes = monitor.update(sizes_array, q_tensor.values, q_tensor.get_policy())
+            if 0 < taxis[0].p_explore < 1:
+                monitor.reset()
+            converged = early_stopping and monitor.converged
 
             sizes = {}
             for taxi in taxis:
                 sizes[taxi.size] = sizes.get(taxi.size, 0) + 1
 
-            logdict["run_count"] = run_num
-            logdict["runs"][run_num] = {
+            stats = {
                 "day": day,
                 "sizes": sizes,
                 "requests": world.num_requests,
@@ -93,10 +109,12 @@ class TrainingThread(threading.Thread):
                 "mean_pickup": world.mean_pickup_time,
                 "mean_wait": world.mean_wait_time,
             }
+            stats.update(changes or {})
+            logdict["run_count"] = run_num
+            logdict["runs"][run_num] = stats
 
-            with open("training/log.pickle", 'wb') as file:
-                pickle.dump(logdict, file)
-            print("* Pickled log saved.")
+            checkpointer.save(run_num, q_tensor.get_state(), stats)
+            print("* Checkpoint queued.")
             print(f"* Run {run_num} complete.\n")
 
             log(f"Sim time:  {(time.time() - start_time) / 60:.2f}m", logfile)
@@ -112,6 +130,18 @@ class TrainingThread(threading.Thread):
             log(f"\nSample taxi: [{data}]\n", logfile)
             log(taxi.q_table, logfile)
 
+            if converged and taxis[0].p_explore == 1:
+                log(f"\nPolicy stable: exploration decays from run {run_num + 1}.", logfile)
+                decay_start = run_num
+                monitor.reset()
+            elif converged:
+                log(f"\nPolicy stable: training stopped after run {run_num}.", logfile)
+                break
+
+        checkpointer.close()
+        with open("training/log.pickle", 'wb') as file:
+            pickle.dump(logdict, file)
+        print("* Checkpoints and pickled log saved.")
         logfile.close()
 
 
@@ -142,13 +172,14 @@ def init():
         os.mkdir("training")
 
     taxis = taxisim.make_taxis(num_taxis, size=4)
-    with open("training/taxis-0000.pickle", 'wb') as file:
-        pickle.dump(taxis, file)
 
     log = {
         "run_count": 0,
         "runs": {0: {"sizes": {4: num_taxis}}},
     }
+    with checkpoint.Checkpointer("training") as checkpointer:
+        checkpointer.save(0, learning.QTensor(taxis).get_state(), log["runs"][0])
+
     with open("training/log.pickle", 'wb') as file:
         pickle.dump(log, file)
 
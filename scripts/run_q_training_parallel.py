@@ -0,0 +1,154 @@
+#! /usr/bin/env pypy3
+# ----------------------------------------------------------------------------------------
+# This script runs the Q-learning algorithm for 2,000 days using a population of fleet
+# replicas that share their Q-values. Each round simulates one day per replica in parallel
+# worker processes, then applies each day's rewards in run order. The exploration schedule
+# follows run numbers so it matches `run_q_training_2000.py`. Training can be stopped at
+# any point by hitting Ctrl-C and restarted by running this script again. Data is
+# collected in a `training-parallel` directory.
+# ----------------------------------------------------------------------------------------
+
+import pickle
+import os
+import threading
+import time
+import sys
+
+
+# -------- Settings -------- #
+max_runs = 2000
+num_taxis = 3600
+enable_sharing = True
+max_taxi_size = 16
+num_replicas = 4
+num_workers = None
+seed = 0
+# -------------------------- #
+
+
+sys.path.append('.')
+import taxisim
+from taxisim import learning
+from taxisim import checkpoint
+from taxisim import training
+taxisim.params.MAXSIZE = max_taxi_size
+taxisim.runner.check_requests()
+
+if max_runs % num_replicas:
+    sys.exit("Error: max_runs must be a multiple of num_replicas.")
+
+
+# Exploration decays linearly from 1 to 0 over runs 1001 to 1500.
+def get_p_explore(run_num):
+    return 1 - min(max(run_num - 1000, 0), 500) / 500
+
+
+class TrainingThread(threading.Thread):
+
+    def run(self):
+        with open("training-parallel/log.pickle", 'rb') as file:
+            logdict = checkpoint.read_log("training-parallel", pickle.load(file))
+
+        run_num = logdict["run_count"]
+        state = checkpoint.load("training-parallel", run_num)
+        checkpointer = checkpoint.Checkpointer("training-parallel", base=state)
+
+        trainer = training.PopulationTrainer.from_state(
+            state,
+            days=range(1, 30),
+            ridesharing=enable_sharing,
+            seed=seed,
+            workers=num_workers,
+            get_p_explore=get_p_explore,
+            params={"MAXSIZE": max_taxi_size},
+        )
+
+        logfile = open("training-parallel/log.txt", 'a');
+
+        while run_num < max_runs:
+            if self.halt:
+                break
+
+            start_time = time.time()
+            title = f"Runs: {run_num + 1}-{run_num + num_replicas}/{max_runs}  "
+            title += f"[{num_replicas} x {num_taxis} taxis, ridesharing = {enable_sharing}]"
+            log(f"\n**********   {title}   **********\n", logfile)
+
+            runs = dict(trainer.run_round(run_num))
+            for num, stats in runs.items():
+                log(f"Run {num}  [2016-02-{stats['day']:02d}]", logfile)
+                log(f"  Timeouts:  {stats['timeouts']} ({stats['timeout_percent']:.4f}%)", logfile)
+                log(f"  Mean wait: {stats['mean_wait']:.2f}m", logfile)
+            run_num = max(runs)
+            stats = runs[run_num]
+
+            logdict["run_count"] = run_num
+            logdict["runs"].update(runs)
+            checkpointer.save(run_num, trainer.get_state(), runs.pop(run_num), runs)
+            print("* Checkpoint queued.")
+            print(f"* Run {run_num} complete.\n")
+
+            log(f"\nSim time:  {(time.time() - start_time) / 60:.2f}m\n", logfile)
+            for size, count in sorted(stats["sizes"].items()):
+                log(f"{size:2d}: {count}", logfile)
+
+            taxi = trainer.replicas[-1].taxis[0]
+            data =  f"ID: {taxi.id}  Size: {taxi.size}  LA: {taxi.last_action}  "
+            data += f"LC: {taxi.last_choice.value}  P: {taxi.p_explore:.3f}"
+            log(f"\nSample taxi: [{data}]\n", logfile)
+            log(taxi.q_table, logfile)
+
+        trainer.close()
+        checkpointer.close()
+        with open("training-parallel/log.pickle", 'wb') as file:
+            pickle.dump(logdict, file)
+        print("* Checkpoints and pickled log saved.")
+        logfile.close()
+
+
+def log(msg, logfile):
+    print(msg)
+    logfile.write(str(msg))
+    logfile.write("\n")
+
+
+def train():
+    print("[STARTING... (Ctrl-C to halt)]")
+    thread = TrainingThread()
+    thread.halt = False
+    thread.start()
+
+    try:
+        while thread.is_alive():
+            thread.join(timeout=0.5)
+    except KeyboardInterrupt:
+        print("[HALTING... (may take some time)]")
+        thread.halt = True
+
+    thread.join()
+
+
+def init():
+    if not os.path.isdir("training-parallel"):
+        os.mkdir("training-parallel")
+
+    taxis = taxisim.make_taxis(num_taxis, size=4)
+    trainer = training.PopulationTrainer.from_tensor(
+        learning.QTensor(taxis), num_replicas, days=range(1, 30), workers=1
+    )
+
+    log = {
+        "run_count": 0,
+        "runs": {0: {"sizes": {4: num_taxis}}},
+    }
+    with checkpoint.Checkpointer("training-parallel") as checkpointer:
+        checkpointer.save(0, trainer.get_state(), log["runs"][0])
+
+    with open("training-parallel/log.pickle", 'wb') as file:
+        pickle.dump(log, file)
+
+
+if __name__ == "__main__":
+    if not os.path.isfile("training-parallel/log.pickle"):
+        init()
+    train()
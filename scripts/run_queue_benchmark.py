@@ -0,0 +1,69 @@
+#! /usr/bin/env pypy3
+# ----------------------------------------------------------------------------------------
+# This script benchmarks the dispatch bookkeeping under congestion. The first part is a raw
+# data-structure benchmark: it times one tick's worth of DispatchQueue operations (removing
+# half the queue and splitting a tenth of it) against queues of increasing length, using
+# bare passenger groups outside a World, so no dispatch searches are included. The second
+# part drives a World: an undersized fleet runs through the morning rush and the mean cost
+# per tick and per queued group is reported, bucketed by the length of the dispatch queue.
+# ----------------------------------------------------------------------------------------
+
+import datetime as dt
+import sys
+import time
+
+# -------- Settings -------- #
+day = 1
+num_taxis = 500
+enable_sharing = False
+queue_lengths = (1000, 2000, 4000, 8000, 16000)
+bucket_size = 500
+# -------------------------- #
+
+sys.path.append('.')
+import taxisim
+from taxisim.world import DispatchQueue, PassengerGroup
+taxisim.runner.check_requests()
+
+pos = (40.7580, -73.9855)
+
+print("DispatchQueue Operations Per Tick (no World)\n--------------------------------------------")
+for length in queue_lengths:
+    queue = DispatchQueue()
+    for i in range(length):
+        queue.append(PassengerGroup(0, 4, pos, pos))
+    start = time.time()
+    for i, pg in enumerate(queue):
+        if i % 2 == 0:
+            queue.remove(pg)
+        elif i % 10 == 1:
+            queue.insert_before(pg, pg.split(2))
+    elapsed = time.time() - start
+    print(f"Length: {length:6d}    Tick: {1000*elapsed:8.2f}ms    Per group: {1e6*elapsed/length:.3f}us")
+
+requests = taxisim.runner.open_requests(day)
+
+world = taxisim.World(ridesharing=enable_sharing)
+world.add_taxis(taxisim.make_taxis(num_taxis))
+world.time = dt.datetime(2016, 2, day, 8)
+world.add_requests(requests)
+
+buckets = {}
+while world.request_queue:
+    queue_length = len(world.dispatch_queue)
+    start = time.time()
+    world.tick()
+    elapsed = time.time() - start
+    bucket = buckets.setdefault(queue_length // bucket_size, [0, 0, 0])
+    bucket[0] += 1
+    bucket[1] += elapsed
+    bucket[2] += queue_length
+
+print()
+print(f"World Tick Cost By Queue Length ({num_taxis} taxis)\n-------------------------------------------")
+for bucket, (count, elapsed, groups) in sorted(buckets.items()):
+    lower, upper = bucket * bucket_size, (bucket + 1) * bucket_size
+    per_group = 1e6 * elapsed / groups if groups else 0
+    msg = f"Queue: {lower:5d}-{upper:<5d}    Ticks: {count:4d}    "
+    msg += f"Tick: {1000*elapsed/count:8.2f}ms    Per group: {per_group:7.2f}us"
+    print(msg)
@@ -1,8 +1,10 @@
 #! /usr/bin/env pypy3
 # ----------------------------------------------------------------------------------------
 # This script runs the Monte Carlo sample-learning algorithm. Training can be stopped at
-# any point by hitting Ctrl-C and restarted by running this script again. Data is
-# collected in a `training` directory.
+# any point by hitting Ctrl-C and restarted by running this script again. Early stopping
+# is off by default. When enabled, training ends once every taxi's best size and sample
+# values are stable, so the log may end before the final run. Data is collected in a
+# `training` directory.
 # ----------------------------------------------------------------------------------------
 
 import datetime as dt
@@ -11,7 +13,6 @@ import os
 import threading
 import time
 import sys
-import random
 
 
 # -------- Settings -------- #
@@ -19,12 +20,17 @@ max_runs = 1000
 num_taxis = 3600
 enable_sharing = True
 max_taxi_size = 16
+early_stopping = False
+convergence_window = 50
 # -------------------------- #
 
 
 sys.path.append('.')
 import taxisim
+from taxisim import learning
+from taxisim import checkpoint
 taxisim.params.MAXSIZE = max_taxi_size
+taxisim.runner.check_requests()
 
 
 class TrainingThread(threading.Thread):
@@ -32,21 +38,29 @@ class TrainingThread(threading.Thread):
     def run(self):
         requests = {}
         for day in range(1, 30):
-            with open(f"data/requests/2016-02-{day:02d}.pickle", 'rb') as file:
-                requests[day] = pickle.load(file)
+            requests[day] = taxisim.runner.open_requests(day)
 
         with open("training/log.pickle", 'rb') as file:
-            logdict = pickle.load(file)
+            logdict = checkpoint.read_log("training", pickle.load(file))
 
         run_num = logdict["run_count"]
-        with open(f"training/taxis-{run_num:04d}.pickle", 'rb') as file:
-            taxis = pickle.load(file)
+        if checkpoint.exists("training", run_num):
+            state = checkpoint.load("training", run_num)
+            s_tensor = learning.STensor.from_state(state)
+        else:
+            # A training directory from before checkpoints, with pickled taxis.
+            state = None
+            s_tensor = learning.STensor(checkpoint.load_taxis("training", run_num))
+        taxis = s_tensor.taxis
+        checkpointer = checkpoint.Checkpointer("training", base=state)
 
         logfile = open("training/log.txt", 'a');
 
         world = taxisim.World(ridesharing=enable_sharing)
         world.add_taxis(taxis)
 
+        monitor = learning.ConvergenceMonitor(convergence_window)
+
         while run_num < max_runs:
             if self.halt:
                 break
@@ -65,30 +79,22 @@ class TrainingThread(threading.Thread):
             world.reset_taxis()
             world.add_requests(requests[day])
 
-            for taxi in taxis:
-                taxi.size = random.randint(1, max_taxi_size)
+            s_tensor.assign_random_sizes()
 
             world.run()
 
-            for taxi in taxis:
-                taxi.update_s_table()
-                max_sval, best_size = 0, 0
-                for size, (_, sval) in taxi.s_table.items():
-                    if sval > max_sval:
-                        max_sval = sval
-                        best_size = size
-                taxi.size = best_size
-
-            with open(f"training/taxis-{run_num:04d}.pickle", 'wb') as file:
-                pickle.dump(taxis, file)
-            print("* Taxis saved.")
+            s_tensor.update()
+            s_tensor.assign_best_sizes()
+
+            state = s_tensor.get_state()
+            changes = monitor.update(state["sizes"], state["s_values"], state["sizes"])
+            converged = early_stopping and monitor.converged
 
             sizes = {}
             for taxi in taxis:
                 sizes[taxi.size] = sizes.get(taxi.size, 0) + 1
 
-            logdict["run_count"] = run_num
-            logdict["runs"][run_num] = {
+            stats = {
                 "day": day,
                 "sizes": sizes,
                 "requests": world.num_requests,
@@ -98,10 +104,12 @@ class TrainingThread(threading.Thread):
                 "mean_pickup": world.mean_pickup_time,
                 "mean_wait": world.mean_wait_time,
             }
+            stats.update(changes or {})
+            logdict["run_count"] = run_num
+            logdict["runs"][run_num] = stats
 
-            with open("training/log.pickle", 'wb') as file:
-                pickle.dump(logdict, file)
-            print("* Pickled log saved.")
+            checkpointer.save(run_num, state, stats)
+            print("* Checkpoint queued.")
             print(f"* Run {run_num} complete.\n")
 
             log(f"Sim time:  {(time.time() - start_time) / 60:.2f}m", logfile)
@@ -115,6 +123,14 @@ class TrainingThread(threading.Thread):
             log(f"\nSample taxi: [ID: {taxi.id}  Size: {taxi.size}]\n", logfile)
             log(taxi.s_table, logfile)
 
+            if converged:
+                log(f"\nBest sizes stable: training stopped after run {run_num}.", logfile)
+                break
+
+        checkpointer.close()
+        with open("training/log.pickle", 'wb') as file:
+            pickle.dump(logdict, file)
+        print("* Checkpoints and pickled log saved.")
         logfile.close()
 
 
@@ -145,13 +161,14 @@ def init():
         os.mkdir("training")
 
     taxis = taxisim.make_taxis(num_taxis, size=4)
-    with open("training/taxis-0000.pickle", 'wb') as file:
-        pickle.dump(taxis, file)
 
     log = {
         "run_count": 0,
         "runs": {0: {"sizes": {4: num_taxis}}},
     }
+    with checkpoint.Checkpointer("training") as checkpointer:
+        checkpointer.save(0, learning.STensor(taxis).get_state(), log["runs"][0])
+
     with open("training/log.pickle", 'wb') as file:
         pickle.dump(log, file)
 
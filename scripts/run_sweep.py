@@ -0,0 +1,47 @@
+#! /usr/bin/env pypy3
+# ----------------------------------------------------------------------------------------
+# This script runs a parameter sweep: every combination of the values in the grid is run
+# on each day in the interval, in parallel worker processes. Grid keys are num_taxis,
+# enable_sharing, taxi_size, or the name of any direct parameter in taxisim.params. One
+# row per (config, day) is appended to the results file as runs complete; rerunning the
+# script skips runs that are already in the file.
+# ----------------------------------------------------------------------------------------
+
+import sys
+import time
+
+# -------- Settings -------- #
+grid = {
+    "num_taxis": [3000, 3600, 4200],
+    "enable_sharing": [True],
+    "TIMEOUT": [10],
+}
+start_day = 1
+end_day = 29
+results_file = "sweep.csv"
+num_workers = None
+seed = 0
+# -------------------------- #
+
+sys.path.append('.')
+import taxisim
+from taxisim import runner, sweep
+runner.check_requests()
+
+if start_day < 1 or end_day > 29:
+    sys.exit("Error: check your calender.")
+
+days = runner.get_available_days(start_day, end_day)
+store = sweep.ResultStore(results_file, grid)
+start_time = time.time()
+
+print(f"Running sweep, {len(sweep.get_configs(grid))} configs, {len(days)} days\n")
+
+for config, day, metrics in sweep.run_sweep(grid, days, store, seed, num_workers):
+    run_time = (time.time() - start_time) / 60
+    settings = "  ".join(f"{name}: {value}" for name, value in config.items())
+    stats = f"TO: {metrics['timeouts']:.4f}%    MW: {metrics['wait_time']:.2f}"
+    print(f"[{run_time:.2f}m]    Day: {day:2d}    {settings}    {stats}")
+
+sim_time = (time.time() - start_time) / 60
+print(f"\nSim time:    {sim_time:.2f}m")
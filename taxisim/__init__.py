@@ -3,10 +3,24 @@ from . import taxi
 from . import utils
 from . import world
 from . import manhattan
+from . import fleet
+from . import events
+from . import index
+from . import requestfile
+from . import runner
+from . import sweep
+from . import search
+from . import snapshot
+from . import learning
+from . import checkpoint
+from . import training
+from . import ingest
+from . import dataset
 
 from .taxi import Taxi, make_taxis
 from .world import World
 from .manhattan import in_manhattan
 from .utils import distance
+from .requestfile import RequestFile
 
 logfile = None
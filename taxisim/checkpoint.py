@@ -0,0 +1,170 @@
+import os
+import pickle
+import queue
+import re
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# A Checkpointer instance saves a training run's learning state after every run without
+# stalling the simulation. The state is a dictionary of NumPy arrays, e.g. from
+# QTensor.get_state(). Every full_interval runs the whole state is written to full-NNNN.npz;
+# other runs only write the entries that changed since the previous run to delta-NNNN.npz.
+# Files are written by a background thread from copies of the arrays so training can carry on
+# immediately.
+#
+# Per-run statistics are appended to log.pickles rather than rewriting a growing log, one
+# pickled (run_num, runs) record per checkpoint where runs maps run numbers to stats. Each record
+# is written after its checkpoint, so the last run in the log can always be restored;
+# read_log() rebuilds the familiar logdict.
+# Call close() to wait for queued checkpoints to be written before exiting.
+class Checkpointer:
+
+    def __init__(self, directory, base=None, full_interval=100):
+        if np is None:
+            raise ImportError("Checkpointer requires NumPy")
+        self.directory = directory
+        self.full_interval = full_interval
+        self.last = base
+        self.error = None
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.write_loop, daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # Queue the learning state and stats for the specified run to be written. If the state also
+    # covers earlier runs that don't get a checkpoint of their own, earlier_stats maps their run
+    # numbers to their stats.
+    def save(self, run_num, state, stats, earlier_stats=None):
+        if self.error:
+            raise self.error
+        state = {name: np.array(values) for name, values in state.items()}
+        runs = dict(earlier_stats or {})
+        runs[run_num] = stats
+        self.queue.put((run_num, state, runs))
+
+    # Wait for all queued checkpoints to be written and stop the writer thread.
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.error:
+            raise self.error
+
+    def write_loop(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if self.error:
+                continue
+            try:
+                self.write(*item)
+            except Exception as error:
+                self.error = error
+
+    def write(self, run_num, state, runs):
+        full = self.last is None or run_num % self.full_interval == 0
+        if full or self.last.keys() != state.keys():
+            write_npz(get_path(self.directory, "full", run_num), state)
+        else:
+            delta = {}
+            for name, values in state.items():
+                changed = np.flatnonzero(values != self.last[name])
+                delta[f"{name}.index"] = changed
+                delta[f"{name}.values"] = values.ravel()[changed]
+            write_npz(get_path(self.directory, "delta", run_num), delta)
+        self.last = state
+        with open(os.path.join(self.directory, "log.pickles"), 'ab') as file:
+            pickle.dump((run_num, runs), file)
+            file.flush()
+            os.fsync(file.fileno())
+
+
+# Returns the learning state saved for the specified run, rebuilt from the latest full
+# checkpoint at or before the run and the deltas that follow it. Runs without a checkpoint of
+# their own can't be restored.
+def load(directory, run_num):
+    if np is None:
+        raise ImportError("checkpoint.load() requires NumPy")
+    fulls = [num for num in list_runs(directory, "full") if num <= run_num]
+    if not fulls:
+        raise FileNotFoundError(f"no full checkpoint at or before run {run_num} in {directory}")
+    start = max(fulls)
+    deltas = [num for num in list_runs(directory, "delta") if start < num <= run_num]
+    if start != run_num and run_num not in deltas:
+        raise FileNotFoundError(f"no checkpoint for run {run_num} in {directory}")
+    with np.load(get_path(directory, "full", start)) as data:
+        state = {name: data[name] for name in data.files}
+    for num in deltas:
+        with np.load(get_path(directory, "delta", num)) as data:
+            for name, values in state.items():
+                values.ravel()[data[f"{name}.index"]] = data[f"{name}.values"]
+    return state
+
+
+# Returns True if the learning state for the specified run can be restored with load().
+def exists(directory, run_num):
+    fulls = [num for num in list_runs(directory, "full") if num <= run_num]
+    return bool(fulls) and (max(fulls) == run_num or run_num in list_runs(directory, "delta"))
+
+
+# Returns the list of taxis pickled for the specified run by older versions of the training
+# scripts, which saved the whole fleet to taxis-NNNN.pickle after every run. Training
+# directories started before checkpoints were introduced can be resumed from these files.
+def load_taxis(directory, run_num):
+    with open(os.path.join(directory, f"taxis-{run_num:04d}.pickle"), 'rb') as file:
+        taxis = pickle.load(file)
+    for taxi in taxis:
+        if not hasattr(taxi, "leg"):
+            taxi.leg = None
+    return taxis
+
+
+# Returns the training log as a dictionary of the form {"run_count": n, "runs": {...}},
+# starting from the initial log entries if specified. A record cut short by an interrupted
+# write is ignored.
+def read_log(directory, initial=None):
+    logdict = {"run_count": 0, "runs": {}}
+    if initial:
+        logdict["run_count"] = initial["run_count"]
+        logdict["runs"].update(initial["runs"])
+    path = os.path.join(directory, "log.pickles")
+    if os.path.exists(path):
+        with open(path, 'rb') as file:
+            while True:
+                try:
+                    run_num, runs = pickle.load(file)
+                except (EOFError, ValueError, pickle.UnpicklingError):
+                    break
+                logdict["runs"].update(runs)
+                logdict["run_count"] = max(logdict["run_count"], run_num)
+    return logdict
+
+
+def get_path(directory, kind, run_num):
+    return os.path.join(directory, f"{kind}-{run_num:04d}.npz")
+
+
+# Returns the run numbers of the checkpoints of the specified kind in the directory.
+def list_runs(directory, kind):
+    pattern = re.compile(kind + r"-(\d+)\.npz$")
+    matches = (pattern.match(name) for name in os.listdir(directory))
+    return sorted(int(match.group(1)) for match in matches if match)
+
+
+# Write the arrays to an .npz file, via a temporary file so an interrupted write never leaves a
+# partial checkpoint behind.
+def write_npz(path, arrays):
+    temp_path = path + ".tmp"
+    with open(temp_path, 'wb') as file:
+        np.savez(file, **arrays)
+    os.replace(temp_path, path)
@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+import pickle
+import re
+import shutil
+import tempfile
+
+from . import ingest
+
+
+# Version of the cached dataset format. Changing it invalidates every cache entry.
+FORMAT_VERSION = 1
+
+
+# Default directory for cached datasets.
+CACHE_DIR = "data/cache"
+
+
+# Name of the manifest file recording which cache entries an output directory was exported from.
+MANIFEST = "manifest.json"
+
+
+# Size in bytes of the blocks read when hashing a source file.
+HASH_BLOCK = 1024 * 1024
+
+
+# Returns the SHA-256 digest of the file's contents as a hex string. Digests are remembered in
+# the cache directory along with each file's size and modification time so an unchanged file
+# is only read once.
+def hash_file(path, cache_dir=CACHE_DIR):
+    index_path = os.path.join(cache_dir, "hashes.pickle")
+    index = {}
+    if os.path.isfile(index_path):
+        with open(index_path, 'rb') as file:
+            index = pickle.load(file)
+
+    path = os.path.abspath(path)
+    info = os.stat(path)
+    size, mtime = info.st_size, info.st_mtime_ns
+    if path in index and index[path][:2] == (size, mtime):
+        return index[path][2]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK), b''):
+            digest.update(block)
+    index[path] = (size, mtime, digest.hexdigest())
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(index_path + ".tmp", 'wb') as file:
+        pickle.dump(index, file)
+    os.replace(index_path + ".tmp", index_path)
+    return index[path][2]
+
+
+# Returns the (year, month) tuple in a TLC file name like 'yellow_tripdata_2016-02.csv', or
+# None if the name doesn't contain one.
+def get_month(path):
+    match = re.search(r"(\d{4})-(\d{2})\.csv$", os.path.basename(path))
+    if match is None:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+
+# Returns the complete filter settings for the source file: DEFAULT_SETTINGS, then the year and
+# month from the file name, then the specified settings.
+def get_settings(path, settings=None):
+    result = dict(ingest.DEFAULT_SETTINGS)
+    month = get_month(path)
+    if month:
+        result["year"], result["month"] = month
+    result.update(settings or {})
+    return result
+
+
+# Returns the cache key for a source file's digest and complete filter settings.
+def get_key(digest, settings):
+    data = json.dumps([FORMAT_VERSION, digest, settings], sort_keys=True)
+    return hashlib.sha256(data.encode()).hexdigest()[:16]
+
+
+def get_entry_dir(key, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, key)
+
+
+# Filters the source CSV file into the cache unless an entry for its contents and settings
+# already exists. Settings are completed by get_settings(). Returns a (key, stats) tuple where
+# stats are the entry's statistics in the format of ingest.filter_csv(). Entries are built in a
+# temporary directory and renamed into place once complete, so an interrupted build leaves no
+# entry behind.
+def build(path, settings=None, workers=None, cache_dir=CACHE_DIR):
+    settings = get_settings(path, settings)
+    key = get_key(hash_file(path, cache_dir), settings)
+    entry_dir = get_entry_dir(key, cache_dir)
+    if not os.path.isdir(entry_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_dir = tempfile.mkdtemp(dir=cache_dir)
+        try:
+            stats = ingest.filter_csv(path, temp_dir, settings, workers)
+            with open(os.path.join(temp_dir, "stats.pickle"), 'wb') as file:
+                pickle.dump({"settings": settings, "stats": stats}, file)
+            os.replace(temp_dir, entry_dir)
+        except OSError:
+            if not os.path.isdir(entry_dir):
+                raise
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    return key, read_entry(key, cache_dir)["stats"]
+
+
+# Returns the cache entry with the specified key as a dictionary of its complete filter
+# settings and its statistics.
+def read_entry(key, cache_dir=CACHE_DIR):
+    with open(os.path.join(get_entry_dir(key, cache_dir), "stats.pickle"), 'rb') as file:
+        return pickle.load(file)
+
+
+# Returns the names of the request files in the cache entry with the specified key.
+def list_files(key, cache_dir=CACHE_DIR):
+    entry_dir = get_entry_dir(key, cache_dir)
+    return sorted(name for name in os.listdir(entry_dir) if name.endswith(".requests"))
+
+
+# Combines the statistics of several cache entries. Days from different months are counted
+# separately as (year, month, day) tuples; zones are kept in order of first appearance.
+def merge_stats(entries):
+    stats = {
+        "num_requests": 0,
+        "num_big_requests": 0,
+        "max_request_size": 0,
+        "mean_speed": 0,
+        "sizes": {},
+        "days": {},
+        "zones": {},
+    }
+    speed_total = 0
+    for settings, result in entries:
+        stats["num_requests"] += result["num_requests"]
+        stats["num_big_requests"] += result["num_big_requests"]
+        stats["max_request_size"] = max(stats["max_request_size"], result["max_request_size"])
+        speed_total += result["mean_speed"] * result["num_requests"]
+        for size, count in result["sizes"].items():
+            stats["sizes"][size] = stats["sizes"].get(size, 0) + count
+        for day, count in result["days"].items():
+            stats["days"][(settings["year"], settings["month"], day)] = count
+        for zone, count in result["zones"].items():
+            stats["zones"][zone] = stats["zones"].get(zone, 0) + count
+    if stats["num_requests"]:
+        stats["mean_speed"] = speed_total / stats["num_requests"]
+    return stats
+
+
+# Returns the manifest of the output directory, or None if it has none.
+def read_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST)
+    if not os.path.isfile(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+# Copies the request files of the cache entries with the specified keys into output_dir and
+# records them in its manifest, along with the source file paths if specified, one per key.
+# Files already exported from the same entry are left alone and files exported from entries no
+# longer listed are removed. Returns the combined statistics of the entries in the format of
+# merge_stats().
+def export(keys, output_dir, cache_dir=CACHE_DIR, paths=None):
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = read_manifest(output_dir) or {"files": {}}
+    manifest_path = os.path.join(output_dir, MANIFEST)
+    files = {name: key for key in keys for name in list_files(key, cache_dir)}
+    changed = [name for name, key in files.items()
+        if manifest["files"].get(name) != key or not os.path.isfile(os.path.join(output_dir, name))]
+
+    # Files are dropped from the manifest before they're replaced so an interrupted export can't
+    # leave a file recorded against the wrong entry.
+    stale = [name for name in manifest["files"] if name not in files or name in changed]
+    if stale:
+        manifest["files"] = {n: k for n, k in manifest["files"].items() if n not in stale}
+        write_text(manifest_path, json.dumps(manifest, indent=2, sort_keys=True))
+    for name in stale:
+        if name not in files and os.path.isfile(os.path.join(output_dir, name)):
+            os.remove(os.path.join(output_dir, name))
+    for name in changed:
+        entry_path = os.path.join(get_entry_dir(files[name], cache_dir), name)
+        output_path = os.path.join(output_dir, name)
+        shutil.copyfile(entry_path, output_path + ".tmp")
+        os.replace(output_path + ".tmp", output_path)
+
+    entries = [read_entry(key, cache_dir) for key in keys]
+    sources = [{"key": key, "settings": e["settings"]} for key, e in zip(keys, entries)]
+    for source, path in zip(sources, paths or []):
+        source["path"] = os.path.abspath(path)
+    manifest = {"version": FORMAT_VERSION, "sources": sources, "files": files}
+    write_text(manifest_path, json.dumps(manifest, indent=2, sort_keys=True))
+    return merge_stats([(e["settings"], e["stats"]) for e in entries])
+
+
+# Returns True if output_dir holds the requests filtered from the source files with the
+# specified settings, i.e. if its manifest lists exactly the cache keys of the sources' current
+# contents and all of its request files exist. Settings can also be a list with one dictionary
+# per source file.
+def is_current(output_dir, paths, settings=None, cache_dir=CACHE_DIR):
+    manifest = read_manifest(output_dir)
+    if manifest is None or manifest.get("version") != FORMAT_VERSION:
+        return False
+    if not isinstance(settings, list):
+        settings = [settings] * len(paths)
+    keys = [
+        get_key(hash_file(path, cache_dir), get_settings(path, path_settings))
+        for path, path_settings in zip(paths, settings)
+    ]
+    if keys != [source["key"] for source in manifest["sources"]]:
+        return False
+    return all(os.path.isfile(os.path.join(output_dir, name)) for name in manifest["files"])
+
+
+# Checks output_dir against the source files and settings recorded in its manifest with
+# is_current(). Returns None if it's current or a message saying why it isn't. Source files
+# that no longer exist can't be checked, so a directory whose sources are gone only needs its
+# request files.
+def check(output_dir, cache_dir=CACHE_DIR):
+    manifest = read_manifest(output_dir)
+    if manifest is None:
+        return f"{output_dir} has no manifest, so it can't be checked against its source data"
+    sources = manifest.get("sources", [])
+    if any("path" not in source for source in sources):
+        return f"the manifest in {output_dir} doesn't record its source files"
+    paths = [source["path"] for source in sources]
+    if all(os.path.isfile(path) for path in paths):
+        settings = [source["settings"] for source in sources]
+        if not is_current(output_dir, paths, settings, cache_dir):
+            return f"{output_dir} is out of date with its source data"
+    elif not all(os.path.isfile(os.path.join(output_dir, n)) for n in manifest["files"]):
+        return f"{output_dir} is missing request files"
+    return None
+
+
+# Writes the text to the file unless the file already holds exactly that text, so unchanged
+# outputs keep their modification times. Returns True if the file was written.
+def write_text(path, text):
+    if os.path.isfile(path):
+        with open(path) as file:
+            if file.read() == text:
+                return False
+    with open(path + ".tmp", 'w') as file:
+        file.write(text)
+    os.replace(path + ".tmp", path)
+    return True
@@ -0,0 +1,160 @@
+import heapq
+import math
+
+from . import utils
+from . import params
+from .taxi import Leg
+
+
+# The EventEngine class drives a World in discrete-event mode. Instead of touching every taxi on
+# every tick, the engine keeps a priority queue of future taxi events -- arrivals at task
+# waypoints, zone crossings along the current leg, and repositioning wake-ups for idle taxis --
+# and jumps straight to the next tick on which something happens.
+#
+# Time remains quantized to whole ticks so the World's metrics are computed exactly as in tick
+# mode. Passenger groups waiting in the dispatch queue only need attention when a timeout or
+# split deadline falls due or when the taxis available near them change, which only happens on a
+# taxi event or a dispatch, so the engine can skip ahead even while groups are waiting. The only
+# tick it can't skip is the one after a group splits, when the halves are first dispatched.
+#
+# A moving taxi's position is only recomputed when it has an event due or when it's dispatched.
+# Between events a taxi stays in its zone, so dispatch can score candidates at their current
+# positions, as given by locate(), without moving them. Taxis follow the same cached legs as in
+# tick mode, with each position calculated directly from the start of the leg, so paths match
+# tick mode exactly. Idle taxis draw their next repositioning time once from the geometric
+# distribution matching params.REPO_PROB rather than drawing every tick, so individual runs
+# differ from tick mode while the distribution of outcomes is unchanged. With repositioning
+# switched off, runs match tick mode apart from rounding in the distance totals.
+#
+# Event mode pays off on sparse schedules, where a large fleet spends most of its time idle or
+# repositioning: moving taxis are only touched on zone crossings and arrivals rather than on
+# every tick. On busy schedules the run is dominated by dispatch, which costs the same in both
+# modes, and tick mode with the fleet engine is faster.
+class EventEngine:
+
+    def __init__(self, world):
+        self.world = world
+        self.start_time = world.clock
+        self.tick = 0
+        self.heap = []
+        self.indices = {taxi: index for index, taxi in enumerate(world.taxis)}
+        self.due = [None] * len(world.taxis)
+        self.fresh = [0] * len(world.taxis)
+        for index, taxi in enumerate(world.taxis):
+            if taxi.tasks:
+                self.start_leg(taxi)
+            else:
+                self.schedule_wake_up(index)
+
+    # Advance the simulation to the next tick on which something happens.
+    def step(self):
+        world = self.world
+        self.tick = self.get_next_tick()
+        world.clock = self.start_time + self.tick * world.tick_time
+
+        # Process all taxi events due on this tick in master-list order.
+        due = []
+        while self.heap and self.heap[0][0] <= self.tick:
+            tick, index = heapq.heappop(self.heap)
+            if self.due[index] == tick:
+                self.due[index] = None
+                due.append(index)
+        for index in sorted(set(due)):
+            self.handle_event(index)
+
+        world.load_requests()
+        world.dispatch_taxis()
+
+    # Returns the next tick on which there is work to do.
+    def get_next_tick(self):
+        world = self.world
+        candidates = []
+        if world.dispatch_queue:
+            if world.num_splits:
+                return self.tick + 1
+            deadline = world.get_next_deadline()
+            if deadline:
+                candidates.append(math.ceil((deadline - self.start_time) / world.tick_time))
+        while self.heap and self.due[self.heap[0][1]] != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        if self.heap:
+            candidates.append(self.heap[0][0])
+        if world.request_queue:
+            delta = (world.request_queue.peek()[0] - self.start_time) / world.tick_time
+            candidates.append(math.ceil(delta))
+        if candidates:
+            return max(self.tick + 1, min(candidates))
+        return self.tick + 1
+
+    # Schedule an event for the specified taxi, replacing any pending event.
+    def schedule(self, index, tick):
+        self.due[index] = tick
+        heapq.heappush(self.heap, (tick, index))
+
+    # Schedule an idle taxi's next repositioning wake-up.
+    def schedule_wake_up(self, index):
+        wait = utils.geometric(params.REPO_PROB)
+        if wait != math.inf:
+            self.schedule(index, self.tick + wait)
+
+    # Process a taxi's event on the current tick. An idle taxi's event is a repositioning
+    # wake-up; as in tick mode, it starts moving on the same tick.
+    def handle_event(self, index):
+        taxi = self.world.taxis[index]
+        if taxi.leg is None:
+            taxi.start_repositioning()
+            self.start_leg(taxi, self.tick - 1)
+        self.update_taxi(index)
+
+    # Bring the taxi's position up to date with the current tick. If the taxi arrives at its
+    # destination this processes its tasks and starts its next leg.
+    def update_taxi(self, index):
+        taxi = self.world.taxis[index]
+        leg = taxi.leg
+        if leg is None or self.fresh[index] == self.tick:
+            return
+        self.fresh[index] = self.tick
+        last_steps = leg.travelled_steps
+        steps = min(self.tick - leg.start, leg.steps)
+        arrived = steps == leg.steps
+        taxi.advance(self.world, steps)
+
+        # Taxi.move() only logs the position at the start of the update so we fill in the
+        # positions for the intervening ticks.
+        if taxi.logging:
+            for step in range(last_steps + 1, steps):
+                taxi.log_positions.append(leg.get_position(step))
+
+        if arrived:
+            if taxi.tasks:
+                self.start_leg(taxi)
+            else:
+                self.schedule_wake_up(index)
+        else:
+            next_tick = leg.start + leg.get_next_crossing(self.tick - leg.start)
+            if self.due[index] != next_tick:
+                self.schedule(index, next_tick)
+
+    # Returns the taxi's position on the current tick without moving it. Between events a
+    # taxi stays in its zone, so only its position within the zone is out of date.
+    def locate(self, taxi):
+        leg = taxi.leg
+        if leg is None or self.fresh[self.indices[taxi]] == self.tick:
+            return taxi.position
+        return leg.get_position(self.tick - leg.start)
+
+    # Start a new leg towards the destination of the taxi's current task. By default the leg
+    # starts from the taxi's current position on the current tick.
+    def start_leg(self, taxi, start=None):
+        index = self.indices[taxi]
+        start = self.tick if start is None else start
+        taxi.leg = Leg(taxi.position, taxi.tasks[0][0], start)
+        self.fresh[index] = start
+        self.schedule(index, start + taxi.leg.get_next_crossing(0))
+
+    # Bring every moving taxi up to date at the end of the run so positions and distance
+    # metrics match tick mode.
+    def finish(self):
+        for index in range(len(self.world.taxis)):
+            self.update_taxi(index)
+
@@ -0,0 +1,167 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from . import utils
+from . import params
+from . import index
+
+
+# The Fleet class is an optional structure-of-arrays engine for moving taxis in tick mode. The
+# state the movement loop needs -- each taxi's position and destination, the geometry of its
+# current leg and its progress along it, its passenger count and size, and its distance totals
+# -- is held in NumPy arrays indexed by the taxi's position in the world's master list, and all
+# the moving taxis are advanced by the same handful of array operations on each tick.
+#
+# Python only runs for the taxis something happens to on a tick. Taxis that arrive go through
+# Taxi.move() to process their tasks, taxis that enter a new zone are moved between the world's
+# zone lists, and available taxis that enter a new index cell are updated in the index. These
+# are handled in master-list order and every other taxi just has its position written back, so
+# the run is identical to the per-object Taxi.tick() path: positions and distances are
+# calculated with the same floating-point operations in the same order. Taxis that log their
+# positions take the per-object path.
+#
+# A new leg is loaded whenever a taxi's Leg instance changes, e.g. after a dispatch. Positions
+# are written back to the Taxi instances on every tick but distance totals and leg progress
+# are only written back by flush(); World.run() builds an engine at the start of each run and
+# flushes it at the end.
+class Fleet:
+
+    def __init__(self, taxis):
+        if np is None:
+            raise ImportError("the fleet engine requires NumPy")
+        num = len(taxis)
+        column = lambda values, dtype=float: np.fromiter(values, dtype, num)
+        self.taxis = taxis
+        self.legs = [None] * num
+        self.lat = column(taxi.position[0] for taxi in taxis)
+        self.long = column(taxi.position[1] for taxi in taxis)
+        self.dest_lat = np.zeros(num)
+        self.dest_long = np.zeros(num)
+        self.origin_lat = np.zeros(num)
+        self.origin_long = np.zeros(num)
+        self.unit_lat = np.zeros(num)
+        self.unit_long = np.zeros(num)
+        self.length = np.zeros(num)
+        self.travelled = np.zeros(num)
+        self.steps = np.zeros(num, dtype=np.int64)
+        self.travelled_steps = np.zeros(num, dtype=np.int64)
+        self.num_passengers = column(taxi.num_passengers for taxi in taxis)
+        self.size = column(taxi.size for taxi in taxis)
+        self.total_dist = column(taxi.total_dist for taxi in taxis)
+        self.weighted_dist = column(taxi.weighted_dist for taxi in taxis)
+
+    def __len__(self):
+        return len(self.taxis)
+
+    # Load the taxi's current leg into the arrays, starting a new leg if necessary.
+    def load(self, world, i):
+        leg = self.taxis[i].get_leg(world)
+        self.legs[i] = leg
+        self.dest_lat[i], self.dest_long[i] = leg.destination
+        self.origin_lat[i], self.origin_long[i] = leg.origin
+        self.unit_lat[i], self.unit_long[i] = leg.unit
+        self.length[i] = leg.length
+        self.travelled[i] = leg.travelled
+        self.steps[i] = leg.steps
+        self.travelled_steps[i] = leg.travelled_steps
+
+    # Write the distance totals and leg progress back to the taxi instances.
+    def flush(self):
+        total_dists = self.total_dist.tolist()
+        weighted_dists = self.weighted_dist.tolist()
+        travelled = self.travelled.tolist()
+        travelled_steps = self.travelled_steps.tolist()
+        for i, taxi in enumerate(self.taxis):
+            if taxi.logging:
+                continue
+            taxi.total_dist = total_dists[i]
+            taxi.weighted_dist = weighted_dists[i]
+            leg = self.legs[i]
+            if leg is not None and leg is taxi.leg:
+                leg.travelled = travelled[i]
+                leg.travelled_steps = travelled_steps[i]
+
+    # Advance the taxis with the specified master-list indices by one tick. Returns the indices
+    # of the taxis that arrived at their destinations, in master-list order.
+    def tick(self, world, indices):
+        taxis, legs = self.taxis, self.legs
+        moving, logged = [], []
+        for j in indices:
+            taxi = taxis[j]
+            if not taxi.tasks:
+                continue
+            if taxi.logging:
+                logged.append(j)
+                continue
+            if taxi.leg is None or taxi.leg is not legs[j]:
+                self.load(world, j)
+            moving.append(j)
+        if not moving and not logged:
+            return []
+
+        # Everyone takes one more step along their leg, snapping to the destination on the
+        # final step. Distances are calculated exactly as Taxi.advance() calculates them.
+        i = np.array(moving, dtype=np.intp)
+        steps = np.minimum(self.travelled_steps[i] + 1, self.steps[i])
+        arrived = steps == self.steps[i]
+        travelled = self.travelled[i]
+        dist = np.where(
+            arrived, self.length[i] - travelled, steps * params.TICK_DIST - travelled
+        )
+        num_passengers = self.num_passengers[i]
+        self.travelled[i] = travelled + dist
+        self.travelled_steps[i] = steps
+        self.total_dist[i] += dist
+        self.weighted_dist[i] += dist * num_passengers * (num_passengers / self.size[i])
+        old_lat, old_long = self.lat[i], self.long[i]
+        lat = np.where(arrived, self.dest_lat[i], self.origin_lat[i] + steps * self.unit_lat[i])
+        long = np.where(
+            arrived, self.dest_long[i], self.origin_long[i] + steps * self.unit_long[i]
+        )
+        self.lat[i], self.long[i] = lat, long
+
+        # Zones and cells are found exactly as utils.get_zone() and the index find them.
+        scale = 100 * index.SUBDIVISIONS
+        zone_lat, zone_long = np.floor(lat * 100), np.floor(long * 100)
+        crossed = (zone_lat != np.floor(old_lat * 100)) | (zone_long != np.floor(old_long * 100))
+        flagged = arrived | (np.floor(lat * scale) != np.floor(old_lat * scale))
+        flagged |= np.floor(long * scale) != np.floor(old_long * scale)
+        flagged = np.flatnonzero(flagged)
+
+        for taxi, position in zip([taxis[j] for j in moving], zip(lat.tolist(), long.tolist())):
+            taxi.position = position
+
+        # Handle the taxis that arrived or changed cell, and the logging taxis, in order.
+        events = list(zip(
+            [moving[j] for j in flagged.tolist()],
+            arrived[flagged].tolist(),
+            crossed[flagged].tolist(),
+            zip(old_lat[flagged].tolist(), old_long[flagged].tolist()),
+            zip(zone_lat[flagged].astype(int).tolist(), zone_long[flagged].astype(int).tolist()),
+        ))
+        if logged:
+            events.extend((j, None, None, None, None) for j in logged)
+            events.sort(key=lambda event: event[0])
+        zones, locations = world.zones, world.index.locations
+        arrivals = []
+        for j, has_arrived, has_crossed, old_position, zone in events:
+            taxi = taxis[j]
+            if has_arrived is None:
+                taxi.tick(world)
+                arrivals.append(j)
+            elif has_arrived:
+                position = taxi.position
+                taxi.position = old_position
+                taxi.leg = None
+                taxi.move(world, position, 0, True, zone)
+                self.num_passengers[j] = taxi.num_passengers
+                arrivals.append(j)
+            elif has_crossed:
+                zones[utils.get_zone(old_position)].remove(taxi)
+                zones.setdefault(zone, []).append(taxi)
+                world.index.update(taxi, zone)
+            elif taxi in locations:
+                world.index.update(taxi, zone)
+        return arrivals
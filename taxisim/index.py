@@ -0,0 +1,251 @@
+import heapq
+import itertools
+import math
+
+from . import utils
+from . import params
+from .taxi import Status
+
+
+# Each zone is divided into SUBDIVISIONS x SUBDIVISIONS index cells (approx. 278m x 211m).
+SUBDIVISIONS = 4
+
+# Queries with no more than this many candidate taxis in the passenger group's zones score every
+# candidate at once instead of searching outwards cell by cell.
+DIRECT_LIMIT = 64
+
+
+# The TaxiIndex class is a spatial index of the taxis that are currently available for dispatch,
+# i.e. idle or repositioning taxis with free seats plus, with ridesharing, dropoff taxis with
+# free seats. Taxis are bucketed into a grid of cells finer than the dispatch zones and, within
+# each cell, by free capacity. The index is kept up to date incrementally as taxis move, change
+# status, and gain or lose passengers.
+#
+# Queries search outwards from the passenger group's cell in rings of cells, stopping as soon as
+# a lower bound on the distance to every unsearched cell exceeds the best candidate found so
+# far, so most available taxis are never distance-evaluated. When the group's zones hold only a
+# few candidates, as in an undersized fleet, the search costs more than it saves and every
+# candidate is scored in a single batch instead. Queries only visit the capacity
+# buckets that can take the whole group, so in mixed fleets of small and large taxis the small
+# taxis are skipped without being looked at. The index also records the order in which taxis
+# entered their current zone so that queries select exactly the taxi a scan of the world's zone
+# lists would select.
+#
+# If a set of dirty zones is specified, the index adds a zone to it whenever the taxis available
+# in that zone change in a way that could give a waiting passenger group a match: a taxi becomes
+# available, an available taxi enters the zone, or an available taxi changes status or gains
+# capacity. Taxis moving within a zone or becoming unavailable don't mark it.
+class TaxiIndex:
+
+    def __init__(self, ridesharing, dirty_zones=None):
+        if ridesharing:
+            self.statuses = (Status.idle, Status.repositioning, Status.dropoff)
+        else:
+            self.statuses = (Status.idle, Status.repositioning)
+        self.scale = 100 * SUBDIVISIONS
+        self.cells = {}                 # Available taxis in each cell, bucketed by capacity.
+        self.locations = {}             # (cell, capacity, zone, status) of each available taxi.
+        self.counts = {}                # Available taxis in each zone, by capacity.
+        self.members = {}               # Available taxis in each zone.
+        self.zones = {}                 # Zone each taxi was last seen in.
+        self.seqs = {}                  # Position of each taxi in its zone's taxi list.
+        self.seq_iter = itertools.count()
+        self.dirty_zones = set() if dirty_zones is None else dirty_zones
+
+    def __len__(self):
+        return len(self.locations)
+
+    # Returns the (row, column) index of the cell containing the position.
+    def get_cell(self, pos):
+        return (math.floor(pos[0] * self.scale), math.floor(pos[1] * self.scale))
+
+    # Bring the taxi's entry up to date with its position, zone and status. This must be called
+    # whenever a taxi is added to a zone list, in the same order, and whenever its position,
+    # status or capacity changes, i.e. after every move (including pickups and dropoffs) and
+    # after a pickup task is assigned.
+    def update(self, taxi, zone=None):
+        zone = zone or taxi.zone
+        if self.zones.get(taxi) != zone:
+            self.zones[taxi] = zone
+            self.seqs[taxi] = next(self.seq_iter)
+        capacity = taxi.capacity
+        if taxi.status in self.statuses and capacity > 0:
+            location = (self.get_cell(taxi.position), capacity, zone, taxi.status)
+        else:
+            location = None
+        old_location = self.locations.get(taxi)
+        if location == old_location:
+            return
+        if location is not None:
+            if old_location is None or old_location[2:] != location[2:] or (
+                    old_location[1] < location[1]):
+                self.dirty_zones.add(zone)
+        if old_location is not None:
+            cell, capacity, zone, _ = old_location
+            buckets = self.cells[cell]
+            del buckets[capacity][taxi]
+            if not buckets[capacity]:
+                del buckets[capacity]
+                if not buckets:
+                    del self.cells[cell]
+            self.counts[zone][capacity] -= 1
+            del self.members[zone][taxi]
+            del self.locations[taxi]
+        if location is not None:
+            cell, capacity, zone, _ = location
+            self.cells.setdefault(cell, {}).setdefault(capacity, {})[taxi] = None
+            counts = self.counts.setdefault(zone, {})
+            counts[capacity] = counts.get(capacity, 0) + 1
+            self.members.setdefault(zone, {})[taxi] = None
+            self.locations[taxi] = location
+
+    # Returns the taxi a scan of the passenger group's zones would dispatch, or None. The first
+    # taxi inside the instant dispatch range in zone-list order wins; failing that, the closest
+    # taxi wins with ties going to the earliest in zone-list order. If specified, accept(taxis,
+    # pg, distances) is called to confirm candidates before one is chosen; it's given a batch of
+    # taxis and their distances from the group and returns a list of flags. If specified,
+    # locate(taxi) returns a taxi's current position where the index may not have seen it yet,
+    # and every candidate is scored at its current position.
+    def get_closest_taxi(self, pg, accept=None, locate=None):
+        ranks = {zone: rank for rank, zone in enumerate(pg.zones)}
+        src_pos = pg.src_pos
+
+        # Count the taxis we're looking for so we can stop as soon as we've seen them all.
+        remaining = 0
+        for zone in pg.zones:
+            for capacity, count in self.counts.get(zone, {}).items():
+                if capacity >= pg.size:
+                    remaining += count
+        if remaining == 0:
+            return None
+        if remaining <= DIRECT_LIMIT or locate is not None:
+            return self.get_closest_direct(pg, ranks, accept, locate)
+
+        # The search area is the block of cells covering the group's zones, plus a margin of
+        # one cell to allow for rounding at zone boundaries.
+        zone_rows = [zone[0] for zone in pg.zones]
+        zone_cols = [zone[1] for zone in pg.zones]
+        min_row = min(zone_rows) * SUBDIVISIONS - 1
+        max_row = (max(zone_rows) + 1) * SUBDIVISIONS
+        min_col = min(zone_cols) * SUBDIVISIONS - 1
+        max_col = (max(zone_cols) + 1) * SUBDIVISIONS
+        max_lat = max(abs(min_row), abs(max_row + 1)) / self.scale
+
+        row, col = self.get_cell(src_pos)
+        max_ring = max(row - min_row, max_row - row, col - min_col, max_col - col)
+        candidates = []
+        accepted = {}
+        checked_instant = False
+
+        for ring in range(max_ring + 1):
+            ring_taxis = []
+            for dr, dc in get_ring(ring):
+                buckets = self.cells.get((row + dr, col + dc))
+                if buckets is None:
+                    continue
+                for capacity, taxis in buckets.items():
+                    if capacity >= pg.size:
+                        ring_taxis.extend(taxis)
+
+            # Score the ring's candidates in a single batch.
+            ring_taxis = [taxi for taxi in ring_taxis if self.zones[taxi] in ranks]
+            positions = [taxi.position for taxi in ring_taxis]
+            for taxi, dist in zip(ring_taxis, utils.distances(src_pos, positions)):
+                rank = ranks[self.zones[taxi]]
+                heapq.heappush(candidates, (dist, rank, self.seqs[taxi], taxi))
+            remaining -= len(ring_taxis)
+
+            if ring < max_ring and remaining > 0:
+                bound = self.get_bound(src_pos, row, col, ring, max_lat)
+            else:
+                bound = math.inf
+
+            # Every taxi inside the instant dispatch range has now been seen.
+            if not checked_instant and bound >= params.INSTANT_DISPATCH_RANGE:
+                checked_instant = True
+                instant = [c for c in candidates if c[0] < params.INSTANT_DISPATCH_RANGE]
+                instant.sort(key=lambda c: (c[1], c[2]))
+                taxi = self.get_first_accepted(instant, pg, accept, accepted)
+                if taxi:
+                    return taxi
+
+            # The closest candidate wins if no unsearched taxi can be as close. Rejected
+            # candidates are discarded for good.
+            if checked_instant:
+                closest = []
+                while candidates and candidates[0][0] < bound:
+                    closest.append(heapq.heappop(candidates))
+                taxi = self.get_first_accepted(closest, pg, accept, accepted)
+                if taxi:
+                    return taxi
+
+        return None
+
+    # Returns the taxi get_closest_taxi() would dispatch by scoring every candidate in the
+    # passenger group's zones at once.
+    def get_closest_direct(self, pg, ranks, accept, locate=None):
+        taxis = []
+        for zone in pg.zones:
+            for taxi in self.members.get(zone, ()):
+                if self.locations[taxi][1] >= pg.size:
+                    taxis.append(taxi)
+        if locate is None:
+            positions = [taxi.position for taxi in taxis]
+        else:
+            positions = [locate(taxi) for taxi in taxis]
+        dists = utils.distances(pg.src_pos, positions)
+        candidates = [
+            (dist, ranks[self.zones[taxi]], self.seqs[taxi], taxi)
+            for taxi, dist in zip(taxis, dists)
+        ]
+        instant = [c for c in candidates if c[0] < params.INSTANT_DISPATCH_RANGE]
+        if accept is None:
+            if instant:
+                return min(instant, key=lambda c: (c[1], c[2]))[3]
+            return min(candidates)[3] if candidates else None
+        candidates.sort()
+        instant.sort(key=lambda c: (c[1], c[2]))
+        return self.get_first_accepted(instant + candidates, pg, accept, {})
+
+    # Returns the taxi of the first candidate in the list that passes the acceptance check, or
+    # None. Candidates that haven't been checked before are checked in a single batch and the
+    # results are cached in accepted.
+    def get_first_accepted(self, candidates, pg, accept, accepted):
+        if accept is None:
+            return candidates[0][3] if candidates else None
+        unchecked = {c[3]: c[0] for c in candidates if c[3] not in accepted}
+        if unchecked:
+            flags = accept(list(unchecked), pg, list(unchecked.values()))
+            accepted.update(zip(unchecked, flags))
+        for candidate in candidates:
+            if accepted[candidate[3]]:
+                return candidate[3]
+        return None
+
+    # Returns a lower bound in meters on the distance from the position to any point outside
+    # the square of cells within the specified ring of the center cell.
+    def get_bound(self, pos, row, col, ring, max_lat):
+        dlat = min(pos[0] - (row - ring) / self.scale, (row + ring + 1) / self.scale - pos[0])
+        dlong = min(pos[1] - (col - ring) / self.scale, (col + ring + 1) / self.scale - pos[1])
+        bound = utils.distance_bound(max(dlat, 0), max(dlong, 0), max_lat)
+        # Allow for rounding in the cell calculation and in the distance formula.
+        return bound * (1 - 1e-9) - 1e-6
+
+
+# Returns the (row, column) offsets of the cells in the square ring at the specified distance
+# from a center cell. Offsets are cached as they're needed on every query.
+def get_ring(ring):
+    if ring not in ring_cache:
+        if ring == 0:
+            ring_cache[ring] = [(0, 0)]
+        else:
+            offsets = [(-ring, dc) for dc in range(-ring, ring + 1)]
+            for dr in range(-ring + 1, ring):
+                offsets.append((dr, -ring))
+                offsets.append((dr, ring))
+            offsets.extend((ring, dc) for dc in range(-ring, ring + 1))
+            ring_cache[ring] = offsets
+    return ring_cache[ring]
+
+
+ring_cache = {}
@@ -0,0 +1,297 @@
+import concurrent.futures
+import datetime as dt
+import os
+import shutil
+import tempfile
+
+from . import manhattan
+from . import utils
+from . import requestfile
+from .requestfile import RequestFile
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Filter settings for the raw TLC trip data. A trip becomes a request if its pickup is in the
+# specified year and month and in [start_hour, end_hour), its duration in seconds is in
+# [min_duration, max_duration], its passenger count is in [min_size, max_size] and both of its
+# endpoints are in Manhattan.
+DEFAULT_SETTINGS = {
+    "year": 2016,
+    "month": 2,
+    "start_hour": 8,
+    "end_hour": 12,
+    "min_duration": 60,
+    "max_duration": 3600,
+    "min_size": 1,
+    "max_size": 8,
+}
+
+
+# Number of fields in a TLC trip record and the indices of the fields we use.
+NUM_FIELDS = 19
+PU_TIME, DO_TIME, SIZE, PU_LONG, PU_LAT, DO_LONG, DO_LAT = 1, 2, 3, 5, 6, 9, 10
+
+
+# Names of the parsed columns, in the order of parse_line()'s tuples.
+COLUMN_NAMES = ("pu_time", "do_time", "size", "pu_lat", "pu_long", "do_lat", "do_long")
+
+
+# Size in bytes of the chunks the CSV file is split into for parallel processing.
+CHUNK_SIZE = 64 * 1024 * 1024
+
+
+# Number of lines below which a block that fails bulk conversion is parsed line by line.
+MIN_BLOCK = 1024
+
+
+# Returns a list of (start, end) byte ranges covering the CSV file's records, skipping the
+# header line. Each range ends at the end of a line.
+def get_chunks(path, chunk_size=CHUNK_SIZE):
+    chunks = []
+    with open(path, 'rb') as file:
+        file.readline()
+        start = file.tell()
+        file_size = os.fstat(file.fileno()).st_size
+        while start < file_size:
+            file.seek(min(start + chunk_size, file_size))
+            file.readline()
+            end = min(file.tell(), file_size)
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+
+# Parses a single CSV line the way the original line-by-line filter did. Returns a tuple of
+# (pickup_time, dropoff_time, size, pu_lat, pu_long, do_lat, do_long) with times in seconds since
+# the epoch, or None if the line is malformed.
+def parse_line(line):
+    elements = line.decode().split(',')
+    if len(elements) != NUM_FIELDS:
+        return None
+    try:
+        pu_time = dt.datetime.fromisoformat(elements[PU_TIME])
+        do_time = dt.datetime.fromisoformat(elements[DO_TIME])
+        size = int(elements[SIZE])
+        pu_long = float(elements[PU_LONG])
+        pu_lat = float(elements[PU_LAT])
+        do_long = float(elements[DO_LONG])
+        do_lat = float(elements[DO_LAT])
+    except Exception as e:
+        print(e)
+        return None
+    return (
+        utils.to_seconds(pu_time), utils.to_seconds(do_time), size,
+        pu_lat, pu_long, do_lat, do_long
+    )
+
+
+# Parses a list of CSV lines into a dictionary of column arrays, skipping lines without the
+# right number of fields. Lines are converted by NumPy in bulk, and only the pickup times are
+# converted for lines outside the settings' pickup window. If a value fails to convert, the lines
+# are split in half and each half is retried, down to blocks of MIN_BLOCK lines which are parsed
+# line by line so malformed lines are skipped exactly as before.
+def parse_lines(lines, settings):
+    lines = [line for line in lines if line.count(b',') == NUM_FIELDS - 1]
+    try:
+        return convert_lines(lines, settings)
+    except ValueError:
+        pass
+    if len(lines) > MIN_BLOCK:
+        middle = len(lines) // 2
+        first = parse_lines(lines[:middle], settings)
+        second = parse_lines(lines[middle:], settings)
+        return {name: np.concatenate((first[name], second[name])) for name in first}
+    records = [record for record in map(parse_line, lines) if record is not None]
+    columns = {}
+    for index, name in enumerate(COLUMN_NAMES):
+        dtype = np.int64 if index < 3 else float
+        columns[name] = np.array([record[index] for record in records], dtype=dtype)
+    return columns
+
+
+# Converts the used fields of a list of well-formed CSV lines into column arrays, dropping lines
+# with pickups outside the pickup window. Raises ValueError if a value can't be converted.
+def convert_lines(lines, settings):
+    fields = b','.join(lines).decode().split(',')
+    pu_time = get_column(fields[PU_TIME::NUM_FIELDS], "datetime64[s]").astype(np.int64)
+    rows = np.flatnonzero(in_window(pu_time, settings)).tolist()
+    def get_selected(index, dtype):
+        values = fields[index::NUM_FIELDS]
+        return get_column([values[row] for row in rows], dtype)
+    return {
+        "pu_time": pu_time[rows],
+        "do_time": get_selected(DO_TIME, "datetime64[s]").astype(np.int64),
+        "size": get_selected(SIZE, np.int64),
+        "pu_lat": get_selected(PU_LAT, float),
+        "pu_long": get_selected(PU_LONG, float),
+        "do_lat": get_selected(DO_LAT, float),
+        "do_long": get_selected(DO_LONG, float),
+    }
+
+
+# Returns a list of strings converted to an array of the specified type. The strings are
+# converted as str rather than bytes as NumPy can crash converting bytes to datetimes when a
+# value fails to parse.
+def get_column(values, dtype):
+    return np.array(values, dtype=str).astype(dtype)
+
+
+# Returns a boolean array selecting the pickup times in the settings' year, month and hours.
+def in_window(pu_time, settings):
+    months = (pu_time // 86400).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    hours = pu_time // 3600 % 24
+    return (
+        (months // 12 + 1970 == settings["year"]) &
+        (months % 12 + 1 == settings["month"]) &
+        (hours >= settings["start_hour"]) & (hours < settings["end_hour"])
+    )
+
+
+# Returns a boolean array selecting the parsed trips that pass the filter settings.
+def select(columns, settings):
+    duration = columns["do_time"] - columns["pu_time"]
+    size = columns["size"]
+    return (
+        in_window(columns["pu_time"], settings) &
+        (duration >= settings["min_duration"]) & (duration <= settings["max_duration"]) &
+        manhattan.in_manhattan_arrays(columns["pu_lat"], columns["pu_long"]) &
+        manhattan.in_manhattan_arrays(columns["do_lat"], columns["do_long"]) &
+        (size >= settings["min_size"]) & (size <= settings["max_size"])
+    )
+
+
+# Returns the (lat, long) zones of the positions and their counts as a list of (zone, count)
+# tuples in order of each zone's first appearance.
+def count_zones(lats, longs):
+    if len(lats) == 0:
+        return []
+    zones = np.stack([np.floor(lats * 100), np.floor(longs * 100)], axis=1).astype(np.int64)
+    unique, first, counts = np.unique(zones, axis=0, return_index=True, return_counts=True)
+    order = np.argsort(first)
+    return [(tuple(unique[i].tolist()), int(counts[i])) for i in order]
+
+
+# Filters the specified byte range of the CSV file and writes the surviving requests for each
+# day, in time order, to a part file in part_dir named after the chunk number and the day.
+# Returns the chunk's statistics.
+def filter_chunk(path, start, end, chunk_num, part_dir, settings):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        lines = file.read(end - start).split(b'\n')
+    columns = parse_lines(lines, settings)
+    selected = select(columns, settings)
+    columns = {name: values[selected] for name, values in columns.items()}
+    # Zones are counted in file order, as the line-by-line filter counted them.
+    zones = count_zones(columns["pu_lat"], columns["pu_long"])
+    order = np.argsort(columns["pu_time"], kind="stable")
+    columns = {name: values[order] for name, values in columns.items()}
+
+    size = columns["size"]
+    distances = utils.distance_arrays(
+        columns["pu_lat"], columns["pu_long"], columns["do_lat"], columns["do_long"]
+    )
+    stats = {
+        "num_requests": len(size),
+        "num_big_requests": int((size > 4).sum()),
+        "max_request_size": int(size.max()) if len(size) else 0,
+        "speed_total": float((distances / (columns["do_time"] - columns["pu_time"])).sum()),
+        "sizes": dict(zip(*(values.tolist() for values in np.unique(size, return_counts=True)))),
+        "zones": zones,
+        "days": {},
+    }
+
+    days = (columns["pu_time"] // 86400).astype("datetime64[D]")
+    day_nums = (days - days.astype("datetime64[M]")).astype(np.int64) + 1
+    for day in np.unique(day_nums).tolist():
+        in_day = day_nums == day
+        requestfile.write_arrays(get_part_path(part_dir, chunk_num, day), {
+            "src_lat": columns["pu_lat"][in_day],
+            "src_long": columns["pu_long"][in_day],
+            "dst_lat": columns["do_lat"][in_day],
+            "dst_long": columns["do_long"][in_day],
+            "time": columns["pu_time"][in_day],
+            "size": size[in_day],
+        })
+        stats["days"][day] = int(in_day.sum())
+    return stats
+
+
+def get_part_path(part_dir, chunk_num, day):
+    return os.path.join(part_dir, f"part-{chunk_num:05d}-{day:02d}.requests")
+
+
+# Combines the parts of a day's requests, in chunk order, into a single request file sorted by
+# time. The sort is stable so requests with the same time keep their order in the CSV file.
+def merge_parts(paths, output_path):
+    columns = {name: [] for name, _ in requestfile.COLUMNS}
+    for path in paths:
+        with RequestFile(path) as requests:
+            for name, values in requests.arrays().items():
+                if name == "time":
+                    values = values.astype(np.int64) + requests.base_time
+                columns[name].append(np.array(values))
+    columns = {name: np.concatenate(values) for name, values in columns.items()}
+    order = np.argsort(columns["time"], kind="stable")
+    requestfile.write_arrays(output_path, {name: values[order] for name, values in columns.items()})
+
+
+# Filters a TLC trip CSV file into one request file per day in output_dir, splitting the file
+# into chunks that are parsed and filtered in parallel worker processes; the default is one
+# worker per CPU. Settings override DEFAULT_SETTINGS. Returns statistics for the filtered
+# requests as a dictionary: num_requests, num_big_requests, max_request_size, mean_speed in
+# meters per second, sizes and days mapping sizes and days to request counts, and zones mapping
+# each pickup zone to its request count in order of first appearance.
+def filter_csv(path, output_dir, settings=None, workers=None, chunk_size=CHUNK_SIZE):
+    if np is None:
+        raise ImportError("filter_csv() requires NumPy")
+    settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+    os.makedirs(output_dir, exist_ok=True)
+    part_dir = tempfile.mkdtemp(dir=output_dir)
+    try:
+        chunks = get_chunks(path, chunk_size)
+        args = [(path, start, end, num, part_dir, settings)
+            for num, (start, end) in enumerate(chunks)]
+        if workers == 1:
+            results = [filter_chunk(*a) for a in args]
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(filter_chunk, *zip(*args)))
+
+        stats = {
+            "num_requests": 0,
+            "num_big_requests": 0,
+            "max_request_size": 0,
+            "mean_speed": 0,
+            "sizes": {},
+            "days": {},
+            "zones": {},
+        }
+        speed_total = 0
+        for result in results:
+            stats["num_requests"] += result["num_requests"]
+            stats["num_big_requests"] += result["num_big_requests"]
+            stats["max_request_size"] = max(
+                stats["max_request_size"], result["max_request_size"]
+            )
+            speed_total += result["speed_total"]
+            for name in ("sizes", "days"):
+                for key, count in result[name].items():
+                    stats[name][key] = stats[name].get(key, 0) + count
+            for zone, count in result["zones"]:
+                stats["zones"][zone] = stats["zones"].get(zone, 0) + count
+        if stats["num_requests"]:
+            stats["mean_speed"] = speed_total / stats["num_requests"]
+
+        for day in sorted(stats["days"]):
+            parts = [get_part_path(part_dir, num, day)
+                for num, result in enumerate(results) if day in result["days"]]
+            year, month = settings["year"], settings["month"]
+            output_path = os.path.join(output_dir, f"{year}-{month:02d}-{day:02d}.requests")
+            merge_parts(parts, output_path)
+    finally:
+        shutil.rmtree(part_dir)
+    return stats
@@ -0,0 +1,397 @@
+import collections
+import random
+
+from . import params
+from . import manhattan
+from .taxi import Taxi, Choice
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Codes used in checkpoints for a taxi's last choice.
+CHOICES = [None, Choice.explore, Choice.exploit]
+
+
+# A QTensor instance holds the Q-values of a whole fleet in a single NumPy array of shape
+# (num_taxis, MAXSIZE, 3), indexed by taxi, state (size - 1) and action (-1, 0, +1). Creating a
+# QTensor copies each taxi's existing Q-values into the array and replaces the taxi's q_table
+# with a QTableView of its slice, so code written against the per-taxi QTable interface keeps
+# working and writes straight into the array. A boolean array of shape (num_taxis, MAXSIZE)
+# records which states each taxi has visited, i.e. the states a QTable would have entries for.
+#
+# Action selection and Q-value updates can then be run for the whole fleet at once. Random
+# draws come from a NumPy generator seeded from the random module, so random.seed() controls
+# batched training runs as it does per-taxi ones.
+class QTensor:
+
+    def __init__(self, taxis, seed=None):
+        if np is None:
+            raise ImportError("QTensor requires NumPy")
+        self.taxis = list(taxis)
+        self.maxsize = params.MAXSIZE
+        self.values = np.zeros((len(self.taxis), self.maxsize, 3))
+        self.visited = np.zeros((len(self.taxis), self.maxsize), dtype=bool)
+        for index, taxi in enumerate(self.taxis):
+            for state, qvals in taxi.q_table.table.items():
+                self.values[index, state - 1] = qvals
+                self.visited[index, state - 1] = True
+            taxi.q_table = QTableView(self, index)
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return len(self.taxis)
+
+    # Epsilon-greedy action selection for every taxi at once. Each taxi explores with
+    # probability p_explore, choosing uniformly among the actions that keep its size within
+    # [1, MAXSIZE], and otherwise exploits, choosing the action with the highest Q-value with
+    # ties broken at random. Sets each taxi's last state, action and choice and its new size.
+    def choose_actions(self):
+        num_taxis = len(self.taxis)
+        rows = np.arange(num_taxis)
+        sizes = np.array([taxi.size for taxi in self.taxis])
+        p_explore = np.array([taxi.p_explore for taxi in self.taxis])
+        explore = self.rng.random(num_taxis) < p_explore
+
+        low = np.where(sizes == 1, 0, -1)
+        high = np.where(sizes == self.maxsize, 0, 1)
+        explore_actions = low + (self.rng.random(num_taxis) * (high - low + 1)).astype(int)
+
+        qvals = self.values[rows, sizes - 1]
+        best = qvals == qvals.max(axis=1, keepdims=True)
+        exploit_actions = np.where(best, self.rng.random((num_taxis, 3)), -1).argmax(axis=1) - 1
+
+        actions = np.where(explore, explore_actions, exploit_actions)
+        self.visited[rows[~explore], sizes[~explore] - 1] = True
+        for taxi, action, explored in zip(self.taxis, actions.tolist(), explore.tolist()):
+            taxi.last_choice = Choice.explore if explored else Choice.exploit
+            taxi.last_state = taxi.size
+            taxi.last_action = action
+            taxi.size += action
+
+    # Q-learning update for every taxi at once, equivalent to calling Taxi.update_q_table() on
+    # each taxi. Rewards default to each taxi's reward for the last run.
+    def update(self, rewards=None):
+        if rewards is None:
+            rewards = [taxi.reward for taxi in self.taxis]
+        rows = np.arange(len(self.taxis))
+        old_states = np.array([taxi.last_state for taxi in self.taxis]) - 1
+        new_states = np.array([taxi.size for taxi in self.taxis]) - 1
+        actions = np.array([taxi.last_action for taxi in self.taxis]) + 1
+        self.visited[rows, old_states] = True
+        self.visited[rows, new_states] = True
+        targets = np.asarray(rewards) + params.GAMMA * self.values[rows, new_states].max(axis=1)
+        self.values[rows, old_states, actions] = (
+            (1 - params.ALPHA) * self.values[rows, old_states, actions] +
+            params.ALPHA * targets
+        )
+
+    # Returns each taxi's greedy action in every state as an array of shape (num_taxis, MAXSIZE).
+    # Ties go to the lowest action.
+    def get_policy(self):
+        return self.values.argmax(axis=2) - 1
+
+    # Returns the fleet's learning state as a dictionary of arrays: the Q-values and visited
+    # states plus each taxi's ID, size, exploration probability and last choice.
+    def get_state(self):
+        return {
+            "values": self.values,
+            "visited": self.visited,
+            "ids": np.array([taxi.id for taxi in self.taxis]),
+            "sizes": np.array([taxi.size for taxi in self.taxis]),
+            "p_explore": np.array([taxi.p_explore for taxi in self.taxis]),
+            "last_states": np.array([taxi.last_state or 0 for taxi in self.taxis]),
+            "last_actions": np.array([encode_action(taxi.last_action) for taxi in self.taxis]),
+            "last_choices": np.array([CHOICES.index(taxi.last_choice) for taxi in self.taxis]),
+        }
+
+    # Returns a QTensor for a fleet of new taxis with the learning state from get_state().
+    # Taxis are given random positions. States saved without visited states count every state
+    # with a nonzero Q-value as visited, along with the smallest and largest sizes.
+    @staticmethod
+    def from_state(state, seed=None):
+        if state["values"].shape[1] != params.MAXSIZE:
+            raise ValueError("learning state has a different MAXSIZE")
+        taxis = []
+        for index, id in enumerate(state["ids"].tolist()):
+            taxi = Taxi(id, int(state["sizes"][index]), manhattan.get_rand_pos())
+            taxi.p_explore = float(state["p_explore"][index])
+            taxi.last_state = int(state["last_states"][index]) or None
+            taxi.last_action = decode_action(int(state["last_actions"][index]))
+            taxi.last_choice = CHOICES[int(state["last_choices"][index])]
+            taxis.append(taxi)
+        tensor = QTensor(taxis, seed)
+        tensor.values[...] = state["values"]
+        if "visited" in state:
+            tensor.visited[...] = state["visited"]
+        else:
+            tensor.visited |= (state["values"] != 0).any(axis=2)
+        return tensor
+
+    # Write the fleet's learning state to a single .npz file.
+    def save(self, path):
+        with open(path, 'wb') as file:
+            np.savez(file, **self.get_state())
+
+    # Returns a QTensor restored from a file written by save().
+    @staticmethod
+    def load(path, seed=None):
+        with np.load(path) as data:
+            return QTensor.from_state({name: data[name] for name in data.files}, seed)
+
+
+# An STensor instance holds the Monte Carlo sample tables of a whole fleet as NumPy arrays of
+# shape (num_taxis, MAXSIZE), indexed by taxi and state (size - 1): the number of times each size
+# has been sampled, the mean reward over those samples and the order in which the sizes were
+# first sampled, which an STable keeps as its insertion order. As with QTensor, creating an
+# STensor replaces each taxi's s_table with an STableView of its row so the per-taxi interface
+# still works.
+class STensor:
+
+    def __init__(self, taxis, seed=None):
+        if np is None:
+            raise ImportError("STensor requires NumPy")
+        self.taxis = list(taxis)
+        self.maxsize = params.MAXSIZE
+        self.counts = np.zeros((len(self.taxis), self.maxsize), dtype=np.int64)
+        self.values = np.zeros((len(self.taxis), self.maxsize))
+        self.order = np.zeros((len(self.taxis), self.maxsize), dtype=np.int64)
+        self.next_order = 1
+        for index, taxi in enumerate(self.taxis):
+            for state, (n, sval) in taxi.s_table.items():
+                self.counts[index, state - 1] = n
+                self.values[index, state - 1] = sval
+                self.add_state(index, state)
+            taxi.s_table = STableView(self, index)
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return len(self.taxis)
+
+    # Give every taxi a size drawn uniformly from [1, MAXSIZE].
+    def assign_random_sizes(self):
+        sizes = self.rng.integers(1, self.maxsize + 1, len(self.taxis))
+        for taxi, size in zip(self.taxis, sizes.tolist()):
+            taxi.size = size
+
+    # Incremental mean update of every taxi's sample value for its current size, equivalent to
+    # calling Taxi.update_s_table() on each taxi. Rewards default to each taxi's reward for the
+    # last run.
+    def update(self, rewards=None):
+        if rewards is None:
+            rewards = [taxi.reward for taxi in self.taxis]
+        rows = np.arange(len(self.taxis))
+        states = np.array([taxi.size for taxi in self.taxis]) - 1
+        new = self.counts[rows, states] == 0
+        self.order[rows[new], states[new]] = self.next_order
+        self.next_order += 1
+        self.counts[rows, states] += 1
+        self.values[rows, states] += (
+            (np.asarray(rewards) - self.values[rows, states]) / self.counts[rows, states]
+        )
+
+    # Record that a taxi sampled a state for the first time.
+    def add_state(self, index, state):
+        if not self.order[index, state - 1]:
+            self.order[index, state - 1] = self.next_order
+            self.next_order += 1
+
+    # Returns each taxi's best size: the sampled size with the highest positive sample value,
+    # with ties going to the size sampled first as in an STable, or 0 if no sampled size has a
+    # positive value.
+    def get_best_sizes(self):
+        values = np.where(self.counts > 0, self.values, 0)
+        best_values = values.max(axis=1)
+        tied = (values == best_values[:, None]) & (self.counts > 0)
+        best = np.where(tied, self.order, np.iinfo(np.int64).max).argmin(axis=1)
+        return np.where(best_values > 0, best + 1, 0)
+
+    # Set every taxi's size to its best size.
+    def assign_best_sizes(self):
+        for taxi, size in zip(self.taxis, self.get_best_sizes().tolist()):
+            taxi.size = size
+
+    # Returns the fleet's learning state as a dictionary of arrays: each taxi's ID, size and
+    # exploration probability plus the sample counts, values and order. Unsampled states have a
+    # count and order of 0.
+    def get_state(self):
+        return {
+            "ids": np.array([taxi.id for taxi in self.taxis]),
+            "sizes": np.array([taxi.size for taxi in self.taxis]),
+            "p_explore": np.array([taxi.p_explore for taxi in self.taxis]),
+            "s_counts": self.counts,
+            "s_values": self.values,
+            "s_order": self.order,
+        }
+
+    # Returns an STensor for a fleet of new taxis with the learning state from get_state().
+    # Taxis are given random positions. States saved without a sample order treat smaller
+    # sizes as sampled first.
+    @staticmethod
+    def from_state(state, seed=None):
+        if state["s_counts"].shape[1] != params.MAXSIZE:
+            raise ValueError("learning state has a different MAXSIZE")
+        taxis = []
+        for index, id in enumerate(state["ids"].tolist()):
+            taxi = Taxi(id, int(state["sizes"][index]), manhattan.get_rand_pos())
+            taxi.p_explore = float(state["p_explore"][index])
+            taxis.append(taxi)
+        tensor = STensor(taxis, seed)
+        tensor.counts[...] = state["s_counts"]
+        tensor.values[...] = state["s_values"]
+        if "s_order" in state:
+            tensor.order[...] = state["s_order"]
+        else:
+            tensor.order[...] = np.where(state["s_counts"] > 0, np.arange(1, tensor.maxsize + 1), 0)
+        tensor.next_order = int(tensor.order.max()) + 1
+        return tensor
+
+
+# Last actions are stored as 0, 1 or 2 for -1, 0 or +1, and 3 for none.
+def encode_action(action):
+    return 3 if action is None else action + 1
+
+
+def decode_action(code):
+    return None if code == 3 else code - 1
+
+
+# A ConvergenceMonitor instance tracks how a fleet's learning changes from run to run. After each
+# run it's given the taxis' sizes, their learned values and their policies as arrays with one
+# row per taxi, and records three measures of change since the previous run:
+#
+#   size_change  -- the fraction of the fleet that would have to change size to turn the previous
+#                   size distribution into the new one.
+#   value_change -- the mean absolute change in the learned values, summed per taxi.
+#   policy_flips -- the fraction of taxis whose policy changed.
+#
+# Learning has converged once every measure has stayed within its tolerance for the last window
+# runs.
+class ConvergenceMonitor:
+
+    def __init__(self, window=50, size_tol=0.01, value_tol=0.01, flip_tol=0.01):
+        if np is None:
+            raise ImportError("ConvergenceMonitor requires NumPy")
+        self.window = window
+        self.tolerances = {
+            "size_change": size_tol,
+            "value_change": value_tol,
+            "policy_flips": flip_tol,
+        }
+        self.reset()
+
+    # Forget all previous runs, e.g. when the training schedule changes phase.
+    def reset(self):
+        self.last = None
+        self.history = collections.deque(maxlen=self.window)
+
+    # Record the state after a run. Returns a dictionary of the changes since the previous run,
+    # or None for the first run after a reset.
+    def update(self, sizes, values, policy):
+        sizes = np.asarray(sizes)
+        values = np.array(values)
+        policy = np.array(policy)
+        counts = np.bincount(sizes, minlength=params.MAXSIZE + 1)
+        last, self.last = self.last, (counts, values, policy)
+        if last is None:
+            return None
+        last_counts, last_values, last_policy = last
+        changes = {
+            "size_change": np.abs(counts - last_counts).sum() / 2 / len(sizes),
+            "value_change": np.abs(values - last_values).sum() / len(sizes),
+            "policy_flips": np.mean((policy != last_policy).reshape(len(sizes), -1).any(axis=1)),
+        }
+        changes = {name: float(value) for name, value in changes.items()}
+        self.history.append(changes)
+        return changes
+
+    @property
+    def converged(self):
+        if len(self.history) < self.window:
+            return False
+        for changes in self.history:
+            for name, tolerance in self.tolerances.items():
+                if changes[name] > tolerance:
+                    return False
+        return True
+
+
+# A QTableView instance presents one taxi's slice of a QTensor through the QTable interface.
+# Indexing by state returns a view of the state's three Q-values in the tensor and, as with a
+# QTable, marks the state as visited.
+class QTableView:
+
+    __slots__ = ["tensor", "index"]
+
+    def __init__(self, tensor, index):
+        self.tensor = tensor
+        self.index = index
+
+    def __getitem__(self, state):
+        self.tensor.visited[self.index, state - 1] = True
+        return self.tensor.values[self.index, state - 1]
+
+    def __str__(self):
+        lines = []
+        for state, qvals in sorted(self.table.items()):
+            rowstr = ", ".join(f"{qval:8.4f}" for qval in qvals)
+            lines.append(f"{state:2d}: [{rowstr}]")
+        return "\n".join(lines)
+
+    # Returns a copy of the taxi's Q-values as a dictionary mapping visited states to lists.
+    @property
+    def table(self):
+        rows = self.tensor.values[self.index].tolist()
+        visited = self.tensor.visited[self.index].tolist()
+        return {state: rows[state - 1] for state, seen in enumerate(visited, 1) if seen}
+
+
+# An STableView instance presents one taxi's row of an STensor through the STable interface.
+# Entries are (count, value) tuples and only sampled states have entries.
+class STableView:
+
+    __slots__ = ["tensor", "index"]
+
+    def __init__(self, tensor, index):
+        self.tensor = tensor
+        self.index = index
+
+    def __getitem__(self, state):
+        if state not in self:
+            raise KeyError(state)
+        n = int(self.tensor.counts[self.index, state - 1])
+        return (n, float(self.tensor.values[self.index, state - 1]))
+
+    def __setitem__(self, state, svals):
+        self.tensor.counts[self.index, state - 1] = svals[0]
+        self.tensor.values[self.index, state - 1] = svals[1]
+        self.tensor.add_state(self.index, state)
+
+    def __contains__(self, state):
+        return 1 <= state <= self.tensor.maxsize and self.tensor.counts[self.index, state - 1] > 0
+
+    def __str__(self):
+        lines = []
+        for state, svals in sorted(self.table.items()):
+            lines.append(f"{state:2d}: [{svals[0]:3d}, {svals[1]:8.4f}]")
+        return "\n".join(lines)
+
+    def items(self):
+        return self.table.items()
+
+    # Returns a copy of the taxi's sample table as a dictionary mapping sampled states to
+    # (count, value) tuples, in the order the states were first sampled.
+    @property
+    def table(self):
+        counts = self.tensor.counts[self.index].tolist()
+        values = self.tensor.values[self.index].tolist()
+        order = self.tensor.order[self.index].tolist()
+        states = [state for state, n in enumerate(counts, 1) if n > 0]
+        states.sort(key=lambda state: order[state - 1])
+        return {state: (counts[state - 1], values[state - 1]) for state in states}
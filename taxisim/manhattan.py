@@ -1,6 +1,12 @@
+import math
 import random
 from . import utils
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 # Bounding boxes for Manhattan identified by the (lat, long) coordinates of the
 # box's (bottom_left, top_right) corners.
@@ -22,12 +28,130 @@ bounding_boxes = [
 ]
 
 
-# Returns true if a (lat, long) position is in Manhattan.
+# Side length in degrees of the cells of the Manhattan raster.
+RASTER_RESOLUTION = 0.001
+
+
+# Returns true if a (lat, long) position is in Manhattan, i.e. in one of the bounding boxes.
 def in_manhattan(pos):
-    for box in bounding_boxes:
-        if utils.in_box(pos, box):
-            return True
-    return False
+    return get_raster().contains(pos)
+
+
+# Vectorized version of in_manhattan() for arrays of latitudes and longitudes. Returns a boolean
+# array.
+def in_manhattan_arrays(lats, longs):
+    return get_raster().contains_arrays(lats, longs)
+
+
+# Returns the raster for the bounding boxes, building it on first use. Call set_raster_resolution()
+# to rebuild it at a different resolution, e.g. after changing the bounding boxes.
+def get_raster():
+    global raster
+    if raster is None:
+        raster = Raster(bounding_boxes, RASTER_RESOLUTION)
+    return raster
+
+
+def set_raster_resolution(resolution):
+    global raster, RASTER_RESOLUTION
+    RASTER_RESOLUTION = resolution
+    raster = None
+
+
+raster = None
+
+
+# A Raster instance answers point-in-boxes queries with the same result as testing each box with
+# utils.in_box(), in constant time. The extent of the boxes is divided into square cells and
+# each cell is marked as inside a box, outside every box, or on a boundary. Only points in
+# boundary cells are tested against the boxes, and only against the boxes that touch the cell.
+#
+# Cells are classified with a small margin, much larger than any rounding error in computing a
+# point's cell but much smaller than a cell, so a point that rounds into a neighbouring cell is
+# still covered by that cell's classification.
+class Raster:
+
+    OUTSIDE, INSIDE, BOUNDARY = 0, 1, 2
+
+    def __init__(self, boxes, resolution):
+        self.boxes = list(boxes)
+        self.min_lat = min(box[0][0] for box in self.boxes)
+        self.min_long = min(box[0][1] for box in self.boxes)
+        self.max_lat = max(box[1][0] for box in self.boxes)
+        self.max_long = max(box[1][1] for box in self.boxes)
+        self.scale = 1 / resolution
+        self.num_rows = max(math.ceil((self.max_lat - self.min_lat) * self.scale), 1)
+        self.num_cols = max(math.ceil((self.max_long - self.min_long) * self.scale), 1)
+        self.cells = bytearray(self.num_rows * self.num_cols)
+        self.candidates = {}
+        self.grid = None
+
+        margin = resolution * 1e-6
+        for row in range(self.num_rows):
+            lat_lo = self.min_lat + row * resolution - margin
+            lat_hi = self.min_lat + (row + 1) * resolution + margin
+            for col in range(self.num_cols):
+                long_lo = self.min_long + col * resolution - margin
+                long_hi = self.min_long + (col + 1) * resolution + margin
+                touching = []
+                for (bl_lat, bl_long), (tr_lat, tr_long) in self.boxes:
+                    if bl_lat <= lat_lo and lat_hi <= tr_lat:
+                        if bl_long <= long_lo and long_hi <= tr_long:
+                            self.cells[row * self.num_cols + col] = Raster.INSIDE
+                            break
+                    if bl_lat <= lat_hi and tr_lat >= lat_lo:
+                        if bl_long <= long_hi and tr_long >= long_lo:
+                            touching.append(((bl_lat, bl_long), (tr_lat, tr_long)))
+                else:
+                    if touching:
+                        self.cells[row * self.num_cols + col] = Raster.BOUNDARY
+                        self.candidates[row * self.num_cols + col] = touching
+
+    # Returns true if the (lat, long) position is in one of the boxes.
+    def contains(self, pos):
+        lat, long = pos
+        if not (lat >= self.min_lat and lat <= self.max_lat):
+            return False
+        if not (long >= self.min_long and long <= self.max_long):
+            return False
+        row = min(int((lat - self.min_lat) * self.scale), self.num_rows - 1)
+        col = min(int((long - self.min_long) * self.scale), self.num_cols - 1)
+        cell = row * self.num_cols + col
+        code = self.cells[cell]
+        if code == Raster.BOUNDARY:
+            for box in self.candidates[cell]:
+                if utils.in_box(pos, box):
+                    return True
+            return False
+        return code == Raster.INSIDE
+
+    # Vectorized version of contains() for arrays of latitudes and longitudes. Returns a boolean
+    # array.
+    def contains_arrays(self, lats, longs):
+        if np is None:
+            raise ImportError("Raster.contains_arrays() requires NumPy")
+        if self.grid is None:
+            self.grid = np.frombuffer(bytes(self.cells), dtype=np.uint8)
+        lats, longs = np.asarray(lats, dtype=float), np.asarray(longs, dtype=float)
+        result = np.zeros(lats.shape, dtype=bool)
+        indices = np.flatnonzero(
+            (lats >= self.min_lat) & (lats <= self.max_lat) &
+            (longs >= self.min_long) & (longs <= self.max_long)
+        )
+        lats, longs = lats.ravel()[indices], longs.ravel()[indices]
+        rows = np.minimum(((lats - self.min_lat) * self.scale).astype(int), self.num_rows - 1)
+        cols = np.minimum(((longs - self.min_long) * self.scale).astype(int), self.num_cols - 1)
+        codes = self.grid[rows * self.num_cols + cols]
+        inside = codes == Raster.INSIDE
+        boundary = np.flatnonzero(codes == Raster.BOUNDARY)
+        lats, longs = lats[boundary], longs[boundary]
+        in_boxes = np.zeros(len(boundary), dtype=bool)
+        for (bl_lat, bl_long), (tr_lat, tr_long) in self.boxes:
+            in_lats = (lats >= bl_lat) & (lats <= tr_lat)
+            in_boxes |= in_lats & (longs >= bl_long) & (longs <= tr_long)
+        inside[boundary] = in_boxes
+        result.ravel()[indices] = inside
+        return result
 
 
 # Zone centers for the busiest zones for pickups, as determined from historical demand.
@@ -41,11 +41,29 @@ MAXSIZE = 16
 # Derived parameters.
 # ----------------------------------------------------------------------------------------
 
-# Distance in meters a taxi can travel in one tick.
-TICK_DIST = TAXI_SPEED * TICK_TIME
+# Names of the derived parameters. These are overwritten by derive() and can't be set directly.
+DERIVED = ("TICK_DIST", "INSTANT_DISPATCH_RANGE", "REPO_PROB")
 
-# Instant dispatch radius in meters.
-INSTANT_DISPATCH_RANGE = TAXI_SPEED * INSTANT_DISPATCH_RADIUS * 60
 
-# Per-tick probability of an idle taxi repositioning.
-REPO_PROB = (1 / (MEAN_REPO_TIME * 60)) * TICK_TIME
+# Returns True if the name is a direct parameter, i.e. one that can be set before calling
+# derive().
+def is_direct(name):
+    return name.isupper() and name not in DERIVED and name in globals()
+
+
+# Recalculate the derived parameters from the direct parameters. This must be called after
+# changing a direct parameter.
+def derive():
+    global TICK_DIST, INSTANT_DISPATCH_RANGE, REPO_PROB
+
+    # Distance in meters a taxi can travel in one tick.
+    TICK_DIST = TAXI_SPEED * TICK_TIME
+
+    # Instant dispatch radius in meters.
+    INSTANT_DISPATCH_RANGE = TAXI_SPEED * INSTANT_DISPATCH_RADIUS * 60
+
+    # Per-tick probability of an idle taxi repositioning.
+    REPO_PROB = (1 / (MEAN_REPO_TIME * 60)) * TICK_TIME
+
+
+derive()
@@ -0,0 +1,173 @@
+import array
+import mmap
+import os
+import pickle
+import struct
+import sys
+
+from . import utils
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# A request file stores a day's request tuples in columnar form: a fixed 32-byte header followed
+# by one fixed-width array per field. Files are read through mmap so opening one creates no
+# per-request objects; request tuples are only built as the simulation consumes them.
+#
+# Header: magic (8 bytes), format version (uint32), byte order (uint32, 1 for little-endian),
+# base time in seconds since the epoch (int64), request count (uint64).
+#
+# Columns, in file order: source latitude, source longitude, destination latitude, destination
+# longitude (float64), time offset in seconds from the base time (uint32), group size (uint8).
+# The float columns come first so every column is naturally aligned.
+MAGIC = b"TAXIREQS"
+VERSION = 1
+HEADER = struct.Struct("<8sIIqQ")
+COLUMNS = (("src_lat", "d"), ("src_long", "d"), ("dst_lat", "d"), ("dst_long", "d"),
+    ("time", "I"), ("size", "B"))
+
+
+# Write a list of request tuples to a request file. Request times can be datetimes or integer
+# seconds since the epoch; requests must be in time order.
+def write_requests(path, requests):
+    requests = utils.convert_requests(requests)
+    base_time = requests[0][0] if requests else 0
+    columns = {
+        "src_lat": array.array("d", (req[2][0] for req in requests)),
+        "src_long": array.array("d", (req[2][1] for req in requests)),
+        "dst_lat": array.array("d", (req[3][0] for req in requests)),
+        "dst_long": array.array("d", (req[3][1] for req in requests)),
+        "time": array.array("I", (req[0] - base_time for req in requests)),
+        "size": array.array("B", (req[1] for req in requests)),
+    }
+    byte_order = 1 if sys.byteorder == "little" else 0
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, byte_order, base_time, len(requests)))
+        for name, typecode in COLUMNS:
+            columns[name].tofile(file)
+
+
+# Write columns of requests to a request file. Columns is a dictionary of equal-length arrays
+# keyed by column name; times are integer seconds since the epoch. Requests must be in time order.
+def write_arrays(path, columns):
+    if np is None:
+        raise ImportError("write_arrays() requires NumPy")
+    times = np.asarray(columns["time"], dtype=np.int64)
+    base_time = int(times[0]) if len(times) else 0
+    columns = dict(columns, time=times - base_time)
+    byte_order = 1 if sys.byteorder == "little" else 0
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, byte_order, base_time, len(times)))
+        for name, typecode in COLUMNS:
+            np.asarray(columns[name]).astype(typecode).tofile(file)
+
+
+# Convert a pickled list of request tuples, as written by older versions of run_filter.py, to a
+# request file. The file is written under a temporary name and renamed into place so a partly
+# written file is never left behind. Returns the number of requests converted.
+def convert_pickle(pickle_path, path):
+    with open(pickle_path, 'rb') as file:
+        requests = pickle.load(file)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    write_requests(tmp_path, requests)
+    os.replace(tmp_path, path)
+    return len(requests)
+
+
+# A RequestFile instance is a read-only, memory-mapped view of a request file. It behaves as a
+# sequence of (time, size, source, destination) request tuples with times in seconds since the
+# epoch, and can be passed directly to World.add_requests(). The arrays() method returns the
+# columns as NumPy arrays for vectorized processing.
+class RequestFile:
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, byte_order, self.base_time, self.count = HEADER.unpack_from(self.mmap)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"not a version {VERSION} request file: {path}")
+        if byte_order != (1 if sys.byteorder == "little" else 0):
+            raise ValueError(f"request file has the wrong byte order: {path}")
+
+        self.view = memoryview(self.mmap)
+        self.offsets = {}
+        self.columns = {}
+        offset = HEADER.size
+        for name, typecode in COLUMNS:
+            length = self.count * struct.calcsize(typecode)
+            self.offsets[name] = offset
+            self.columns[name] = self.view[offset:offset + length].cast(typecode)
+            offset += length
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("request index out of range")
+        c = self.columns
+        return (
+            self.base_time + c["time"][index],
+            c["size"][index],
+            (c["src_lat"][index], c["src_long"][index]),
+            (c["dst_lat"][index], c["dst_long"][index]),
+        )
+
+    def __iter__(self):
+        return RequestCursor(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # Returns a dictionary of NumPy arrays, one per column, backed by the mapped file. Times
+    # are offsets in seconds from the base_time attribute.
+    def arrays(self):
+        if np is None:
+            raise ImportError("RequestFile.arrays() requires NumPy")
+        arrays = {}
+        for name, typecode in COLUMNS:
+            arrays[name] = np.frombuffer(
+                self.mmap, dtype=typecode, count=self.count, offset=self.offsets[name]
+            )
+        return arrays
+
+    # Release the mapping. Any request tuples already built remain valid. If NumPy arrays from
+    # arrays() are still alive the mapping is left for them and freed when they are.
+    def close(self):
+        for column in self.columns.values():
+            column.release()
+        self.columns = {}
+        self.view.release()
+        try:
+            self.mmap.close()
+        except BufferError:
+            pass
+
+
+# A RequestCursor instance iterates over a RequestFile's request tuples from the specified index.
+# The index of the next request to be read is kept in the cursor's index attribute so a World
+# snapshot can record how far through the file the simulation has got.
+class RequestCursor:
+
+    def __init__(self, requests, index=0):
+        self.requests = requests
+        self.index = index
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.index >= len(self.requests):
+            raise StopIteration
+        request = self.requests[self.index]
+        self.index += 1
+        return request
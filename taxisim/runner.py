@@ -0,0 +1,126 @@
+import concurrent.futures
+import contextlib
+import datetime as dt
+import os
+import random
+import warnings
+
+from . import dataset
+from . import params as params_module
+from .taxi import make_taxis
+from .world import World
+from .requestfile import RequestFile, convert_pickle
+
+
+# Directory containing the per-day request files.
+REQUEST_DIR = "data/requests"
+
+
+# Returns the path of the request file for the specified day in February 2016.
+def get_request_path(day, request_dir=REQUEST_DIR):
+    return os.path.join(request_dir, f"2016-02-{day:02d}.requests")
+
+
+# Returns the path of the pickled request list for the specified day, as written by older
+# versions of run_filter.py.
+def get_pickle_path(day, request_dir=REQUEST_DIR):
+    return os.path.join(request_dir, f"2016-02-{day:02d}.pickle")
+
+
+# Returns the list of days in the interval that have a request file or a pickled request list.
+def get_available_days(start_day, end_day, request_dir=REQUEST_DIR):
+    days = range(start_day, end_day + 1)
+    return [day for day in days if os.path.exists(get_request_path(day, request_dir))
+        or os.path.exists(get_pickle_path(day, request_dir))]
+
+
+# Opens the request file for the specified day. If the day only has a pickled request list it is
+# converted to a request file on first use.
+def open_requests(day, request_dir=REQUEST_DIR):
+    path = get_request_path(day, request_dir)
+    if not os.path.exists(path):
+        pickle_path = get_pickle_path(day, request_dir)
+        if not os.path.exists(pickle_path):
+            raise FileNotFoundError(f"no request file for day {day}: {path}")
+        convert_pickle(pickle_path, path)
+    return RequestFile(path)
+
+
+# Warns if the request directory isn't current with the source data it was exported from by
+# run_filter.py, as recorded in its manifest. Returns True if it's current.
+def check_requests(request_dir=REQUEST_DIR, cache_dir=dataset.CACHE_DIR):
+    problem = dataset.check(request_dir, cache_dir)
+    if problem:
+        warnings.warn(f"{problem}; re-run scripts/run_filter.py to rebuild it", stacklevel=2)
+    return problem is None
+
+
+# Returns the seed for a day's random number generator. Each day's run depends only on the
+# base seed and the day so results don't depend on how days are spread across processes.
+def get_day_seed(seed, day):
+    return seed * 100 + day
+
+
+# Context manager that sets the specified direct parameters in the params module, recalculating
+# the derived parameters, and restores the original values on exit.
+@contextlib.contextmanager
+def override_params(values):
+    saved = {}
+    for name in values:
+        if not params_module.is_direct(name):
+            raise ValueError(f"not a direct parameter: {name}")
+        saved[name] = getattr(params_module, name)
+    try:
+        for name, value in values.items():
+            setattr(params_module, name, value)
+        params_module.derive()
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(params_module, name, value)
+        params_module.derive()
+
+
+# Simulates a single day from 08:00 with a fresh fleet and returns the day's metrics. The fleet
+# is a dictionary mapping taxi sizes to counts. If specified, params is a dictionary of values
+# for the params module that apply to this run only. Any extra keyword arguments other than
+# request_dir are passed on to the World constructor.
+def run_day(day, fleet, ridesharing=False, seed=0, params=None, **kwargs):
+    request_dir = kwargs.pop("request_dir", REQUEST_DIR)
+    with override_params(params or {}):
+        random.seed(get_day_seed(seed, day))
+        world = World(ridesharing=ridesharing, **kwargs)
+        for size, count in fleet.items():
+            world.add_taxis(make_taxis(count, size=size))
+        world.time = dt.datetime(2016, 2, day, 8)
+        with open_requests(day, request_dir) as requests:
+            world.add_requests(requests)
+            world.run()
+    return {
+        'timeouts': world.timeout_percent,
+        'wait_time': world.mean_wait_time,
+        'journey_time': world.mean_journey_time,
+    }
+
+
+# Simulates each of the days independently and yields (day, metrics) tuples as days complete.
+# Days are farmed out to a pool of worker processes; the default is one worker per CPU. With a
+# single worker days run in order in the current process.
+def iter_days(days, fleet, ridesharing=False, seed=0, workers=None, **kwargs):
+    if workers == 1:
+        for day in days:
+            yield day, run_day(day, fleet, ridesharing, seed, **kwargs)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for day in days:
+            future = executor.submit(run_day, day, fleet, ridesharing, seed, **kwargs)
+            futures[future] = day
+        for future in concurrent.futures.as_completed(futures):
+            yield futures[future], future.result()
+
+
+# Simulates each of the days independently and returns a dictionary mapping days to metrics.
+def run_days(days, fleet, ridesharing=False, seed=0, workers=None, **kwargs):
+    metrics = dict(iter_days(days, fleet, ridesharing, seed, workers, **kwargs))
+    return {day: metrics[day] for day in sorted(metrics)}
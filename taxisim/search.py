@@ -0,0 +1,112 @@
+import datetime as dt
+import math
+import random
+
+from . import params as params_module
+from . import runner
+from .taxi import make_taxis
+from .world import World
+
+
+# Service thresholds: a fleet must keep the timeout percentage and the mean wait time in minutes
+# at or below these values on every day.
+MAX_TIMEOUT_PERCENT = 0.5
+MAX_WAIT_TIME = 5
+
+
+# Returns the largest number of passenger groups a request of the specified size can become by
+# repeated splitting.
+def get_max_groups(size):
+    if size < params_module.SPLIT_SIZE:
+        return 1
+    half = int(size / 2)
+    return get_max_groups(half) + get_max_groups(size - half)
+
+
+# Returns the largest number of timeouts a day's requests can have while the day can still meet
+# the timeout threshold. Splitting only adds requests so the limit assumes every group splits as
+# far as it can; once a run's timeouts exceed the limit, the threshold is certain to be missed.
+# The threshold defaults to MAX_TIMEOUT_PERCENT.
+def get_max_timeouts(sizes, max_timeout_percent=None):
+    if max_timeout_percent is None:
+        max_timeout_percent = MAX_TIMEOUT_PERCENT
+    max_groups = {}
+    max_requests = 0
+    for size in sizes:
+        if size not in max_groups:
+            max_groups[size] = get_max_groups(size)
+        max_requests += max_groups[size]
+    return math.floor(max_requests * max_timeout_percent / 100)
+
+
+# Runs the days in order on a single World with a fleet of num_taxis taxis, stopping at the first
+# day that misses a threshold. A day is aborted as soon as its timeouts guarantee a miss. Returns
+# a (passed, metrics) tuple where metrics maps each day that was run to its metrics; the metrics
+# of an aborted day are as they stood when the day was aborted. Extra keyword arguments other
+# than taxi_size and request_dir are passed on to the World constructor.
+def run_candidate(num_taxis, days, ridesharing=False, seed=0, params=None, **kwargs):
+    taxi_size = kwargs.pop("taxi_size", 4)
+    request_dir = kwargs.pop("request_dir", runner.REQUEST_DIR)
+    metrics = {}
+    with runner.override_params(params or {}):
+        world = World(ridesharing=ridesharing, **kwargs)
+        world.add_taxis(make_taxis(num_taxis, size=taxi_size))
+        for day in days:
+            random.seed(runner.get_day_seed(seed, day))
+            world.time = dt.datetime(2016, 2, day, 8)
+            with runner.open_requests(day, request_dir) as requests:
+                max_timeouts = get_max_timeouts(requests.columns["size"])
+                world.add_requests(requests)
+                world.reset_taxis()
+                world.reset_metrics()
+                world.run(max_timeouts)
+            metrics[day] = {
+                'timeouts': world.timeout_percent,
+                'wait_time': world.mean_wait_time,
+                'journey_time': world.mean_journey_time,
+                'aborted': world.aborted,
+            }
+            if world.aborted or world.mean_wait_time > MAX_WAIT_TIME:
+                return False, metrics
+            if world.timeout_percent > MAX_TIMEOUT_PERCENT:
+                return False, metrics
+    return True, metrics
+
+
+# Searches for the smallest fleet that meets the thresholds on every day, to within the specified
+# resolution. The fleet size gallops upwards from start_taxis, doubling the step until a fleet
+# passes, then bisects between the largest failing and smallest passing sizes. Assumes that
+# adding taxis never makes a fleet fail. Yields (num_taxis, passed, metrics) for each candidate
+# as it's run; the last candidate yielded with passed set is the result.
+def iter_search(days, ridesharing=False, start_taxis=1000, resolution=50, **kwargs):
+    low, high = None, None
+    num_taxis, step = start_taxis, resolution
+    while high is None:
+        passed, metrics = run_candidate(num_taxis, days, ridesharing, **kwargs)
+        yield num_taxis, passed, metrics
+        if passed:
+            high = num_taxis
+        else:
+            low = num_taxis
+            num_taxis += step
+            step *= 2
+    if low is None:
+        low = 0
+    while high - low > resolution:
+        num_taxis = (low + high) // 2
+        passed, metrics = run_candidate(num_taxis, days, ridesharing, **kwargs)
+        yield num_taxis, passed, metrics
+        if passed:
+            high = num_taxis
+        else:
+            low = num_taxis
+
+
+# Returns the smallest fleet size that meets the thresholds on every day, as found by
+# iter_search().
+def find_fleet_size(days, ridesharing=False, start_taxis=1000, resolution=50, **kwargs):
+    result = None
+    for num_taxis, passed, _ in iter_search(days, ridesharing, start_taxis, resolution, **kwargs):
+        if passed:
+            result = num_taxis
+    return result
@@ -0,0 +1,485 @@
+import array
+import collections
+import concurrent.futures
+import heapq
+import itertools
+import os
+import random
+import struct
+import sys
+
+from . import utils
+from . import runner
+from .taxi import Taxi, Leg, Status, Task, Choice
+from .world import World, PassengerGroup, RequestQueue
+from .requestfile import RequestFile, RequestCursor
+
+
+# A snapshot captures the state of a World between runs -- e.g. after World.run(until=...) has
+# paused it -- so the simulation can be resumed later or forked into several continuations.
+# Restoring a snapshot and calling run() continues exactly as the original World would have.
+#
+# Snapshots are binary: a 16-byte header followed by a sequence of typed arrays, each prefixed
+# with its length. Taxis, tasks, legs and passenger groups are stored column-wise with object
+# references replaced by list indices. The snapshot includes the clock, the world's metrics,
+# the dispatch queue, the pickup list, timeout and split deadlines, the zone lists and spatial
+# index order, each taxi's tasks, leg and learning tables, the state of the random module, and
+# the remaining requests. Requests still to be read from a RequestFile are recorded as a path
+# and index; any other request source is read to the end and stored in full.
+#
+# Taxi position logs are not captured and the World's spatial index and tick schedule are
+# rebuilt on restore.
+MAGIC = b"TAXISNAP"
+VERSION = 1
+HEADER = struct.Struct("<8sII")
+
+STATUSES = list(Status)
+TASKS = list(Task)
+CHOICES = [None] + list(Choice)
+NONE = -1
+
+
+class Writer:
+
+    def __init__(self):
+        self.chunks = []
+
+    def put(self, typecode, values):
+        values = array.array(typecode, values)
+        self.chunks.append(struct.pack("<Q", len(values)))
+        self.chunks.append(values.tobytes())
+
+    def put_string(self, value):
+        self.put('B', value.encode())
+
+    def getvalue(self):
+        return b"".join(self.chunks)
+
+
+class Reader:
+
+    def __init__(self, data, offset):
+        self.view = memoryview(data)
+        self.offset = offset
+
+    def get(self, typecode):
+        count, = struct.unpack_from("<Q", self.view, self.offset)
+        self.offset += 8
+        values = array.array(typecode)
+        size = count * values.itemsize
+        values.frombytes(self.view[self.offset:self.offset + size])
+        self.offset += size
+        return values
+
+    def get_string(self):
+        return self.get('B').tobytes().decode()
+
+
+# Returns a snapshot of the world as a bytes object.
+def dumps(world):
+    if world.events:
+        raise ValueError("can't snapshot a world during an event-driven run")
+    out = Writer()
+    byte_order = 1 if sys.byteorder == "little" else 0
+    header = HEADER.pack(MAGIC, VERSION, byte_order)
+
+    # Settings, clock and metrics.
+    out.put('B', (world.ridesharing, world.log_ticks, world.fleet_engine, world.event_driven))
+    out.put('q', (world.clock, world.num_ticks, world.num_rounds, world.num_splits))
+    out.put('q', (world.num_requests, world.num_dropoffs, world.num_timeouts))
+    out.put('d', (world.mean_dispatch_time, world.mean_pickup_time, world.mean_journey_time))
+
+    # Passenger groups are numbered in the order they're found.
+    pgs, pg_indices = [], {}
+    def add_pg(pg):
+        if pg is not None and pg not in pg_indices:
+            pg_indices[pg] = len(pgs)
+            pgs.append(pg)
+    for pg in world.dispatch_queue:
+        add_pg(pg)
+    for pg in world.pickups:
+        add_pg(pg)
+    for taxi in world.taxis:
+        for _, _, pg in taxi.tasks:
+            add_pg(pg)
+    put_groups(out, pgs)
+
+    out.put('q', (pg_indices[pg] for pg in world.dispatch_queue))
+    out.put('q', (pg_indices[pg] for pg in world.pickups))
+    out.put('q', (world.indices[taxi] for taxi in world.pickups.values()))
+    for heap in (world.timeouts, world.split_deadlines):
+        entries = [entry for entry in heap if entry[2] in world.dispatch_queue]
+        out.put('q', (entry[0] for entry in entries))
+        out.put('q', (pg_indices[entry[2]] for entry in entries))
+
+    put_taxis(out, world, pg_indices)
+
+    # Zone lists, dispatch bookkeeping and index order.
+    out.put('i', itertools.chain.from_iterable(world.zones))
+    out.put('q', (len(taxis) for taxis in world.zones.values()))
+    out.put('q', (world.indices[taxi] for taxis in world.zones.values() for taxi in taxis))
+    out.put('i', itertools.chain.from_iterable(world.dirty_zones))
+    out.put('i', itertools.chain.from_iterable(world.zone_rounds))
+    out.put('q', world.zone_rounds.values())
+    index = world.index
+    out.put('i', itertools.chain.from_iterable(index.zones[taxi] for taxi in world.taxis))
+    out.put('q', (index.seqs[taxi] for taxi in world.taxis))
+    out.put('q', (peek_count(index, "seq_iter"), peek_count(PassengerGroup, "id_iter")))
+
+    # Random module state.
+    version, internal, gauss_next = random.getstate()
+    out.put('q', (version,))
+    out.put('I', internal)
+    out.put('d', () if gauss_next is None else (gauss_next,))
+
+    put_requests(out, world.request_queue)
+    return header + out.getvalue()
+
+
+# Returns a World restored from a snapshot. By default the World has the settings of the world
+# the snapshot was taken from; keyword arguments override the World constructor arguments. The
+# random module's state is restored unless restore_random is false.
+def loads(data, restore_random=True, **kwargs):
+    magic, version, byte_order = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"not a version {VERSION} world snapshot")
+    if byte_order != (1 if sys.byteorder == "little" else 0):
+        raise ValueError("world snapshot has the wrong byte order")
+    inp = Reader(data, HEADER.size)
+
+    ridesharing, log_ticks, fleet_engine, event_driven = map(bool, inp.get('B'))
+    settings = {
+        "ridesharing": ridesharing,
+        "log_ticks": log_ticks,
+        "fleet_engine": fleet_engine,
+        "event_driven": event_driven,
+    }
+    settings.update(kwargs)
+    world = World(**settings)
+    world.clock, world.num_ticks, world.num_rounds, world.num_splits = inp.get('q')
+    world.num_requests, world.num_dropoffs, world.num_timeouts = inp.get('q')
+    world.mean_dispatch_time, world.mean_pickup_time, world.mean_journey_time = inp.get('d')
+
+    pgs = get_groups(inp)
+    for i in inp.get('q'):
+        world.dispatch_queue.append(pgs[i])
+    for i, taxi_index in zip(inp.get('q'), inp.get('q')):
+        world.pickups[pgs[i]] = taxi_index
+    for heap in (world.timeouts, world.split_deadlines):
+        for deadline, i in zip(inp.get('q'), inp.get('q')):
+            heap.append((deadline, id(pgs[i]), pgs[i]))
+        heapq.heapify(heap)
+
+    taxis = get_taxis(inp, pgs)
+    world.taxis = taxis
+    world.indices = {taxi: i for i, taxi in enumerate(taxis)}
+    for pg, taxi_index in world.pickups.items():
+        world.pickups[pg] = taxis[taxi_index]
+
+    zones = pairs(inp.get('i'))
+    lengths = inp.get('q')
+    members = iter(inp.get('q'))
+    world.zones = {}
+    for zone, length in zip(zones, lengths):
+        world.zones[zone] = [taxis[next(members)] for _ in range(length)]
+    dirty_zones = pairs(inp.get('i'))
+    world.zone_rounds = dict(zip(pairs(inp.get('i')), inp.get('q')))
+    index = world.index
+    for taxi, zone, seq in zip(taxis, pairs(inp.get('i')), inp.get('q')):
+        index.zones[taxi] = zone
+        index.seqs[taxi] = seq
+    next_seq, next_group_id = inp.get('q')
+    index.seq_iter = itertools.count(next_seq)
+    for taxi in taxis:
+        index.update(taxi, index.zones[taxi])
+
+    # Rebuilding the index marks every zone with an available taxi, so the dirty zones are
+    # restored afterwards.
+    world.dirty_zones.clear()
+    world.dirty_zones.update(dirty_zones)
+    next_group_id = max(next_group_id, peek_count(PassengerGroup, "id_iter"))
+    PassengerGroup.id_iter = itertools.count(next_group_id)
+
+    version, = inp.get('q')
+    internal = tuple(inp.get('I'))
+    gauss_next = inp.get('d')
+    if restore_random:
+        random.setstate((version, internal, gauss_next[0] if gauss_next else None))
+
+    world.request_queue = get_requests(inp)
+    return world
+
+
+# Write a snapshot of the world to a file.
+def save(world, path):
+    with open(path, 'wb') as file:
+        file.write(dumps(world))
+
+
+# Returns a World restored from a snapshot file.
+def load(path, restore_random=True, **kwargs):
+    with open(path, 'rb') as file:
+        return loads(file.read(), restore_random, **kwargs)
+
+
+# Restores the snapshot and runs it to the end, returning the world's metrics. If specified,
+# params is a dictionary of params values for this run only and seed reseeds the random module
+# after the snapshot is restored so forks with different seeds diverge. Extra keyword arguments
+# are passed on to loads().
+def run_fork(data, seed=None, params=None, **kwargs):
+    with runner.override_params(params or {}):
+        world = loads(data, **kwargs)
+        if seed is not None:
+            random.seed(seed)
+        world.run()
+    return {
+        'timeouts': world.timeout_percent,
+        'wait_time': world.mean_wait_time,
+        'journey_time': world.mean_journey_time,
+    }
+
+
+# Runs a what-if continuation of the snapshot for each variant, a dictionary of keyword arguments
+# for run_fork(), e.g. {"seed": 1, "params": {"TIMEOUT": 15}}. Forks are farmed out to a pool of
+# worker processes; with a single worker they run in order in the current process. Yields
+# (index, metrics) tuples as forks complete, where index is the variant's position in the list.
+def iter_forks(data, variants, workers=None):
+    if workers == 1:
+        for i, variant in enumerate(variants):
+            yield i, run_fork(data, **variant)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for i, variant in enumerate(variants):
+            futures[executor.submit(run_fork, data, **variant)] = i
+        for future in concurrent.futures.as_completed(futures):
+            yield futures[future], future.result()
+
+
+def put_groups(out, pgs):
+    out.put('q', (pg.request_time for pg in pgs))
+    out.put('q', (pg.size for pg in pgs))
+    out.put('d', (x for pg in pgs for x in pg.src_pos + pg.dst_pos))
+    out.put('d', (pg.rs_distance_limit for pg in pgs))
+    for attr in ("dispatch_time", "pickup_time", "dropoff_time", "evaluated"):
+        out.put('q', (encode(getattr(pg, attr)) for pg in pgs))
+    out.put('q', (pg.group_id for pg in pgs))
+    out.put('B', (pg.split_due for pg in pgs))
+
+
+def get_groups(inp):
+    request_times = inp.get('q')
+    sizes = inp.get('q')
+    coords = inp.get('d')
+    limits = inp.get('d')
+    times = [inp.get('q') for _ in range(4)]
+    group_ids = inp.get('q')
+    split_dues = inp.get('B')
+    pgs = []
+    for i in range(len(request_times)):
+        pg = PassengerGroup.__new__(PassengerGroup)
+        pg.request_time = request_times[i]
+        pg.size = sizes[i]
+        pg.src_pos = (coords[4*i], coords[4*i + 1])
+        pg.dst_pos = (coords[4*i + 2], coords[4*i + 3])
+        pg.rs_distance_limit = limits[i]
+        pg.dispatch_time = decode(times[0][i])
+        pg.pickup_time = decode(times[1][i])
+        pg.dropoff_time = decode(times[2][i])
+        pg.evaluated = decode(times[3][i])
+        pg.group_id = group_ids[i]
+        pg.zones = utils.get_neighbouring_zones(pg.src_pos)
+        pg.split_due = bool(split_dues[i])
+        pgs.append(pg)
+    return pgs
+
+
+def put_taxis(out, world, pg_indices):
+    taxis = world.taxis
+    out.put('q', (taxi.id for taxi in taxis))
+    out.put('q', (taxi.size for taxi in taxis))
+    out.put('q', (taxi.num_passengers for taxi in taxis))
+    out.put('q', (taxi.num_pending_pickups for taxi in taxis))
+    out.put('B', (STATUSES.index(taxi.status) for taxi in taxis))
+    out.put('B', (taxi.logging for taxi in taxis))
+    out.put('d', (x for taxi in taxis for x in taxi.position))
+    out.put('d', (taxi.total_dist for taxi in taxis))
+    out.put('d', (taxi.weighted_dist for taxi in taxis))
+    out.put('d', (taxi.p_explore for taxi in taxis))
+    out.put('q', (encode(taxi.last_state) for taxi in taxis))
+    out.put('q', (2 if taxi.last_action is None else taxi.last_action for taxi in taxis))
+    out.put('B', (CHOICES.index(taxi.last_choice) for taxi in taxis))
+
+    # Tasks.
+    out.put('q', (len(taxi.tasks) for taxi in taxis))
+    tasks = [task for taxi in taxis for task in taxi.tasks]
+    out.put('d', (x for task in tasks for x in task[0]))
+    out.put('B', (TASKS.index(task[1]) for task in tasks))
+    out.put('q', (NONE if task[2] is None else pg_indices[task[2]] for task in tasks))
+
+    # Legs.
+    legs = [taxi.leg for taxi in taxis]
+    out.put('B', (leg is not None for leg in legs))
+    legs = [leg for leg in legs if leg is not None]
+    out.put('d', (x for leg in legs for x in leg.origin + leg.destination + leg.unit))
+    out.put('d', (x for leg in legs for x in (leg.length, leg.travelled)))
+    out.put('q', (x for leg in legs for x in (leg.start, leg.steps, leg.travelled_steps)))
+
+    # Learning tables.
+    out.put('q', (len(taxi.q_table.table) for taxi in taxis))
+    out.put('q', (state for taxi in taxis for state in taxi.q_table.table))
+    out.put('d', (q for taxi in taxis for qvals in taxi.q_table.table.values() for q in qvals))
+    out.put('q', (len(taxi.s_table.table) for taxi in taxis))
+    out.put('q', (state for taxi in taxis for state in taxi.s_table.table))
+    out.put('q', (svals[0] for taxi in taxis for svals in taxi.s_table.table.values()))
+    out.put('d', (svals[1] for taxi in taxis for svals in taxi.s_table.table.values()))
+
+
+def get_taxis(inp, pgs):
+    ids = inp.get('q')
+    sizes = inp.get('q')
+    num_passengers = inp.get('q')
+    num_pending_pickups = inp.get('q')
+    statuses = inp.get('B')
+    logging = inp.get('B')
+    positions = inp.get('d')
+    total_dists = inp.get('d')
+    weighted_dists = inp.get('d')
+    p_explores = inp.get('d')
+    last_states = inp.get('q')
+    last_actions = inp.get('q')
+    last_choices = inp.get('B')
+
+    num_tasks = inp.get('q')
+    task_coords = inp.get('d')
+    task_kinds = inp.get('B')
+    task_pgs = inp.get('q')
+
+    has_legs = inp.get('B')
+    leg_coords = inp.get('d')
+    leg_dists = inp.get('d')
+    leg_ints = inp.get('q')
+
+    q_counts = inp.get('q')
+    q_states = iter(inp.get('q'))
+    q_values = iter(inp.get('d'))
+    s_counts = inp.get('q')
+    s_states = iter(inp.get('q'))
+    s_counts_n = iter(inp.get('q'))
+    s_values = iter(inp.get('d'))
+
+    taxis = []
+    t, j = 0, 0
+    for i in range(len(ids)):
+        position = (positions[2*i], positions[2*i + 1])
+        taxi = Taxi(ids[i], sizes[i], position, bool(logging[i]))
+        taxi.num_passengers = num_passengers[i]
+        taxi.num_pending_pickups = num_pending_pickups[i]
+        taxi.status = STATUSES[statuses[i]]
+        taxi.total_dist = total_dists[i]
+        taxi.weighted_dist = weighted_dists[i]
+        taxi.p_explore = p_explores[i]
+        taxi.last_state = decode(last_states[i])
+        taxi.last_action = None if last_actions[i] == 2 else last_actions[i]
+        taxi.last_choice = CHOICES[last_choices[i]]
+
+        for _ in range(num_tasks[i]):
+            pos = (task_coords[2*t], task_coords[2*t + 1])
+            pg = None if task_pgs[t] == NONE else pgs[task_pgs[t]]
+            taxi.tasks.append((pos, TASKS[task_kinds[t]], pg))
+            t += 1
+
+        if has_legs[i]:
+            leg = Leg.__new__(Leg)
+            leg.origin = (leg_coords[6*j], leg_coords[6*j + 1])
+            leg.destination = (leg_coords[6*j + 2], leg_coords[6*j + 3])
+            leg.unit = (leg_coords[6*j + 4], leg_coords[6*j + 5])
+            leg.length, leg.travelled = leg_dists[2*j], leg_dists[2*j + 1]
+            leg.start, leg.steps, leg.travelled_steps = leg_ints[3*j:3*j + 3]
+            leg.crossings = None
+            leg.cursor = 0
+            taxi.leg = leg
+            j += 1
+
+        taxi.q_table.table = {}
+        for _ in range(q_counts[i]):
+            taxi.q_table.table[next(q_states)] = [next(q_values) for _ in range(3)]
+        for _ in range(s_counts[i]):
+            taxi.s_table[next(s_states)] = (next(s_counts_n), next(s_values))
+        taxis.append(taxi)
+    return taxis
+
+
+# Request sources are stored as (kind, a, b) triples: for a RequestFile, the index of its path
+# and the index of the next request; for other sources, the range of their requests in the
+# list of stored requests.
+FILE_SOURCE, LIST_SOURCE = 0, 1
+
+
+def put_requests(out, queue):
+    triples, paths, stored = [], [], []
+    if queue.head is not None:
+        triples.append((LIST_SOURCE, 0, 1))
+        stored.append(queue.head)
+    sources = collections.deque()
+    for source in queue.sources:
+        if isinstance(source, RequestCursor):
+            triples.append((FILE_SOURCE, len(paths), source.index))
+            paths.append(os.path.abspath(source.requests.path))
+            sources.append(source)
+        else:
+            # Read the source to the end and hand the world a copy to carry on with.
+            requests = list(source)
+            triples.append((LIST_SOURCE, len(stored), len(stored) + len(requests)))
+            stored.extend(requests)
+            sources.append(iter(requests))
+    queue.sources = sources
+
+    out.put('q', itertools.chain.from_iterable(triples))
+    out.put_string("\n".join(paths))
+    out.put('q', (request[0] for request in stored))
+    out.put('q', (request[1] for request in stored))
+    out.put('d', (x for request in stored for x in request[2] + request[3]))
+
+
+def get_requests(inp):
+    triples = inp.get('q')
+    paths = inp.get_string().split("\n")
+    times = inp.get('q')
+    sizes = inp.get('q')
+    coords = inp.get('d')
+    stored = [
+        (times[i], sizes[i], (coords[4*i], coords[4*i + 1]), (coords[4*i + 2], coords[4*i + 3]))
+        for i in range(len(times))
+    ]
+    queue = RequestQueue()
+    files = {}
+    for i in range(0, len(triples), 3):
+        kind, a, b = triples[i:i + 3]
+        if kind == FILE_SOURCE:
+            if a not in files:
+                files[a] = RequestFile(paths[a])
+            queue.sources.append(RequestCursor(files[a], b))
+        else:
+            queue.sources.append(iter(stored[a:b]))
+    return queue
+
+
+# Returns the next value of a counter attribute without consuming it.
+def peek_count(obj, name):
+    value = next(getattr(obj, name))
+    setattr(obj, name, itertools.count(value))
+    return value
+
+
+# Returns a list of the (row, column) zone pairs in a flattened array.
+def pairs(values):
+    return [(values[i], values[i + 1]) for i in range(0, len(values), 2)]
+
+
+def encode(value):
+    return NONE if value is None else value
+
+
+def decode(value):
+    return None if value == NONE else value
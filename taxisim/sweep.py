@@ -0,0 +1,115 @@
+import concurrent.futures
+import csv
+import itertools
+import os
+
+from . import params
+from . import runner
+
+
+# Sweep settings that describe the run rather than values in the params module. Every other
+# setting in a sweep grid names a direct parameter, e.g. TIMEOUT or TAXI_SPEED.
+SETTINGS = ("num_taxis", "enable_sharing", "taxi_size")
+
+# Metrics recorded for each (config, day) run.
+METRICS = ("timeouts", "wait_time", "journey_time")
+
+
+# Returns a list of configs, one for each point in the grid. The grid is a dictionary mapping
+# setting names to lists of values; each config is a dictionary mapping setting names to
+# single values. Configs must include num_taxis; enable_sharing and taxi_size default to False
+# and 4 respectively. Derived parameters are recalculated for each run so can't be swept.
+def get_configs(grid):
+    if "num_taxis" not in grid:
+        raise ValueError("sweep grid must include num_taxis")
+    for name in grid:
+        if name in params.DERIVED:
+            raise ValueError(f"derived parameters can't be swept: {name}")
+        if name not in SETTINGS and not params.is_direct(name):
+            raise ValueError(f"unknown sweep setting: {name}")
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+
+# Returns the (fleet, ridesharing, params) arguments for runner.run_day() for the config.
+def get_run_args(config):
+    fleet = {config.get("taxi_size", 4): config["num_taxis"]}
+    ridesharing = config.get("enable_sharing", False)
+    values = {name: value for name, value in config.items() if name not in SETTINGS}
+    return fleet, ridesharing, values
+
+
+# Runs every config in the grid on each of the days and yields (config, day, metrics) tuples as
+# runs complete, recording each in the results store. Runs already in the store are skipped so
+# an interrupted sweep picks up where it left off. Runs are farmed out to a pool of worker
+# processes; each run sets its own params values in its worker and restores them afterwards so
+# the params module of the calling process is never touched. Any extra keyword arguments are
+# passed on to runner.run_day().
+def run_sweep(grid, days, store, seed=0, workers=None, **kwargs):
+    runs = []
+    for config in get_configs(grid):
+        for day in days:
+            if not store.has(config, day, seed):
+                runs.append((config, day))
+
+    if workers == 1:
+        for config, day in runs:
+            fleet, ridesharing, values = get_run_args(config)
+            metrics = runner.run_day(day, fleet, ridesharing, seed, values, **kwargs)
+            store.add(config, day, seed, metrics)
+            yield config, day, metrics
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for config, day in runs:
+            fleet, ridesharing, values = get_run_args(config)
+            future = executor.submit(
+                runner.run_day, day, fleet, ridesharing, seed, values, **kwargs
+            )
+            futures[future] = (config, day)
+        for future in concurrent.futures.as_completed(futures):
+            config, day = futures[future]
+            metrics = future.result()
+            store.add(config, day, seed, metrics)
+            yield config, day, metrics
+
+
+# A ResultStore instance is a CSV file holding one row per (config, day) run: the config's
+# settings, the day, the seed, and the run's metrics. Rows are appended and flushed as runs
+# complete. Values are compared as strings, so a stored run matches a config if the settings
+# print the same.
+class ResultStore:
+
+    def __init__(self, path, grid):
+        self.path = path
+        self.names = list(grid)
+        self.fields = self.names + ["day", "seed"] + list(METRICS)
+        self.keys = set()
+        if os.path.exists(path):
+            for row in self.load():
+                self.keys.add(tuple(row[field] for field in self.names + ["day", "seed"]))
+        else:
+            with open(path, 'w', newline='') as file:
+                csv.writer(file).writerow(self.fields)
+
+    # Returns the stored rows as a list of dictionaries mapping field names to strings.
+    def load(self):
+        with open(self.path, newline='') as file:
+            reader = csv.DictReader(file)
+            if reader.fieldnames != self.fields:
+                raise ValueError(f"results file has different fields: {self.path}")
+            return list(reader)
+
+    def get_key(self, config, day, seed):
+        return tuple(str(config[name]) for name in self.names) + (str(day), str(seed))
+
+    def has(self, config, day, seed):
+        return self.get_key(config, day, seed) in self.keys
+
+    def add(self, config, day, seed, metrics):
+        row = [config[name] for name in self.names] + [day, seed]
+        row.extend(metrics[name] for name in METRICS)
+        with open(self.path, 'a', newline='') as file:
+            csv.writer(file).writerow(row)
+        self.keys.add(self.get_key(config, day, seed))
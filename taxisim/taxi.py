@@ -1,4 +1,5 @@
 import enum
+import math
 import sys
 import random
 
@@ -56,7 +57,7 @@ class QTable:
 
 class STable:
 
-    ___slots__ = ["table"]
+    __slots__ = ["table"]
 
     def __init__(self):
         self.table = {}
@@ -87,7 +88,7 @@ class Taxi:
         "weighted_dist", "tasks", "status", "p_explore", "q_table",
         "last_state", "last_action", "last_choice", "num_pending_pickups",
         "logging", "log_positions", "log_pickups", "log_dropoffs",
-        "s_table"
+        "s_table", "leg"
     )
 
     def __init__(self, id, size, position, logging=False):
@@ -110,6 +111,7 @@ class Taxi:
         self.log_dropoffs = []
         self.logging = logging
         self.s_table = STable()
+        self.leg = None
 
     def __str__(self):
         val = f"T{self.id} {self.status.value} "
@@ -140,33 +142,57 @@ class Taxi:
     def capacity(self):
         return self.size - self.num_passengers - self.num_pending_pickups
 
+    # Advance the taxi by one tick. Idle taxis are woken for repositioning by the world.
     def tick(self, world):
-
-        # If we're idle, maybe we should reposition.
-        if self.status == Status.idle and random.random() < params.REPO_PROB:
-            self.append_task(manhattan.get_rand_pos(), Task.reposition)
-            self.status = Status.repositioning
-
         if not self.tasks:
             return
-
+        leg = self.get_leg(world)
+        self.advance(world, leg.travelled_steps + 1)
+
+    # Returns the cached leg towards the destination of the taxi's current task, starting a new
+    # leg from the taxi's current position if necessary.
+    def get_leg(self, world):
+        if self.leg is None:
+            self.leg = Leg(self.position, self.tasks[0][0], world.num_ticks - 1)
+        return self.leg
+
+    # Advance the taxi to the specified number of steps from the start of its current leg. This
+    # method is shared by Taxi.tick() and the event engine.
+    def advance(self, world, steps):
+        leg = self.leg
+        steps = min(steps, leg.steps)
+        arrived = steps == leg.steps
+        if arrived:
+            position, distance = leg.destination, leg.length - leg.travelled
+            self.leg = None
+        else:
+            position = leg.get_position(steps)
+            distance = steps * params.TICK_DIST - leg.travelled
+        leg.travelled += distance
+        leg.travelled_steps = steps
+        self.move(world, position, distance, arrived, leg.get_zone(steps))
+
+    # Start repositioning to a random location.
+    def start_repositioning(self):
+        self.append_task(manhattan.get_rand_pos(), Task.reposition)
+        self.status = Status.repositioning
+
+    # Move the taxi to a new position after travelling the specified distance. If the taxi
+    # has arrived at its destination we process all the tasks located there. The zone of the new
+    # position can be supplied if it's already known.
+    def move(self, world, position, distance, arrived, zone=None):
         if self.logging:
             self.log_positions.append(self.position)
 
         # Remember the zone we started in.
         old_zone = self.zone
 
-        # How far are we from our destination?
-        destination = self.tasks[0][0]
-        distance = utils.distance(self.position, destination)
-
-        # 1. We can reach the destination within this tick.
-        if distance <= params.TICK_DIST:
-            self.position = destination
-            self.total_dist += distance
-            self.weighted_dist += self.get_weighted_dist(distance)
+        self.position = position
+        self.total_dist += distance
+        self.weighted_dist += self.get_weighted_dist(distance)
 
-            while self.tasks and self.tasks[0][0] == destination:
+        if arrived:
+            while self.tasks and self.tasks[0][0] == position:
                 _, task, pg = self.tasks.pop(0)
                 if task == Task.pickup:
                     self.pickup(pg, world)
@@ -175,16 +201,10 @@ class Taxi:
                 elif task == Task.reposition:
                     pass
                 else:
-                    sys.exit(f"Taxi.tick(): unhandled task: {task}")
-
-        # 2. We can't reach the destination within this tick.
-        else:
-            self.total_dist += params.TICK_DIST
-            self.weighted_dist += self.get_weighted_dist(params.TICK_DIST)
-            self.position = utils.interpolate_position(self.position, destination, params.TICK_DIST)
+                    sys.exit(f"Taxi.move(): unhandled task: {task}")
 
         # Have we moved to a new zone? Update the world.
-        new_zone = self.zone
+        new_zone = zone or self.zone
         if new_zone != old_zone:
             world.zones[old_zone].remove(self)
             world.zones.setdefault(new_zone, []).append(self)
@@ -199,6 +219,7 @@ class Taxi:
                 self.status = Status.repositioning
         else:
             self.status = Status.idle
+        world.index.update(self, new_zone)
 
     def choose_action(self):
         if random.random() < self.p_explore:
@@ -245,16 +266,16 @@ class Taxi:
         return dist * self.num_passengers * weight
 
     def pickup(self, pg, world):
-        pg.pickup_time = world.time
+        pg.pickup_time = world.clock
         self.num_passengers += pg.size
         self.num_pending_pickups -= pg.size
         self.append_task(pg.dst_pos, Task.dropoff, pg)
-        world.pickup_list.remove(pg)
+        del world.pickups[pg]
         if self.logging:
             self.log_pickups.append(self.position)
 
     def dropoff(self, pg, world):
-        pg.dropoff_time = world.time
+        pg.dropoff_time = world.clock
         self.num_passengers -= pg.size
         world.update_passenger_metrics(pg)
         if self.logging:
@@ -269,6 +290,7 @@ class Taxi:
 
     def prepend_task(self, pos, task, pg=None):
         self.tasks.insert(0, (pos, task, pg))
+        self.leg = None
 
     def add_pickup_task(self, pg):
         if self.status == Status.repositioning:
@@ -276,3 +298,109 @@ class Taxi:
         self.status = Status.pickup
         self.prepend_task(pg.src_pos, Task.pickup, pg)
         self.num_pending_pickups += pg.size
+
+
+# A Leg instance caches the geometry of a taxi's journey from its position at the start tick to
+# the destination of its current task. The taxi covers TICK_DIST meters per tick by adding a
+# fixed (lat, long) step to the origin, so moving never needs trigonometry. The zones the leg
+# passes through are predicted the first time they're needed. A taxi's leg is discarded when it
+# arrives or when a task is put in front of its current one.
+#
+# Steps are taken along the straight line between the positions' coordinates. This is exact
+# for the planar geometry and lies within a meter of the great circle for Manhattan-sized legs.
+class Leg:
+
+    __slots__ = (
+        "origin", "destination", "start", "length", "steps", "unit", "travelled",
+        "travelled_steps", "crossings", "cursor"
+    )
+
+    def __init__(self, origin, destination, start=0):
+        self.origin = origin
+        self.destination = destination
+        self.start = start
+        self.length = utils.distance(origin, destination)
+        self.steps = max(1, math.ceil(self.length / params.TICK_DIST))
+        f = params.TICK_DIST / self.length if self.length else 0
+        self.unit = ((destination[0] - origin[0]) * f, (destination[1] - origin[1]) * f)
+        self.travelled = 0
+        self.travelled_steps = 0
+        self.crossings = None
+        self.cursor = 0
+
+    # Tick on which the taxi arrives at the destination.
+    @property
+    def arrival(self):
+        return self.start + self.steps
+
+    # Distance in meters still to travel.
+    @property
+    def remaining(self):
+        return self.length - self.travelled
+
+    # Returns the taxi's position after the specified number of steps along the leg.
+    def get_position(self, steps):
+        if steps == 0:
+            return self.origin
+        if steps >= self.steps:
+            return self.destination
+        return (self.origin[0] + steps * self.unit[0], self.origin[1] + steps * self.unit[1])
+
+    # Returns the taxi's zone after the specified number of steps along the leg. Taxis move
+    # forwards along their legs so we resume the search from the last zone returned.
+    def get_zone(self, steps):
+        crossings = self.get_crossings()
+        if steps < crossings[self.cursor][0]:
+            self.cursor = 0
+        while self.cursor + 1 < len(crossings) and crossings[self.cursor + 1][0] <= steps:
+            self.cursor += 1
+        return crossings[self.cursor][1]
+
+    # Returns the first step after the specified step on which the taxi enters a new zone or
+    # arrives.
+    def get_next_crossing(self, steps):
+        for step, zone in self.get_crossings():
+            if step > steps:
+                return step
+        return self.steps
+
+    # Returns the list of (step, zone) pairs on which the taxi enters a new zone, starting with
+    # the origin's zone on step 0.
+    def get_crossings(self):
+        if self.crossings is None:
+            steps = set()
+            for axis in (0, 1):
+                steps.update(self.find_crossings(axis))
+            self.crossings = [(0, utils.get_zone(self.origin))]
+            for step in sorted(steps):
+                self.crossings.append((step, utils.get_zone(self.get_position(step))))
+        return self.crossings
+
+    # Returns the steps on which the taxi crosses a zone boundary along the specified axis, 0
+    # for latitude or 1 for longitude. Each crossing is solved for directly, then nudged to
+    # allow for rounding so that it agrees with utils.get_zone() on the positions actually
+    # visited.
+    def find_crossings(self, axis):
+        start = math.floor(self.origin[axis] * 100)
+        end = math.floor(self.destination[axis] * 100)
+        if start == end:
+            return []
+        direction = 1 if end > start else -1
+        origin, unit = self.origin[axis], self.unit[axis]
+        crossings = []
+        for zone in range(start + direction, end + direction, direction):
+            boundary = zone / 100 if direction > 0 else (zone + 1) / 100
+            step = math.ceil((boundary - origin) / unit) if unit else self.steps
+            step = min(max(step, 1), self.steps)
+            while step > 1 and self.has_reached(step - 1, axis, zone, direction):
+                step -= 1
+            while step < self.steps and not self.has_reached(step, axis, zone, direction):
+                step += 1
+            crossings.append(step)
+        return crossings
+
+    # Returns true if the taxi has reached the specified zone index along the axis after the
+    # specified number of steps.
+    def has_reached(self, steps, axis, zone, direction):
+        index = math.floor(self.get_position(steps)[axis] * 100)
+        return index >= zone if direction > 0 else index <= zone
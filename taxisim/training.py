@@ -0,0 +1,177 @@
+import concurrent.futures
+import datetime as dt
+import random
+import signal
+
+from . import manhattan
+from . import runner
+from .learning import QTensor
+from .taxi import Taxi
+from .world import World
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Returns the seed for a training run's simulation. As with runner.get_day_seed(), each run
+# depends only on the base seed and the run number, not on which process simulates it.
+def get_run_seed(seed, run_num):
+    return seed * 1000000 + run_num
+
+
+# Returns the day simulated by the specified training run, cycling through the days in order.
+def get_run_day(days, run_num):
+    return days[(run_num - 1) % len(days)]
+
+
+# Returns a dictionary mapping taxi sizes to counts.
+def count_sizes(sizes):
+    counts = {}
+    for size in sizes:
+        counts[size] = counts.get(size, 0) + 1
+    return counts
+
+
+# Simulates a single training episode: the specified day from 08:00 with a fresh fleet of taxis
+# with the specified sizes, the taxi at index i having ID i + 1. Returns a (rewards, stats) tuple
+# where rewards lists each taxi's reward and stats is the run's entry for the training log.
+# Extra keyword arguments other than request_dir are passed on to the World constructor.
+def run_episode(day, sizes, ridesharing=False, seed=0, params=None, **kwargs):
+    request_dir = kwargs.pop("request_dir", runner.REQUEST_DIR)
+    with runner.override_params(params or {}):
+        random.seed(seed)
+        taxis = [Taxi(id, size, manhattan.get_rand_pos()) for id, size in enumerate(sizes, 1)]
+        world = World(ridesharing=ridesharing, **kwargs)
+        world.add_taxis(taxis)
+        world.time = dt.datetime(2016, 2, day, 8)
+        with runner.open_requests(day, request_dir) as requests:
+            world.add_requests(requests)
+            world.run()
+    stats = {
+        "day": day,
+        "sizes": count_sizes(sizes),
+        "requests": world.num_requests,
+        "timeouts": world.num_timeouts,
+        "timeout_percent": world.timeout_percent,
+        "mean_dispatch": world.mean_dispatch_time,
+        "mean_pickup": world.mean_pickup_time,
+        "mean_wait": world.mean_wait_time,
+    }
+    return [taxi.reward for taxi in taxis], stats
+
+
+# Worker processes leave Ctrl-C to the main process so training can halt cleanly between rounds.
+def init_worker():
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+# A PopulationTrainer instance runs Q-learning for a population of fleet replicas in parallel.
+# Every replica has the same taxis and all replicas share a single array of Q-values, but each
+# replica's taxis choose their own actions and so follow their own sequence of sizes.
+#
+# Each round simulates one run per replica, numbered consecutively, so a round of R replicas
+# covers the same runs as R rounds of serial training. The runs are simulated in worker
+# processes; the rewards are then applied to the shared Q-values as one update per run, in run
+# order, so every taxi gets the same number of updates at the same ALPHA as in serial training.
+# If specified, get_p_explore(run_num) sets every taxi's exploration probability for each run.
+class PopulationTrainer:
+
+    def __init__(
+            self, replicas, days, ridesharing=False, seed=0, workers=None,
+            get_p_explore=None, **kwargs):
+        self.replicas = list(replicas)
+        self.days = list(days)
+        self.ridesharing = ridesharing
+        self.seed = seed
+        self.get_p_explore = get_p_explore
+        self.kwargs = kwargs
+        self.executor = None
+        if workers != 1:
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, initializer=init_worker
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown()
+            self.executor = None
+
+    # Returns a trainer for num_replicas copies of the fleet in the QTensor. The replicas share
+    # the tensor's Q-values and visited states.
+    @staticmethod
+    def from_tensor(q_tensor, num_replicas, days, **kwargs):
+        replicas = [q_tensor]
+        state = q_tensor.get_state()
+        for _ in range(num_replicas - 1):
+            replica = QTensor.from_state(state)
+            replica.values = q_tensor.values
+            replica.visited = q_tensor.visited
+            replicas.append(replica)
+        return PopulationTrainer(replicas, days, **kwargs)
+
+    # Returns the shared Q-values.
+    @property
+    def values(self):
+        return self.replicas[0].values
+
+    # Simulates the round of runs following run_num, one run per replica, and updates the
+    # Q-values. Returns a list of (run_num, stats) tuples in run order.
+    def run_round(self, run_num):
+        args = []
+        for offset, replica in enumerate(self.replicas, 1):
+            if self.get_p_explore:
+                p_explore = self.get_p_explore(run_num + offset)
+                for taxi in replica.taxis:
+                    taxi.p_explore = p_explore
+            replica.choose_actions()
+            args.append((
+                get_run_day(self.days, run_num + offset),
+                [taxi.size for taxi in replica.taxis],
+                self.ridesharing,
+                get_run_seed(self.seed, run_num + offset),
+            ))
+
+        if self.executor:
+            futures = [self.executor.submit(run_episode, *a, **self.kwargs) for a in args]
+            results = [future.result() for future in futures]
+        else:
+            results = [run_episode(*a, **self.kwargs) for a in args]
+
+        log = []
+        for offset, (replica, (rewards, stats)) in enumerate(zip(self.replicas, results), 1):
+            replica.update(rewards)
+            log.append((run_num + offset, stats))
+        return log
+
+    # Returns the population's learning state as a dictionary of arrays in the format of
+    # QTensor.get_state(). The shared Q-values and visited states are stored once; each
+    # per-taxi array gains a leading replica axis.
+    def get_state(self):
+        states = [replica.get_state() for replica in self.replicas]
+        state = {name: np.stack([s[name] for s in states]) for name in states[0]}
+        state["values"] = self.values
+        state["visited"] = self.replicas[0].visited
+        return state
+
+    # Returns a trainer for the population with the learning state from get_state().
+    @staticmethod
+    def from_state(state, days, **kwargs):
+        replicas = []
+        shared = {name: state[name] for name in ("values", "visited") if name in state}
+        for index in range(len(state["ids"])):
+            replica_state = {name: values[index] for name, values in state.items()}
+            replica_state.update(shared)
+            replica = QTensor.from_state(replica_state)
+            if replicas:
+                replica.values = replicas[0].values
+                replica.visited = replicas[0].visited
+            replicas.append(replica)
+        return PopulationTrainer(replicas, days, **kwargs)
@@ -1,13 +1,36 @@
+import datetime as dt
+import itertools
 import math
+import platform
 import random
 import taxisim
 
 from math import cos, sin, atan2, asin, sqrt
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 # Average earth radius in meters.
 EARTH_RADIUS = 6371009
 
+# Reference latitude in degrees for the planar geometry, roughly the middle of Manhattan.
+PLANAR_LAT = 40.78
+
+# Meters per degree of latitude and of longitude in the planar geometry.
+METERS_PER_DEG_LAT = EARTH_RADIUS * math.pi / 180
+METERS_PER_DEG_LONG = METERS_PER_DEG_LAT * math.cos(math.radians(PLANAR_LAT))
+
+# Name of the active geometry backend. Use set_geometry() to change it.
+geometry = "spherical"
+
+# Batched distance calls with fewer positions than this are computed in pure Python. NumPy's
+# per-call overhead only pays off from a few dozen positions under CPython and never under the
+# PyPy JIT.
+MIN_BATCH = math.inf if platform.python_implementation() == "PyPy" else 48
+
 
 # Calculate the great-circle distance in meters between two points on the earth's surface using
 # the haversine formula. This formula remains well-conditioned for small distances with an error
@@ -22,7 +45,9 @@ def distance(pos1, pos2):
     delta_phi = phi_2 - phi_1
     delta_lambda = lambda_2 - lambda_1
 
-    a = (sin(delta_phi/2) ** 2) + cos(phi_1) * cos(phi_2) * (sin(delta_lambda/2) ** 2)
+    sin_phi = sin(delta_phi/2)
+    sin_lambda = sin(delta_lambda/2)
+    a = sin_phi * sin_phi + cos(phi_1) * cos(phi_2) * (sin_lambda * sin_lambda)
     c = 2 * atan2(sqrt(a), sqrt(1-a))
     return EARTH_RADIUS * c
 
@@ -68,6 +93,161 @@ def interpolate_position(pos1, pos2, dist):
     return (lat, long)
 
 
+# Returns a lower bound in meters on the distance between two positions whose latitudes differ
+# by at least dlat degrees or whose longitudes differ by at least dlong degrees, where neither
+# position is further than max_lat degrees from the equator. With |delta_phi| >= dlat the
+# haversine formula gives at least 2R * sin(dlat/2); with |delta_lambda| >= dlong it gives at
+# least 2R * cos(max_lat) * sin(dlong/2).
+def distance_bound(dlat, dlong, max_lat):
+    return 2 * EARTH_RADIUS * min(
+        sin(math.radians(dlat) / 2),
+        cos(math.radians(max_lat)) * sin(math.radians(dlong) / 2)
+    )
+
+
+# Planar version of distance(). Positions are projected onto a local equirectangular grid
+# centered on PLANAR_LAT, which is accurate to well under the haversine formula's own error
+# across Manhattan. As the projection is linear the stored (lat, long) tuples serve directly as
+# projected coordinates, scaled to meters on the fly.
+def planar_distance(pos1, pos2):
+    dx = (pos2[1] - pos1[1]) * METERS_PER_DEG_LONG
+    dy = (pos2[0] - pos1[0]) * METERS_PER_DEG_LAT
+    return sqrt(dx * dx + dy * dy)
+
+
+# Planar version of interpolate_position(). Intermediate points lie on the straight line
+# between the projected positions.
+def planar_interpolate_position(pos1, pos2, dist):
+    total = planar_distance(pos1, pos2)
+    if total == 0:
+        return pos2
+    f = dist / total
+    return (pos1[0] + (pos2[0] - pos1[0]) * f, pos1[1] + (pos2[1] - pos1[1]) * f)
+
+
+# Planar version of distance_bound().
+def planar_distance_bound(dlat, dlong, max_lat):
+    return min(dlat * METERS_PER_DEG_LAT, dlong * METERS_PER_DEG_LONG)
+
+
+# Geometry backends, each a (distance, interpolate_position, distance_bound) tuple.
+geometries = {
+    "spherical": (distance, interpolate_position, distance_bound),
+    "planar": (planar_distance, planar_interpolate_position, planar_distance_bound),
+}
+
+
+# Select the geometry backend used by distance(), interpolate_position() and distance_bound().
+# The default 'spherical' backend uses great-circle trigonometry; the 'planar' backend replaces
+# it with a local projection, computing distances with a single square root and interpolating
+# with a multiply-add. Select the backend before creating taxis, worlds or passenger groups as the
+# module functions are rebound rather than checked on every call.
+def set_geometry(name):
+    global distance, interpolate_position, distance_bound, geometry
+    if name not in geometries:
+        raise ValueError(f"unknown geometry: {name}")
+    distance, interpolate_position, distance_bound = geometries[name]
+    geometry = name
+    taxisim.distance = distance
+
+
+# Returns a list of the distances in meters from pos to each position in positions.
+def distances(pos, positions):
+    if np is None or len(positions) < MIN_BATCH:
+        return [distance(pos, other) for other in positions]
+    lat_2, long_2 = to_arrays(positions)
+    return distance_arrays(np.float64(pos[0]), np.float64(pos[1]), lat_2, long_2).tolist()
+
+
+# Returns a list of the distances in meters between corresponding positions in two
+# equal-length lists.
+def pairwise_distances(positions_1, positions_2):
+    if np is None or len(positions_1) < MIN_BATCH:
+        return [distance(pos1, pos2) for pos1, pos2 in zip(positions_1, positions_2)]
+    lat_1, long_1 = to_arrays(positions_1)
+    lat_2, long_2 = to_arrays(positions_2)
+    return distance_arrays(lat_1, long_1, lat_2, long_2).tolist()
+
+
+# Returns a list of the total distances in meters of the paths, each a sequence of positions as
+# passed to total_distance(). The segments of every path are measured in a single batch and
+# summed in path order.
+def path_distances(paths):
+    starts = [pos for path in paths for pos in path[:-1]]
+    ends = [pos for path in paths for pos in path[1:]]
+    segments = iter(pairwise_distances(starts, ends))
+    totals = []
+    for path in paths:
+        total = 0
+        for _ in range(len(path) - 1):
+            total += next(segments)
+        totals.append(total)
+    return totals
+
+
+# Returns a tuple of (lat, long) arrays for a list of positions.
+def to_arrays(positions):
+    coords = np.fromiter(itertools.chain.from_iterable(positions), float, 2 * len(positions))
+    return coords[0::2], coords[1::2]
+
+
+# Vectorized version of distance() for the active geometry. The haversine formula is evaluated
+# over whole arrays with the same operations in the same order as distance(), so results are
+# bit-identical to it. Returns an array.
+def distance_arrays(lat_1, long_1, lat_2, long_2):
+    if geometry == "planar":
+        dx = (long_2 - long_1) * METERS_PER_DEG_LONG
+        dy = (lat_2 - lat_1) * METERS_PER_DEG_LAT
+        return np.sqrt(dx * dx + dy * dy)
+
+    sin, cos, arctan2 = get_exact_functions()
+    phi_1 = np.radians(lat_1)
+    lambda_1 = np.radians(long_1)
+    phi_2 = np.radians(lat_2)
+    lambda_2 = np.radians(long_2)
+
+    sin_phi = sin((phi_2 - phi_1) / 2)
+    sin_lambda = sin((lambda_2 - lambda_1) / 2)
+    a = sin_phi * sin_phi + cos(phi_1) * cos(phi_2) * (sin_lambda * sin_lambda)
+    c = 2 * arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return EARTH_RADIUS * c
+
+
+# Returns (sin, cos, arctan2) functions for arrays that give the same results as the math
+# module's functions. NumPy's own versions are used where they agree with the math module on a
+# sample of values; on some CPUs NumPy uses vectorized approximations that can differ in the
+# last place, and those functions are applied element by element with the math module instead.
+def get_exact_functions():
+    global exact_functions
+    if exact_functions is None:
+        rng = np.random.default_rng(0)
+        angles = np.concatenate((rng.uniform(-0.01, 0.01, 5000), rng.uniform(-1.6, 1.6, 5000)))
+        ratios = rng.uniform(0, 1, 10000)
+        tests = (
+            (np.sin, math.sin, (angles,)),
+            (np.cos, math.cos, (angles,)),
+            (np.arctan2, math.atan2, (np.sqrt(ratios), np.sqrt(1 - ratios))),
+        )
+        exact_functions = []
+        for np_func, math_func, args in tests:
+            if np.array_equal(np_func(*args), list(map(math_func, *args))):
+                exact_functions.append(np_func)
+            else:
+                exact_functions.append(get_elementwise(math_func))
+    return exact_functions
+
+
+# Returns a function that applies the scalar function to corresponding elements of arrays.
+def get_elementwise(func):
+    def apply(*arrays):
+        lists = [array.tolist() for array in arrays]
+        return np.fromiter(map(func, *lists), float, len(lists[0]))
+    return apply
+
+
+exact_functions = None
+
+
 # Basic logging. Will log to a file if taxisim.logfile is set.
 def log(msg, time=None):
     output = f"[{time}]  >>  {msg}" if time else msg
@@ -77,6 +257,34 @@ def log(msg, time=None):
         taxisim.logfile.write('\n')
 
 
+# Start of the simulation clock. Datetimes are naive and so is the epoch.
+EPOCH = dt.datetime(1970, 1, 1)
+
+
+# Converts a datetime to an integer number of seconds since the epoch, rounding down.
+def to_seconds(time):
+    return (time - EPOCH) // dt.timedelta(seconds=1)
+
+
+# Converts a number of seconds since the epoch to a datetime.
+def to_datetime(seconds):
+    return EPOCH + dt.timedelta(seconds=seconds)
+
+
+# Returns a list of request tuples with any datetimes converted to seconds since the epoch.
+# Rounding request times down doesn't change which tick loads them as ticks fall on whole
+# seconds.
+def convert_requests(requests):
+    return [convert_request(request) for request in requests]
+
+
+# Returns the request tuple with its time converted to seconds since the epoch if required.
+def convert_request(request):
+    if isinstance(request[0], dt.datetime):
+        return (to_seconds(request[0]),) + tuple(request[1:])
+    return request
+
+
 # Returns the zone ID for the specified (lat, long) position tuple. A zone is identified by the
 # coordinates of its lower-left corner in hundreths of a degree converted into integers to avoid
 # floating-point weirdness. Each zone is one-hundreth of a degree of latitude tall (approx.
@@ -115,6 +323,17 @@ def sample(population, k):
         return random.sample(population, k)
 
 
+# Returns the number of trials up to and including the first success in a sequence of
+# independent trials with success probability p, i.e. a sample from the geometric distribution.
+# Returns infinity if p is zero.
+def geometric(p):
+    if p >= 1:
+        return 1
+    if p <= 0:
+        return math.inf
+    return int(math.log(1 - random.random()) / math.log(1 - p)) + 1
+
+
 # Returns true if a (lat, long) position is inside a bounding box identified by the (lat, long)
 # positions of its (bottom_left, top_right) corners.
 def in_box(pos, box):
@@ -1,4 +1,7 @@
-import datetime as dt
+import bisect
+import collections
+import heapq
+import math
 import random
 import time
 import itertools
@@ -6,24 +9,46 @@ import itertools
 from . import utils
 from . import manhattan
 from . import params
+from . import fleet
+from . import events
 from .taxi import Status
+from .index import TaxiIndex
+from .requestfile import RequestFile
 
 
 class World:
 
-    def __init__(self, ridesharing=False, log_ticks=False):
+    def __init__(self, ridesharing=False, log_ticks=False, fleet_engine=False, event_driven=False):
 
         # Public.
-        self.time = None                # Current simulation datetime.
+        self.clock = None               # Current simulation time in seconds since the epoch.
         self.ridesharing = ridesharing  # If true, ridesharing is enabled.
         self.log_ticks = log_ticks      # If true, log status every tick.
+        self.fleet_engine = fleet_engine  # If true, move taxis using the batched fleet engine.
+        self.event_driven = event_driven  # If true, run in discrete-event mode; see events.py.
+        self.aborted = False            # True if the last run was aborted early.
 
         # Private.
-        self.request_queue = []         # Incoming request tuples.
+        self.request_queue = RequestQueue()  # Incoming request tuples.
         self.taxis = []                 # Master list of all taxis.
+        self.indices = {}               # Master list index for each taxi.
+        self.active = None              # Sorted indices of taxis with tasks, built on first tick.
+        self.is_active = []             # True for each taxi whose index is in active.
+        self.wake_ups = []              # Heap of (tick, index) wake-ups for idle taxis.
+        self.wake_up_ticks = []         # Scheduled wake-up tick for each taxi, if idle.
+        self.num_ticks = 0              # Total ticks processed in tick mode.
         self.zones = {}                 # Taxi lists indexed by zone.
-        self.dispatch_queue = []        # Passenger groups waiting for dispatch.
-        self.pickup_list = []           # Passenger groups waiting for pickup.
+        self.dirty_zones = set()        # Zones where taxi availability may have changed.
+        self.index = TaxiIndex(ridesharing, self.dirty_zones)  # Spatial index of available taxis.
+        self.dispatch_queue = DispatchQueue()  # Passenger groups waiting for dispatch.
+        self.pickups = {}               # Passenger groups waiting for pickup, mapped to taxis.
+        self.timeouts = []              # Heap of (deadline, id, group) timeout expiries.
+        self.split_deadlines = []       # Heap of (deadline, id, group) split deadlines.
+        self.zone_rounds = {}           # Dispatch round on which each zone last changed.
+        self.num_rounds = 0             # Total calls to dispatch_taxis().
+        self.num_splits = 0             # Groups split in the last dispatch round.
+        self.fleet = None               # Fleet engine instance for the current run.
+        self.events = None              # Event engine instance for the current run.
 
         # Read-only metrics.
         self.num_requests = 0           # Total requests processed so far.
@@ -33,15 +58,15 @@ class World:
         self.mean_pickup_time = 0       # Mean time in minutes spent awaiting pickup.
         self.mean_journey_time = 0      # Mean time in minutes spent in taxi.
 
-        # Time delta conversions.
-        self.timeout = dt.timedelta(minutes=params.TIMEOUT)
-        self.tick_time = dt.timedelta(seconds=params.TICK_TIME)
-        self.split_time = dt.timedelta(minutes=params.SPLIT_TIME)
+        # Time conversions in seconds.
+        self.timeout = params.TIMEOUT * 60
+        self.tick_time = params.TICK_TIME
+        self.split_time = params.SPLIT_TIME * 60
 
     def __str__(self):
         out = f"R: {self.num_requests:6d}    "
         out += f"DQ: {len(self.dispatch_queue):4d}    "
-        out += f"PL: {len(self.pickup_list):4d}    "
+        out += f"PL: {len(self.pickups):4d}    "
         out += f"DO: {self.num_dropoffs:6d}    "
         out += f"TO: {self.num_timeouts:4d} ({self.timeout_percent:.2f}%)    "
         out += f"MD: {self.mean_dispatch_time:.2f}    "
@@ -50,6 +75,16 @@ class World:
         out += f"MJ: {self.mean_journey_time:5.2f}"
         return out
 
+    # Current simulation datetime. The simulation itself runs on the integer clock; datetimes
+    # are only used at the API and logging boundary.
+    @property
+    def time(self):
+        return None if self.clock is None else utils.to_datetime(self.clock)
+
+    @time.setter
+    def time(self, value):
+        self.clock = None if value is None else utils.to_seconds(value)
+
     # Percentage of requests that have timed-out.
     @property
     def timeout_percent(self):
@@ -66,29 +101,55 @@ class World:
     # Add a single Taxi instance.
     def add_taxi(self, taxi):
         self.zones.setdefault(taxi.zone, []).append(taxi)
+        self.index.update(taxi)
+        self.indices[taxi] = len(self.taxis)
         self.taxis.append(taxi)
+        self.active = None
 
     # Add a list of Taxi instances.
     def add_taxis(self, taxis):
         for taxi in taxis:
             self.add_taxi(taxi)
 
-    # Add a list of request tuples to the request queue.
-    # Each tuple should have the form: (time, size, source, destination).
+    # Add a list of request tuples to the request queue. Any time-ordered iterable of request
+    # tuples will do, e.g. a RequestFile or a generator; requests are only read from it as they
+    # fall due so a source can cover any length of time without being held in memory.
+    # Each tuple should have the form: (time, size, source, destination). The time can be a
+    # datetime or an integer number of seconds since the epoch; datetimes are converted as
+    # requests are read so the simulation only deals in integers.
     def add_requests(self, requests):
-        self.request_queue.extend(requests)
+        if isinstance(requests, RequestFile):
+            self.request_queue.extend(requests)
+        else:
+            self.request_queue.extend(map(utils.convert_request, requests))
 
     # Add a single request tuple to the request queue.
     def add_request(self, request):
-        self.request_queue.append(request)
+        self.request_queue.append(utils.convert_request(request))
 
-    # Run the simulation until all requests in the queue have been processed.
-    def run(self):
+    # Run the simulation until the request sources are exhausted and every request has been
+    # processed. In event-driven mode each iteration jumps to the next tick on which something
+    # happens. If max_timeouts is specified the run is aborted as soon as the number of timeouts
+    # exceeds it, leaving the metrics as they stand and setting the aborted flag. If until is
+    # specified the run is paused on the first tick at or after that datetime; calling run()
+    # again resumes it.
+    def run(self, max_timeouts=None, until=None):
+        self.aborted = False
+        until = None if until is None else utils.to_seconds(until)
+        if self.event_driven:
+            self.events = events.EventEngine(self)
+        else:
+            self.schedule_taxis()
+            if self.fleet_engine:
+                self.fleet = fleet.Fleet(self.taxis)
         run_start_time = time.time()
         mean_tick_time, num_ticks = 0, 0
         while True:
             tick_start_time = time.time()
-            self.tick()
+            if self.events:
+                self.events.step()
+            else:
+                self.tick()
             if self.log_ticks:
                 num_ticks += 1
                 tick_time = time.time() - tick_start_time
@@ -98,119 +159,223 @@ class World:
                 msg += f"[{tick_time:5.2f}s|{mean_tick_time:5.2f}s|{run_time:5.2f}m]"
                 msg += f"  >>  {self}"
                 utils.log(msg, self.time)
+            if max_timeouts is not None and self.num_timeouts > max_timeouts:
+                self.aborted = True
+                break
+            if until is not None and self.clock >= until:
+                break
             if not self.request_queue:
                 if self.num_requests == self.num_dropoffs + self.num_timeouts:
                     break
+        if self.events:
+            self.events.finish()
+            self.events = None
+        if self.fleet:
+            self.fleet.flush()
+            self.fleet = None
 
-    # Advance the simulation by one tick.
+    # Advance the simulation by one tick. Only active taxis, i.e. taxis with tasks, are moved.
+    # During run() the fleet engine, if enabled, moves them and reports which ones arrived.
     def tick(self):
-        self.time += self.tick_time
-        for taxi in self.taxis:
-            taxi.tick(self)
+        self.clock += self.tick_time
+        self.num_ticks += 1
+        if self.active is None:
+            self.schedule_taxis()
+        self.wake_taxis()
+        indices = self.active
+        if self.fleet:
+            indices = self.fleet.tick(self, indices)
+        else:
+            for index in indices:
+                self.taxis[index].tick(self)
+        finished = [index for index in indices if not self.taxis[index].tasks]
+        for index in finished:
+            self.deactivate(index)
+            self.schedule_wake_up(index)
         self.load_requests()
         self.dispatch_taxis()
 
+    # Build the list of active taxis and schedule a repositioning wake-up for each idle taxi.
+    # The geometric distribution is memoryless so rescheduling an idle taxi is harmless.
+    def schedule_taxis(self):
+        self.active = []
+        self.is_active = [False] * len(self.taxis)
+        self.wake_ups = []
+        self.wake_up_ticks = [None] * len(self.taxis)
+        for index, taxi in enumerate(self.taxis):
+            if taxi.tasks:
+                self.active.append(index)
+                self.is_active[index] = True
+            else:
+                self.schedule_wake_up(index)
+
+    # Schedule an idle taxi's next repositioning. Instead of drawing against REPO_PROB on every
+    # tick we draw the number of ticks until the first success once.
+    def schedule_wake_up(self, index):
+        wait = utils.geometric(params.REPO_PROB)
+        if wait == math.inf:
+            self.wake_up_ticks[index] = None
+        else:
+            self.wake_up_ticks[index] = self.num_ticks + wait
+            heapq.heappush(self.wake_ups, (self.num_ticks + wait, index))
+
+    # Start repositioning any idle taxis whose wake-up is due on this tick.
+    def wake_taxis(self):
+        while self.wake_ups and self.wake_ups[0][0] <= self.num_ticks:
+            tick, index = heapq.heappop(self.wake_ups)
+            if self.wake_up_ticks[index] == tick:
+                self.taxis[index].start_repositioning()
+                self.activate_index(index)
+
+    # Mark a taxi as active, cancelling any pending wake-up.
+    def activate(self, taxi):
+        self.activate_index(self.indices[taxi])
+
+    # Taxis are moved in master-list order so active is kept sorted as taxis come and go
+    # rather than sorted on every tick.
+    def activate_index(self, index):
+        self.wake_up_ticks[index] = None
+        if not self.is_active[index]:
+            self.is_active[index] = True
+            bisect.insort(self.active, index)
+
+    def deactivate(self, index):
+        self.is_active[index] = False
+        del self.active[bisect.bisect_left(self.active, index)]
+
     # Process pending passenger requests for the current tick.
     def load_requests(self):
-        while self.request_queue and self.request_queue[0][0] <= self.time:
-            time, size, src_pos, dst_pos = self.request_queue.pop(0)
-            pg = PassengerGroup(self.time, size, src_pos, dst_pos)
+        while self.request_queue and self.request_queue.peek()[0] <= self.clock:
+            time, size, src_pos, dst_pos = self.request_queue.popleft()
+            pg = PassengerGroup(self.clock, size, src_pos, dst_pos)
             self.dispatch_queue.append(pg)
+            self.add_deadlines(pg)
             self.num_requests += 1
 
+    # Schedule the passenger group's timeout and, if it's big enough, its split deadline.
+    def add_deadlines(self, pg):
+        heapq.heappush(self.timeouts, (pg.request_time + self.timeout, id(pg), pg))
+        if pg.size >= params.SPLIT_SIZE and not pg.split_due:
+            heapq.heappush(self.split_deadlines, (pg.request_time + self.split_time, id(pg), pg))
+
+    # Returns the earliest pending timeout or split deadline for groups awaiting dispatch.
+    def get_next_deadline(self):
+        deadlines = []
+        for heap in (self.timeouts, self.split_deadlines):
+            while heap and heap[0][2] not in self.dispatch_queue:
+                heapq.heappop(heap)
+            if heap:
+                deadlines.append(heap[0][0])
+        return min(deadlines) if deadlines else None
+
+    # Returns true if the passenger group needs to be re-evaluated for dispatch. A group that
+    # found no taxi last time is only retried once the taxis available in one of its
+    # neighbouring zones have changed, as recorded by the index. With ridesharing this means a
+    # dropoff taxi the group turned down isn't reconsidered just because it has moved closer.
+    def is_stale(self, pg):
+        if pg.evaluated is None:
+            return True
+        for zone in pg.zones:
+            if self.zone_rounds.get(zone, 0) > pg.evaluated:
+                return True
+        return False
+
     # Try to find a taxi for each passenger group in the dispatch queue.
     def dispatch_taxis(self):
-        taxi, last_pg = None, None
-        for pg in self.dispatch_queue.copy():
-            waiting_time = self.time - pg.request_time
-            if waiting_time >= self.timeout:
+        self.num_rounds += 1
+        for zone in self.dirty_zones:
+            self.zone_rounds[zone] = self.num_rounds
+        self.dirty_zones.clear()
+
+        # Process timeouts and split deadlines.
+        while self.timeouts and self.timeouts[0][0] <= self.clock:
+            _, _, pg = heapq.heappop(self.timeouts)
+            if pg in self.dispatch_queue:
                 self.dispatch_queue.remove(pg)
                 self.update_passenger_metrics(pg, timeout=True)
-                continue
+        while self.split_deadlines and self.split_deadlines[0][0] <= self.clock:
+            _, _, pg = heapq.heappop(self.split_deadlines)
+            pg.split_due = True
+
+        self.num_splits = 0
+        taxi, last_pg = None, None
+        for pg in self.dispatch_queue:
             if taxi and last_pg.group_id == pg.group_id and taxi.capacity >= pg.size:
                 pass
-            else:
+            elif self.is_stale(pg):
                 taxi = self.get_closest_available_taxi(pg)
+                pg.evaluated = self.num_rounds
+            else:
+                taxi = None
             if taxi:
                 taxi.add_pickup_task(pg)
+                self.index.update(taxi)
+                if self.events:
+                    self.events.start_leg(taxi)
+                else:
+                    self.activate(taxi)
                 self.dispatch_queue.remove(pg)
-                self.pickup_list.append(pg)
-                pg.dispatch_time = self.time
+                self.pickups[pg] = taxi
+                pg.dispatch_time = self.clock
                 last_pg = pg
-            elif pg.size >= params.SPLIT_SIZE and waiting_time >= self.split_time:
+            elif pg.size >= params.SPLIT_SIZE and pg.split_due:
                 new_pg = pg.split(int(pg.size / 2))
-                index = self.dispatch_queue.index(pg)
-                self.dispatch_queue.insert(index, new_pg)
+                self.dispatch_queue.insert_before(pg, new_pg)
+                self.add_deadlines(new_pg)
                 self.num_requests += 1
+                self.num_splits += 1
 
     # Find the closest available taxi that can service the passenger group's request.
-    # The group's zone and the 8 immediate neighbouring zones are checked for taxis.
+    # The group's zone and the 8 immediate neighbouring zones are checked for taxis. The first
+    # taxi found inside the instant dispatch range is dispatched immediately, checking zones in
+    # order and each zone's taxis in list order. In event-driven mode the index hasn't seen
+    # moving taxis since their last event, so candidates are scored at their current positions
+    # and only the chosen taxi is brought up to date.
     def get_closest_available_taxi(self, pg):
-        zone_candidates = []
-        for zone in utils.get_neighbouring_zones(pg.src_pos):
-            if self.ridesharing:
-                taxi, distance, instant = self.get_zone_candidate_rs(zone, pg)
-            else:
-                taxi, distance, instant = self.get_zone_candidate_no_rs(zone, pg)
-            if instant:
-                return taxi
-            elif taxi:
-                zone_candidates.append((distance, taxi))
-        if zone_candidates:
-            zone_candidates.sort(key=lambda e: e[0])
-            return zone_candidates[0][1]
-        else:
-            return None
-
-    # Find the closest available taxi in the specified zone that can service the
-    # passenger's request. No ridesharing.
-    def get_zone_candidate_no_rs(self, zone, pg):
-        available_taxis = []
-        for taxi in self.zones.get(zone, []):
-            if taxi.capacity >= pg.size:
-                if taxi.status in (Status.idle, Status.repositioning):
-                    available_taxis.append(taxi)
-        candidates = []
-        for taxi in available_taxis:
-            distance = utils.distance(pg.src_pos, taxi.position)
-            if distance < params.INSTANT_DISPATCH_RANGE:
-                return taxi, distance, True
-            candidates.append((distance, taxi))
-        if candidates:
-            candidates.sort(key=lambda e: e[0])
-            return candidates[0][1], candidates[0][0], False
-        else:
-            return None, None, False
-
-    # Find the closest available taxi in the specified zone that can service the
-    # passenger's request. Ridesharing enabled.
-    def get_zone_candidate_rs(self, zone, pg):
-        available_taxis = []
-        for taxi in self.zones.get(zone, []):
-            if taxi.capacity >= pg.size:
-                if taxi.status in (Status.dropoff, Status.idle, Status.repositioning):
-                    available_taxis.append(taxi)
-        candidates = []
-        for taxi in available_taxis:
-            dist_to_taxi = utils.distance(pg.src_pos, taxi.position)
-            if taxi.status == Status.dropoff:
-                d1 = utils.distance(taxi.position, taxi.destination)
-                d2 = dist_to_taxi + utils.distance(pg.src_pos, taxi.destination)
-                if d2 <= d1 * params.RIDESHARE_MULTIPLIER:
-                    rs_dist = utils.total_distance(
-                        pg.src_pos, *taxi.destinations, pg.dst_pos
-                    )
-                    if rs_dist <= pg.rs_distance_limit:
-                        candidates.append((dist_to_taxi, taxi))
+        accept = self.can_share if self.ridesharing else None
+        if not self.events:
+            return self.index.get_closest_taxi(pg, accept)
+        taxi = self.index.get_closest_taxi(pg, accept, self.events.locate)
+        if taxi:
+            self.events.update_taxi(self.indices[taxi])
+        return taxi
+
+    # Returns the taxi's current position. In event-driven mode a moving taxi's position is
+    # only updated on its events.
+    def get_position(self, taxi):
+        return self.events.locate(taxi) if self.events else taxi.position
+
+    # Returns a list of flags, true for each available taxi that can pick up the passenger group
+    # with ridesharing. Dists are the distances from the group to the taxis. A taxi that is
+    # dropping off passengers only qualifies if the detour is acceptable both to its current
+    # passengers and to the new group. The distances for all the taxis are measured in batches.
+    def can_share(self, taxis, pg, dists):
+        flags = [True] * len(taxis)
+        sharing = [i for i, taxi in enumerate(taxis) if taxi.status == Status.dropoff]
+        if not sharing:
+            return flags
+
+        # The detour to the group must be acceptable to the current passengers.
+        starts, ends = [], []
+        for i in sharing:
+            destination = taxis[i].destination
+            starts.extend((self.get_position(taxis[i]), pg.src_pos))
+            ends.extend((destination, destination))
+        legs = utils.pairwise_distances(starts, ends)
+        detours = []
+        for j, i in enumerate(sharing):
+            d1 = legs[2*j]
+            d2 = dists[i] + legs[2*j + 1]
+            if d2 <= d1 * params.RIDESHARE_MULTIPLIER:
+                detours.append(i)
             else:
-                candidates.append((dist_to_taxi, taxi))
-            if candidates and candidates[-1][0] < params.INSTANT_DISPATCH_RANGE:
-                return candidates[-1][1], candidates[-1][0], True
-        if candidates:
-            candidates.sort(key=lambda e: e[0])
-            return candidates[0][1], candidates[0][0], False
-        else:
-            return None, None, False
+                flags[i] = False
+
+        # The shared journey must be acceptable to the group.
+        paths = [(pg.src_pos, *taxis[i].destinations, pg.dst_pos) for i in detours]
+        for i, rs_dist in zip(detours, utils.path_distances(paths)):
+            flags[i] = rs_dist <= pg.rs_distance_limit
+        return flags
 
     # This function is called whenever a passenger group is dropped-off or the request times-out.
     def update_passenger_metrics(self, pg, timeout=False):
@@ -221,9 +386,9 @@ class World:
         else:
             self.num_dropoffs += 1
             n = self.num_timeouts + self.num_dropoffs
-            dispatch_time = (pg.dispatch_time - pg.request_time).total_seconds() / 60
-            pickup_time = (pg.pickup_time - pg.dispatch_time).total_seconds() / 60
-            journey_time = (pg.dropoff_time - pg.pickup_time).total_seconds() / 60
+            dispatch_time = (pg.dispatch_time - pg.request_time) / 60
+            pickup_time = (pg.pickup_time - pg.dispatch_time) / 60
+            journey_time = (pg.dropoff_time - pg.pickup_time) / 60
             self.mean_dispatch_time += (dispatch_time - self.mean_dispatch_time) / n
             self.mean_pickup_time += (pickup_time - self.mean_pickup_time) / self.num_dropoffs
             self.mean_journey_time += (journey_time - self.mean_journey_time) / self.num_dropoffs
@@ -231,10 +396,15 @@ class World:
     # Reset each taxi's metrics and randomly assign it a new location.
     def reset_taxis(self):
         self.zones = {}
+        self.index = TaxiIndex(self.ridesharing, self.dirty_zones)
         for taxi in self.taxis:
             taxi.reset_metrics()
             taxi.position = manhattan.get_rand_pos()
+            taxi.leg = None
             self.zones.setdefault(taxi.zone, []).append(taxi)
+            self.index.update(taxi)
+        for pg in self.dispatch_queue:
+            pg.evaluated = None
 
     # Reset world metrics.
     def reset_metrics(self):
@@ -246,12 +416,107 @@ class World:
         self.mean_journey_time = 0
 
 
+# The RequestQueue class is a FIFO queue of request tuples drawn from a queue of sources, i.e.
+# iterables of time-ordered request tuples such as lists, memory-mapped RequestFile instances
+# or generators. Sources are consumed lazily and at most one request is read ahead, so memory
+# use doesn't depend on the number of requests still to come.
+class RequestQueue:
+
+    def __init__(self):
+        self.sources = collections.deque()  # Iterators over request tuples.
+        self.head = None                    # Next request tuple, if read ahead.
+
+    def __bool__(self):
+        return self.peek() is not None
+
+    def extend(self, requests):
+        self.sources.append(iter(requests))
+
+    def append(self, request):
+        self.extend([request])
+
+    # Returns the next request tuple without removing it from the queue, or None if the queue
+    # is empty.
+    def peek(self):
+        while self.head is None and self.sources:
+            self.head = next(self.sources[0], None)
+            if self.head is None:
+                self.sources.popleft()
+        return self.head
+
+    def popleft(self):
+        request = self.peek()
+        if request is None:
+            raise IndexError("pop from an empty request queue")
+        self.head = None
+        return request
+
+
+# The DispatchQueue class is an order-preserving queue of passenger groups implemented as a
+# doubly-linked list. Appending, removing a group, and inserting a group in front of another
+# are all O(1). Iterating is safe while removing the current group or inserting before it;
+# groups inserted before the current group are not visited.
+class DispatchQueue:
+
+    def __init__(self):
+        self.head = None
+        self.tail = None
+        self.prev = {}
+        self.next = {}
+
+    def __len__(self):
+        return len(self.next)
+
+    def __iter__(self):
+        pg = self.head
+        while pg is not None:
+            next_pg = self.next[pg]
+            yield pg
+            pg = next_pg
+
+    def __contains__(self, pg):
+        return pg in self.next
+
+    def append(self, pg):
+        self.prev[pg] = self.tail
+        self.next[pg] = None
+        if self.tail is None:
+            self.head = pg
+        else:
+            self.next[self.tail] = pg
+        self.tail = pg
+
+    def remove(self, pg):
+        prev_pg = self.prev.pop(pg)
+        next_pg = self.next.pop(pg)
+        if prev_pg is None:
+            self.head = next_pg
+        else:
+            self.next[prev_pg] = next_pg
+        if next_pg is None:
+            self.tail = prev_pg
+        else:
+            self.prev[next_pg] = prev_pg
+
+    def insert_before(self, pg, new_pg):
+        prev_pg = self.prev[pg]
+        self.prev[new_pg] = prev_pg
+        self.next[new_pg] = pg
+        self.prev[pg] = new_pg
+        if prev_pg is None:
+            self.head = new_pg
+        else:
+            self.next[prev_pg] = new_pg
+
+
 # A PassengerGroup instance represents a group of passengers travelling together as a unit.
+# Times are in integer seconds since the epoch.
 class PassengerGroup:
 
     __slots__ = (
         "request_time", "size", "src_pos", "dst_pos", "rs_distance_limit",
-        "dispatch_time", "pickup_time", "dropoff_time", "group_id"
+        "dispatch_time", "pickup_time", "dropoff_time", "group_id", "zones",
+        "evaluated", "split_due"
     )
 
     id_iter = itertools.count(1)
@@ -266,6 +531,9 @@ class PassengerGroup:
         self.pickup_time = None
         self.dropoff_time = None
         self.group_id = group_id or next(self.id_iter)
+        self.zones = utils.get_neighbouring_zones(src_pos)
+        self.evaluated = None
+        self.split_due = False
 
     def split(self, split_size):
         new_pg = PassengerGroup(
@@ -275,5 +543,7 @@ class PassengerGroup:
         new_pg.pickup_time = self.pickup_time
         new_pg.dropoff_time = self.dropoff_time
         new_pg.rs_distance_limit = self.rs_distance_limit
+        new_pg.split_due = self.split_due
+        self.evaluated = None
         self.size -= split_size
         return new_pg
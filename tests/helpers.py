@@ -0,0 +1,97 @@
+import datetime as dt
+import os
+import random
+
+import taxisim
+from taxisim import manhattan, requestfile, runner
+
+
+START = dt.datetime(2016, 2, 1, 8)
+
+
+# Returns a time-ordered list of num random request tuples spread over the specified number of
+# minutes from START. Positions are jittered around the zone centers.
+def make_requests(seed, num, minutes=60, max_size=6):
+    rng = random.Random(seed)
+
+    def get_pos():
+        lat, long = rng.choice(manhattan.zone_centers)
+        return (lat + rng.uniform(-0.004, 0.004), long + rng.uniform(-0.004, 0.004))
+
+    times = sorted(rng.randrange(minutes * 60) for _ in range(num))
+    return [
+        (START + dt.timedelta(seconds=secs), rng.randint(1, max_size), get_pos(), get_pos())
+        for secs in times
+    ]
+
+
+# Returns a world with num_taxis taxis and the requests loaded, ready to run from START. The
+# random module is seeded first so that worlds built with the same seed run identically.
+def make_world(requests, num_taxis=600, seed=1, **kwargs):
+    random.seed(seed)
+    world = taxisim.World(**kwargs)
+    world.add_taxis(taxisim.make_taxis(num_taxis))
+    world.time = START
+    world.add_requests(requests)
+    return world
+
+
+# Returns the world's metrics, the state of each taxi, the order of the zone lists and the order
+# of the spatial index, for comparing runs.
+def get_state(world):
+    metrics = (
+        world.clock, world.num_requests, world.num_dropoffs, world.num_timeouts,
+        world.mean_dispatch_time, world.mean_pickup_time, world.mean_journey_time,
+    )
+    taxis = [
+        (
+            taxi.id, taxi.size, taxi.position, taxi.status, taxi.num_passengers,
+            taxi.num_pending_pickups, taxi.total_dist, taxi.weighted_dist,
+            [task[:2] for task in taxi.tasks],
+        )
+        for taxi in world.taxis
+    ]
+    zones = {zone: [taxi.id for taxi in taxis] for zone, taxis in world.zones.items()}
+    seqs = world.index.seqs
+    order = [taxi.id for taxi in sorted(seqs, key=seqs.get)]
+    return metrics, taxis, zones, order
+
+
+# Writes a TLC-style trip CSV file with a header and num random trip records, mostly in
+# Manhattan on weekday mornings in February 2016. Some records fall outside the filter settings
+# and some are malformed.
+def write_trips(path, seed, num):
+    rng = random.Random(seed)
+    lines = ["VendorID,pickup,dropoff,passengers,distance,pu_long,pu_lat,rate,flag,do_long,"
+        "do_lat,payment,fare,extra,tax,tip,tolls,surcharge,total"]
+    for _ in range(num):
+        pickup = dt.datetime(2016, 2, rng.randint(1, 3), rng.choice([7, 8, 9, 10, 11, 12]))
+        pickup += dt.timedelta(seconds=rng.randrange(3600))
+        if rng.random() < 0.05:
+            pickup = pickup.replace(month=3)
+        dropoff = pickup + dt.timedelta(seconds=rng.choice([30, 300, 900, 1800, 4000]))
+        src_lat, src_long = rng.choice(manhattan.zone_centers)
+        dst_lat, dst_long = rng.choice(manhattan.zone_centers)
+        if rng.random() < 0.05:
+            src_long += 0.2
+        fields = ["2", str(pickup), str(dropoff), str(rng.randint(0, 9)), "1.5",
+            repr(src_long), repr(src_lat), "1", "N", repr(dst_long), repr(dst_lat)]
+        fields += ["1"] * 8
+        if rng.random() < 0.02:
+            fields[3] = "x"
+        elif rng.random() < 0.02:
+            fields.pop()
+        lines.append(",".join(fields))
+    with open(path, 'w') as file:
+        file.write("\n".join(lines) + "\n")
+
+
+# Writes a request file for each of the days in February 2016 to request_dir, each with num
+# random requests from 08:00, and returns the directory.
+def write_request_days(request_dir, days, num, seed=0):
+    os.makedirs(request_dir, exist_ok=True)
+    for day in days:
+        offset = dt.timedelta(days=day - 1)
+        requests = [(req[0] + offset, *req[1:]) for req in make_requests(seed + day, num)]
+        requestfile.write_requests(runner.get_request_path(day, request_dir), requests)
+    return request_dir
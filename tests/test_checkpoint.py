@@ -0,0 +1,82 @@
+import pickle
+import random
+
+import pytest
+
+import taxisim
+from taxisim import checkpoint, learning
+
+np = pytest.importorskip("numpy")
+
+
+def train(tensor, rng):
+    for taxi in tensor.taxis:
+        taxi.total_dist = 1
+        taxi.weighted_dist = rng.uniform(0, 4)
+    tensor.choose_actions()
+    tensor.update()
+
+
+def assert_states_equal(state, expected):
+    assert state.keys() == expected.keys()
+    for name, values in expected.items():
+        assert np.array_equal(state[name], values)
+
+
+def test_checkpoints_restore_every_run(tmp_path):
+    random.seed(1)
+    tensor = learning.QTensor(taxisim.make_taxis(30, size=4))
+    rng = random.Random(2)
+    states = {0: {name: np.array(values) for name, values in tensor.get_state().items()}}
+    with checkpoint.Checkpointer(tmp_path, full_interval=4) as checkpointer:
+        checkpointer.save(0, tensor.get_state(), {"run": 0})
+        for run_num in range(1, 11):
+            train(tensor, rng)
+            states[run_num] = {name: np.array(v) for name, v in tensor.get_state().items()}
+            checkpointer.save(run_num, tensor.get_state(), {"run": run_num})
+
+    assert checkpoint.list_runs(tmp_path, "full") == [0, 4, 8]
+    for run_num, expected in states.items():
+        assert checkpoint.exists(tmp_path, run_num)
+        assert_states_equal(checkpoint.load(tmp_path, run_num), expected)
+    assert not checkpoint.exists(tmp_path, 11)
+    with pytest.raises(FileNotFoundError):
+        checkpoint.load(tmp_path, 11)
+
+    log = checkpoint.read_log(tmp_path)
+    assert log["run_count"] == 10
+    assert log["runs"] == {run_num: {"run": run_num} for run_num in range(11)}
+
+
+def test_checkpoint_with_new_arrays_is_written_in_full(tmp_path):
+    random.seed(3)
+    tensor = learning.QTensor(taxisim.make_taxis(10, size=4))
+    base = tensor.get_state()
+    del base["visited"]
+    with checkpoint.Checkpointer(tmp_path, base=base) as checkpointer:
+        checkpointer.save(1, tensor.get_state(), {})
+        checkpointer.save(2, tensor.get_state(), {})
+    assert checkpoint.list_runs(tmp_path, "full") == [1]
+    assert checkpoint.list_runs(tmp_path, "delta") == [2]
+
+
+def test_legacy_training_directory(tmp_path):
+    random.seed(4)
+    taxis = taxisim.make_taxis(10, size=4)
+    for taxi in taxis:
+        taxi.q_table[6][2] = 1.5
+        del taxi.leg
+    with open(tmp_path / "taxis-0012.pickle", 'wb') as file:
+        pickle.dump(taxis, file)
+
+    assert not checkpoint.exists(tmp_path, 12)
+    loaded = checkpoint.load_taxis(tmp_path, 12)
+    assert [taxi.leg for taxi in loaded] == [None] * len(taxis)
+    tensor = learning.QTensor(loaded)
+    assert loaded[0].q_table.table == {
+        1: [-1, 0, 0], 6: [0, 0, 1.5], taxisim.params.MAXSIZE: [0, 0, -1]
+    }
+
+    with checkpoint.Checkpointer(tmp_path) as checkpointer:
+        checkpointer.save(13, tensor.get_state(), {})
+    assert_states_equal(checkpoint.load(tmp_path, 13), tensor.get_state())
@@ -0,0 +1,70 @@
+import pytest
+
+from helpers import write_trips
+from taxisim import dataset, runner
+
+pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "yellow_tripdata_2016-02.csv"
+    write_trips(path, 1, 2000)
+    return str(path)
+
+
+def export(source, output_dir, cache_dir, settings=None):
+    key, _ = dataset.build(source, settings, workers=1, cache_dir=cache_dir)
+    return dataset.export([key], output_dir, cache_dir, [source])
+
+
+def test_build_reuses_cache_entries(source, tmp_path):
+    cache_dir = tmp_path / "cache"
+    key, stats = dataset.build(source, workers=1, cache_dir=cache_dir)
+    assert stats["num_requests"] > 0
+    assert dataset.build(source, workers=1, cache_dir=cache_dir) == (key, stats)
+    other_key, _ = dataset.build(source, {"end_hour": 10}, workers=1, cache_dir=cache_dir)
+    assert other_key != key
+    assert sorted(dataset.list_files(key, cache_dir)) == [
+        "2016-02-01.requests", "2016-02-02.requests", "2016-02-03.requests"
+    ]
+
+
+def test_exported_requests_are_checked_against_their_source(source, tmp_path):
+    cache_dir, output_dir = tmp_path / "cache", tmp_path / "requests"
+    assert dataset.check(output_dir, cache_dir) is not None
+    export(source, output_dir, cache_dir)
+    assert dataset.is_current(output_dir, [source], cache_dir=cache_dir)
+    assert dataset.check(output_dir, cache_dir) is None
+    assert runner.check_requests(output_dir, cache_dir)
+
+    with open(source, 'a') as file:
+        file.write("2,2016-02-01 09:00:00,2016-02-01 09:10:00,1,1.5,-73.98,40.75,1,N,"
+            "-73.97,40.76,1,1,1,1,1,1,1,1\n")
+    assert not dataset.is_current(output_dir, [source], cache_dir=cache_dir)
+    assert dataset.check(output_dir, cache_dir) is not None
+    with pytest.warns(UserWarning, match="out of date"):
+        assert not runner.check_requests(output_dir, cache_dir)
+
+    export(source, output_dir, cache_dir)
+    assert dataset.check(output_dir, cache_dir) is None
+
+
+def test_export_with_new_settings(source, tmp_path):
+    cache_dir, output_dir = tmp_path / "cache", tmp_path / "requests"
+    export(source, output_dir, cache_dir)
+    export(source, output_dir, cache_dir, {"start_hour": 9, "end_hour": 10})
+    assert dataset.check(output_dir, cache_dir) is None
+    assert not dataset.is_current(output_dir, [source], cache_dir=cache_dir)
+    assert dataset.is_current(output_dir, [source], {"start_hour": 9, "end_hour": 10}, cache_dir)
+    (output_dir / "2016-02-02.requests").unlink()
+    assert dataset.check(output_dir, cache_dir) is not None
+
+
+def test_requests_with_missing_source_only_need_their_files(source, tmp_path):
+    cache_dir, output_dir = tmp_path / "cache", tmp_path / "requests"
+    export(source, output_dir, cache_dir)
+    (tmp_path / "yellow_tripdata_2016-02.csv").unlink()
+    assert dataset.check(output_dir, cache_dir) is None
+    (output_dir / "2016-02-01.requests").unlink()
+    assert dataset.check(output_dir, cache_dir) is not None
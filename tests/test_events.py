@@ -0,0 +1,71 @@
+import datetime as dt
+import math
+
+import pytest
+
+from taxisim import params
+from helpers import make_requests, make_world, get_state, START
+
+
+@pytest.fixture
+def no_repositioning(monkeypatch):
+    monkeypatch.setattr(params, "MEAN_REPO_TIME", math.inf)
+    params.derive()
+    yield
+    monkeypatch.undo()
+    params.derive()
+
+
+# Event mode adds up a taxi's distances leg by leg rather than tick by tick, so the totals can
+# differ by rounding.
+def assert_same_state(state1, state2):
+    metrics1, taxis1, zones1, order1 = state1
+    metrics2, taxis2, zones2, order2 = state2
+    assert metrics1 == metrics2
+    assert zones1 == zones2
+    assert order1 == order2
+    for taxi1, taxi2 in zip(taxis1, taxis2):
+        assert taxi1[:6] == taxi2[:6]
+        assert taxi1[6:8] == pytest.approx(taxi2[6:8], rel=1e-9)
+        assert taxi1[8] == taxi2[8]
+
+
+@pytest.mark.parametrize("ridesharing", [False, True])
+def test_event_mode_matches_tick_mode_without_repositioning(no_repositioning, ridesharing):
+    requests = make_requests(1, 1200)
+    states = []
+    for event_driven in (False, True):
+        world = make_world(requests, ridesharing=ridesharing, event_driven=event_driven)
+        world.run()
+        states.append(get_state(world))
+    assert_same_state(*states)
+
+
+# Two bursts of requests three hours apart: every trip from the first burst is over well within
+# two hours, leaving at least an hour in which nothing happens.
+def test_event_mode_skips_quiet_ticks(no_repositioning):
+    requests = make_requests(2, 30, minutes=10)
+    later = make_requests(3, 30, minutes=10)
+    requests += [(time + dt.timedelta(hours=3), *rest) for time, *rest in later]
+    worlds = []
+    for event_driven in (False, True):
+        world = make_world(requests, event_driven=event_driven)
+        world.run()
+        worlds.append(world)
+    tick_world, event_world = worlds
+    assert_same_state(get_state(tick_world), get_state(event_world))
+    assert event_world.num_rounds <= tick_world.num_rounds - 60
+
+
+def test_event_mode_with_repositioning():
+    requests = make_requests(4, 1200)
+    states = []
+    for _ in range(2):
+        world = make_world(requests, ridesharing=True, event_driven=True)
+        world.run()
+        assert world.num_requests == world.num_dropoffs + world.num_timeouts
+        for taxi in world.taxis:
+            if taxi.leg:
+                assert taxi.position == taxi.leg.get_position(taxi.leg.travelled_steps)
+        states.append(get_state(world))
+    assert states[0] == states[1]
@@ -0,0 +1,45 @@
+import datetime as dt
+
+import pytest
+
+from helpers import make_requests, make_world, get_state, START
+
+pytest.importorskip("numpy")
+
+
+@pytest.mark.parametrize("ridesharing", [False, True])
+def test_fleet_engine_matches_tick_mode(ridesharing):
+    requests = make_requests(1, 1200)
+    states = []
+    for fleet_engine in (False, True):
+        world = make_world(requests, ridesharing=ridesharing, fleet_engine=fleet_engine)
+        world.run()
+        states.append(get_state(world))
+    assert states[0] == states[1]
+
+
+def test_fleet_engine_matches_tick_mode_when_paused():
+    requests = make_requests(2, 1000)
+    states = []
+    for fleet_engine in (False, True):
+        world = make_world(requests, ridesharing=True, fleet_engine=fleet_engine)
+        for minutes in (7, 23, 41):
+            world.run(until=START + dt.timedelta(minutes=minutes))
+            legs = [(t.leg.travelled, t.leg.travelled_steps) for t in world.taxis if t.leg]
+            states.append((get_state(world), legs))
+        world.run()
+        states.append(get_state(world))
+    assert states[:4] == states[4:]
+
+
+def test_fleet_engine_with_logging_taxis():
+    requests = make_requests(3, 1000)
+    states = []
+    for fleet_engine in (False, True):
+        world = make_world(requests, fleet_engine=fleet_engine)
+        for taxi in world.taxis[::7]:
+            taxi.logging = True
+        world.run()
+        logs = [(t.log_positions, t.log_pickups, t.log_dropoffs) for t in world.taxis[::7]]
+        states.append((get_state(world), logs))
+    assert states[0] == states[1]
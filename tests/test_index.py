@@ -0,0 +1,60 @@
+import datetime as dt
+import random
+
+import pytest
+
+import taxisim
+from helpers import make_requests, make_world, START
+from taxisim import index, params, utils
+from taxisim.world import PassengerGroup
+
+
+# Returns the taxi a scan of the world's zone lists would dispatch: the first available taxi
+# inside the instant dispatch range in zone and zone-list order, otherwise the closest available
+# taxi with ties going to the earliest in that order.
+def scan(world, pg, accept=None):
+    candidates = []
+    for zone in pg.zones:
+        for taxi in world.zones.get(zone, []):
+            if taxi.status in world.index.statuses and taxi.capacity >= pg.size:
+                dist = utils.distance(pg.src_pos, taxi.position)
+                if accept is None or accept([taxi], pg, [dist])[0]:
+                    candidates.append((dist, len(candidates), taxi))
+    for dist, _, taxi in candidates:
+        if dist < params.INSTANT_DISPATCH_RANGE:
+            return taxi
+    return min(candidates)[2] if candidates else None
+
+
+# A world part way through a morning with a mixed fleet, so the index holds taxis of every
+# status and a range of free capacities.
+@pytest.fixture(params=[False, True], ids=["no-rs", "rs"])
+def world(request):
+    world = make_world(make_requests(1, 2000), num_taxis=400, ridesharing=request.param)
+    world.add_taxis(taxisim.make_taxis(200, size=2))
+    world.add_taxis(taxisim.make_taxis(100, size=8))
+    world.run(until=START + dt.timedelta(minutes=20))
+    return world
+
+
+@pytest.mark.parametrize("direct_limit", [0, index.DIRECT_LIMIT, 10**6])
+def test_index_matches_zone_scan(world, direct_limit, monkeypatch):
+    monkeypatch.setattr(index, "DIRECT_LIMIT", direct_limit)
+    accept = world.can_share if world.ridesharing else None
+    rng = random.Random(2)
+    for src, dst in zip(make_requests(3, 300), make_requests(4, 300)):
+        pg = PassengerGroup(0, rng.randint(1, 8), src[2], dst[3])
+        assert world.index.get_closest_taxi(pg, accept) is scan(world, pg, accept)
+
+
+def test_index_holds_available_taxis(world):
+    available = {
+        taxi for taxi in world.taxis
+        if taxi.status in world.index.statuses and taxi.capacity > 0
+    }
+    assert set(world.index.locations) == available
+    for taxi, (cell, capacity, zone, status) in world.index.locations.items():
+        assert cell == world.index.get_cell(taxi.position)
+        assert (capacity, zone, status) == (taxi.capacity, taxi.zone, taxi.status)
+        assert taxi in world.index.members[zone]
+        assert taxi in world.index.cells[cell][capacity]
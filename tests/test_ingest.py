@@ -0,0 +1,80 @@
+import datetime as dt
+import os
+
+import pytest
+
+import taxisim
+from helpers import write_trips
+from taxisim import ingest, utils
+from taxisim.requestfile import RequestFile
+
+pytest.importorskip("numpy")
+
+
+# Mean speeds are summed in a different order from the reference filter.
+TOLERANCE = 1e-9
+
+
+# Filters the CSV file line by line as run_filter.py originally did. Returns the requests for
+# each day, sorted by time, and the number of requests in each pickup zone.
+def reference_filter(path):
+    requests, zones, speeds = {}, {}, []
+    with open(path, 'rb') as file:
+        file.readline()
+        for line in file:
+            record = ingest.parse_line(line.rstrip(b'\n'))
+            if record is None:
+                continue
+            pu_time, do_time, size, pu_lat, pu_long, do_lat, do_long = record
+            pickup = utils.to_datetime(pu_time)
+            if (pickup.year, pickup.month) != (2016, 2) or not 8 <= pickup.hour < 12:
+                continue
+            if not 60 <= do_time - pu_time <= 3600 or not 1 <= size <= 8:
+                continue
+            src_pos, dst_pos = (pu_lat, pu_long), (do_lat, do_long)
+            if not taxisim.in_manhattan(src_pos) or not taxisim.in_manhattan(dst_pos):
+                continue
+            requests.setdefault(pickup.day, []).append((pu_time, size, src_pos, dst_pos))
+            zone = utils.get_zone(src_pos)
+            zones[zone] = zones.get(zone, 0) + 1
+            speeds.append(taxisim.distance(src_pos, dst_pos) / (do_time - pu_time))
+    for reqlist in requests.values():
+        reqlist.sort(key=lambda req: req[0])
+    return requests, zones, sum(speeds) / len(speeds)
+
+
+@pytest.mark.parametrize("workers, chunk_size", [(1, ingest.CHUNK_SIZE), (1, 20000), (2, 50000)])
+def test_filter_csv_matches_line_by_line_filter(tmp_path, workers, chunk_size):
+    path = tmp_path / "trips.csv"
+    write_trips(path, 1, 3000)
+    requests, zones, mean_speed = reference_filter(path)
+
+    output_dir = tmp_path / "requests"
+    stats = ingest.filter_csv(path, output_dir, workers=workers, chunk_size=chunk_size)
+    assert sorted(os.listdir(output_dir)) == [f"2016-02-{day:02d}.requests" for day in sorted(requests)]
+    for day, reqlist in requests.items():
+        with RequestFile(output_dir / f"2016-02-{day:02d}.requests") as file:
+            assert list(file) == reqlist
+
+    assert stats["num_requests"] == sum(len(reqlist) for reqlist in requests.values())
+    assert stats["days"] == {day: len(reqlist) for day, reqlist in requests.items()}
+    assert stats["zones"] == zones
+    assert list(stats["zones"]) == list(zones)
+    assert stats["mean_speed"] == pytest.approx(mean_speed, rel=TOLERANCE)
+    sizes = [req[1] for reqlist in requests.values() for req in reqlist]
+    assert stats["sizes"] == {size: sizes.count(size) for size in set(sizes)}
+    assert stats["num_big_requests"] == sum(size > 4 for size in sizes)
+    assert stats["max_request_size"] == max(sizes)
+
+
+def test_parse_lines_skips_malformed_lines():
+    lines = [
+        b"2,2016-02-01 09:00:00,2016-02-01 09:10:00,1,1.5,-73.98,40.75,1,N,-73.97,40.76"
+        + b",1" * 8,
+        b"2,2016-02-01 09:05:00,2016-02-01 09:15:00,x,1.5,-73.98,40.75,1,N,-73.97,40.76"
+        + b",1" * 8,
+        b"2,2016-02-01 09:05:00,2016-02-01 09:15:00,2,1.5,-73.98,40.75",
+    ]
+    columns = ingest.parse_lines(lines, ingest.DEFAULT_SETTINGS)
+    assert columns["size"].tolist() == [1]
+    assert columns["pu_time"].tolist() == [utils.to_seconds(dt.datetime(2016, 2, 1, 9))]
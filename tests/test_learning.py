@@ -0,0 +1,219 @@
+import copy
+import random
+
+import pytest
+
+import taxisim
+from taxisim import learning, params
+
+np = pytest.importorskip("numpy")
+
+
+# The tensor updates use the same formula as Taxi.update_q_table() but NumPy may evaluate it
+# with different rounding.
+TOLERANCE = 1e-9
+
+
+# Gives each taxi a random action and reward for a run, as choose_action() and a run would.
+def take_actions(rng, taxis):
+    for taxi in taxis:
+        low = 0 if taxi.size == 1 else -1
+        high = 0 if taxi.size == params.MAXSIZE else 1
+        taxi.last_state = taxi.size
+        taxi.last_action = rng.randint(low, high)
+        taxi.size += taxi.last_action
+        taxi.total_dist = 1
+        taxi.weighted_dist = rng.uniform(0, 4)
+
+
+def test_q_tensor_update_matches_q_tables():
+    random.seed(1)
+    taxis = taxisim.make_taxis(50, size=4)
+    tensor = learning.QTensor(copy.deepcopy(taxis))
+    rng = random.Random(2)
+    for _ in range(100):
+        take_actions(rng, taxis)
+        for taxi, copied in zip(taxis, tensor.taxis):
+            copied.last_state, copied.last_action = taxi.last_state, taxi.last_action
+            copied.size, copied.weighted_dist = taxi.size, taxi.weighted_dist
+            copied.total_dist = taxi.total_dist
+            taxi.update_q_table()
+        tensor.update()
+
+    for taxi, copied in zip(taxis, tensor.taxis):
+        table = copied.q_table.table
+        assert table.keys() == taxi.q_table.table.keys()
+        for state, qvals in taxi.q_table.table.items():
+            assert table[state] == pytest.approx(qvals, abs=TOLERANCE)
+
+
+def test_q_table_view_only_lists_visited_states():
+    taxis = taxisim.make_taxis(3, size=4)
+    tensor = learning.QTensor(taxis)
+    assert taxis[0].q_table.table.keys() == {1, params.MAXSIZE}
+    taxis[0].q_table[5][1] = 2.5
+    assert taxis[0].q_table.table == {
+        1: [-1, 0, 0], 5: [0, 2.5, 0], params.MAXSIZE: [0, 0, -1]
+    }
+    assert taxis[1].q_table.table.keys() == {1, params.MAXSIZE}
+
+    for taxi in taxis:
+        taxi.p_explore = 0
+    tensor.choose_actions()
+    assert all(4 in taxi.q_table.table for taxi in taxis)
+
+
+def test_q_tensor_state_round_trip():
+    random.seed(3)
+    taxis = taxisim.make_taxis(20, size=4)
+    tensor = learning.QTensor(taxis)
+    rng = random.Random(4)
+    for _ in range(10):
+        take_actions(rng, taxis)
+        tensor.update()
+
+    restored = learning.QTensor.from_state(tensor.get_state())
+    for taxi, copied in zip(taxis, restored.taxis):
+        assert copied.q_table.table == taxi.q_table.table
+        assert (copied.id, copied.size, copied.last_action) == (
+            taxi.id, taxi.size, taxi.last_action
+        )
+
+    # Older states have no record of visited states.
+    state = tensor.get_state()
+    del state["visited"]
+    restored = learning.QTensor.from_state(state)
+    expected = (tensor.values != 0).any(axis=2)
+    expected[:, [0, params.MAXSIZE - 1]] = True
+    assert np.array_equal(restored.visited, expected)
+
+
+def test_s_tensor_update_matches_s_tables():
+    random.seed(5)
+    taxis = taxisim.make_taxis(50, size=4)
+    tensor = learning.STensor(copy.deepcopy(taxis))
+    rng = random.Random(6)
+    for _ in range(50):
+        tensor.assign_random_sizes()
+        for taxi, copied in zip(taxis, tensor.taxis):
+            taxi.size = copied.size
+            taxi.total_dist = copied.total_dist = 1
+            taxi.weighted_dist = copied.weighted_dist = rng.uniform(0, 4)
+            taxi.update_s_table()
+        tensor.update()
+
+    for taxi, copied in zip(taxis, tensor.taxis):
+        table = copied.s_table.table
+        assert list(table) == list(taxi.s_table.table)
+        for state, (n, sval) in taxi.s_table.table.items():
+            assert table[state][0] == n
+            assert table[state][1] == pytest.approx(sval, abs=TOLERANCE)
+
+
+
+# The best size as run_s_training.py picked it from an STable: the first size in the table with
+# the highest positive value.
+def get_best_size(s_table):
+    max_sval, best_size = 0, 0
+    for size, (_, sval) in s_table.items():
+        if sval > max_sval:
+            max_sval = sval
+            best_size = size
+    return best_size
+
+
+def test_s_tensor_best_sizes_break_ties_like_s_tables():
+    random.seed(7)
+    taxis = taxisim.make_taxis(200, size=4)
+    tensor = learning.STensor(copy.deepcopy(taxis))
+    rng = random.Random(8)
+    for _ in range(6):
+        tensor.assign_random_sizes()
+        for taxi, copied in zip(taxis, tensor.taxis):
+            taxi.size = copied.size
+            taxi.total_dist = copied.total_dist = 1
+            # Few distinct rewards so that many sizes tie.
+            taxi.weighted_dist = copied.weighted_dist = rng.choice([0, 1, 1, 2])
+            taxi.update_s_table()
+        tensor.update()
+
+    expected = [get_best_size(taxi.s_table) for taxi in taxis]
+    assert len(set(expected)) > 2
+    assert tensor.get_best_sizes().tolist() == expected
+    restored = learning.STensor.from_state(tensor.get_state())
+    assert restored.get_best_sizes().tolist() == expected
+    assert [list(taxi.s_table.table) for taxi in restored.taxis] == [
+        list(taxi.s_table.table) for taxi in taxis
+    ]
+
+    # States saved without a sample order break ties by size.
+    state = tensor.get_state()
+    del state["s_order"]
+    restored = learning.STensor.from_state(state)
+    assert restored.get_best_sizes().tolist() == [
+        get_best_size(dict(sorted(taxi.s_table.items()))) for taxi in taxis
+    ]
+
+def test_convergence_monitor_plateau():
+    monitor = learning.ConvergenceMonitor(window=5, size_tol=0.1)
+    rng = np.random.default_rng(7)
+    sizes = np.full(20, 4)
+    values = rng.random((20, params.MAXSIZE, 3))
+    policy = values.argmax(axis=2)
+    assert monitor.update(sizes, values, policy) is None
+
+    # One taxi in twenty changing size is within tolerance; three are not.
+    changes = monitor.update(np.where(np.arange(20) == 0, 5, 4), values, policy)
+    assert changes == {"size_change": 0.05, "value_change": 0, "policy_flips": 0}
+    for _ in range(3):
+        monitor.update(sizes, values, policy)
+    assert not monitor.converged
+    monitor.update(sizes, values, policy)
+    assert monitor.converged
+
+    # A change outside any one tolerance, and the change back, hold off convergence for a
+    # whole window.
+    changed = [
+        (np.where(np.arange(20) < 3, 5, 4), values, policy),
+        (sizes, values + 0.001, policy),
+        (sizes, values, np.where(np.arange(20)[:, None] == 0, policy + 1, policy)),
+    ]
+    for name, state in zip(["size_change", "value_change", "policy_flips"], changed):
+        assert monitor.update(*state)[name] > monitor.tolerances[name]
+        assert monitor.update(sizes, values, policy)[name] > monitor.tolerances[name]
+        for _ in range(5):
+            assert not monitor.converged
+            monitor.update(sizes, values, policy)
+        assert monitor.converged
+
+    monitor.reset()
+    assert not monitor.converged
+    assert monitor.update(sizes, values, policy) is None
+
+
+# The Q-learning scripts start decaying exploration the first time the policy is stable, reset
+# the monitor on every run while exploration decays and stop training once it's stable again.
+def test_convergence_monitor_reset_when_decay_starts():
+    monitor = learning.ConvergenceMonitor(window=3)
+    sizes = np.full(10, 4)
+    values = np.zeros((10, params.MAXSIZE, 3))
+    policy = np.ones((10, params.MAXSIZE), dtype=int)
+    p_explore, decay_start, stopped = 1, None, None
+    for run_num in range(1, 30):
+        if decay_start and p_explore > 0:
+            p_explore = max(p_explore - 0.25, 0)
+        monitor.update(sizes, values, policy)
+        if 0 < p_explore < 1:
+            monitor.reset()
+        if monitor.converged and p_explore == 1:
+            decay_start = run_num
+            monitor.reset()
+            assert not monitor.converged
+        elif monitor.converged:
+            stopped = run_num
+            break
+
+    # Stable from the start, so decay starts after 1 + 3 runs and takes 4 more runs. The
+    # monitor then needs 1 + 3 runs at p_explore = 0, the first of which is the last decay run.
+    assert decay_start == 4
+    assert stopped == decay_start + 4 + 3
@@ -0,0 +1,63 @@
+import math
+import random
+
+import pytest
+
+from taxisim import manhattan, utils
+from taxisim.manhattan import Raster
+
+
+def in_boxes(pos, boxes):
+    return any(utils.in_box(pos, box) for box in boxes)
+
+
+# Random points over and around the boxes, plus points on every box edge and corner and the
+# nearest floats either side of them.
+def get_points(rng, boxes, num):
+    min_lat = min(box[0][0] for box in boxes) - 0.01
+    max_lat = max(box[1][0] for box in boxes) + 0.01
+    min_long = min(box[0][1] for box in boxes) - 0.01
+    max_long = max(box[1][1] for box in boxes) + 0.01
+    points = [
+        (rng.uniform(min_lat, max_lat), rng.uniform(min_long, max_long)) for _ in range(num)
+    ]
+    for (bl_lat, bl_long), (tr_lat, tr_long) in boxes:
+        for lat in (bl_lat, tr_lat):
+            for long in (bl_long, tr_long, rng.uniform(bl_long, tr_long)):
+                for dlat in (-math.inf, 0, math.inf):
+                    for dlong in (-math.inf, 0, math.inf):
+                        points.append((math.nextafter(lat, lat + dlat) if dlat else lat,
+                            math.nextafter(long, long + dlong) if dlong else long))
+        for long in (bl_long, tr_long):
+            lat = rng.uniform(bl_lat, tr_lat)
+            points.extend((lat, math.nextafter(long, d)) for d in (-math.inf, math.inf))
+    return points
+
+
+def random_boxes(rng, num):
+    boxes = []
+    for _ in range(num):
+        lat, long = rng.uniform(40.70, 40.85), rng.uniform(-74.02, -73.92)
+        boxes.append(((lat, long), (lat + rng.uniform(0, 0.03), long + rng.uniform(0, 0.03))))
+    return boxes
+
+
+@pytest.mark.parametrize("resolution", [0.01, manhattan.RASTER_RESOLUTION, 0.0003])
+def test_raster_matches_box_test(resolution):
+    rng = random.Random(1)
+    for boxes in (manhattan.bounding_boxes, random_boxes(rng, 10)):
+        raster = Raster(boxes, resolution)
+        points = get_points(rng, boxes, 20000)
+        expected = [in_boxes(pos, boxes) for pos in points]
+        assert [raster.contains(pos) for pos in points] == expected
+
+
+def test_raster_arrays_match_box_test():
+    np = pytest.importorskip("numpy")
+    rng = random.Random(2)
+    points = get_points(rng, manhattan.bounding_boxes, 20000)
+    lats = np.array([pos[0] for pos in points])
+    longs = np.array([pos[1] for pos in points])
+    expected = [in_boxes(pos, manhattan.bounding_boxes) for pos in points]
+    assert manhattan.in_manhattan_arrays(lats, longs).tolist() == expected
+    assert [manhattan.in_manhattan(pos) for pos in points] == expected
@@ -0,0 +1,64 @@
+import pickle
+
+import pytest
+
+from helpers import make_requests, make_world, get_state
+from taxisim import runner, utils
+from taxisim.requestfile import RequestFile, RequestCursor, write_requests
+
+
+def test_request_file_round_trip(tmp_path):
+    requests = make_requests(1, 500)
+    path = tmp_path / "requests.requests"
+    write_requests(path, requests)
+    expected = utils.convert_requests(requests)
+    with RequestFile(path) as requests:
+        assert len(requests) == len(expected)
+        assert list(requests) == expected
+        assert requests[-1] == expected[-1]
+        assert list(RequestCursor(requests, 123)) == expected[123:]
+        with pytest.raises(IndexError):
+            requests[len(expected)]
+
+
+def test_request_file_arrays(tmp_path):
+    np = pytest.importorskip("numpy")
+    requests = utils.convert_requests(make_requests(2, 200))
+    path = tmp_path / "requests.requests"
+    write_requests(path, requests)
+    with RequestFile(path) as file:
+        arrays = file.arrays()
+        assert (arrays["time"] + file.base_time).tolist() == [req[0] for req in requests]
+        assert arrays["size"].tolist() == [req[1] for req in requests]
+        assert np.array_equal(arrays["src_lat"], [req[2][0] for req in requests])
+        assert np.array_equal(arrays["dst_long"], [req[3][1] for req in requests])
+        del arrays
+
+
+def test_request_file_run_matches_request_list(tmp_path):
+    requests = make_requests(3, 800)
+    path = tmp_path / "requests.requests"
+    write_requests(path, requests)
+    world = make_world(requests)
+    world.run()
+    expected = get_state(world)
+    with RequestFile(path) as file:
+        world = make_world(file)
+        world.run()
+    assert get_state(world) == expected
+
+
+def test_pickled_day_is_converted_on_first_use(tmp_path):
+    requests = make_requests(4, 300)
+    with open(runner.get_pickle_path(3, tmp_path), 'wb') as file:
+        pickle.dump(requests, file)
+    assert runner.get_available_days(1, 5, tmp_path) == [3]
+    assert not (tmp_path / "2016-02-03.requests").exists()
+    with runner.open_requests(3, tmp_path) as file:
+        assert list(file) == utils.convert_requests(requests)
+    assert (tmp_path / "2016-02-03.requests").exists()
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "2016-02-03.pickle", "2016-02-03.requests"
+    ]
+    with pytest.raises(FileNotFoundError):
+        runner.open_requests(4, tmp_path)
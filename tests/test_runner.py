@@ -0,0 +1,35 @@
+import pytest
+
+from helpers import write_request_days
+from taxisim import params, runner
+
+
+DAYS = [1, 2, 3]
+FLEET = {4: 200, 6: 50}
+
+
+@pytest.fixture
+def request_dir(tmp_path):
+    return write_request_days(tmp_path, DAYS, 300)
+
+
+# Each day's metrics depend only on the seed and the day, not on how days are spread across
+# workers or the order in which they complete.
+@pytest.mark.parametrize("ridesharing", [False, True])
+def test_results_do_not_depend_on_workers(request_dir, ridesharing):
+    results = [
+        runner.run_days(DAYS, FLEET, ridesharing, seed=3, workers=workers,
+            request_dir=request_dir)
+        for workers in (1, 2)
+    ]
+    assert list(results[0]) == DAYS
+    assert results[0] == results[1]
+    assert runner.run_days(DAYS[::-1], FLEET, ridesharing, seed=3, workers=1,
+        request_dir=request_dir) == results[0]
+
+
+def test_run_day_params_apply_to_one_run(request_dir):
+    metrics = runner.run_day(1, FLEET, params={"TIMEOUT": 3}, request_dir=request_dir)
+    assert params.TIMEOUT == 10 and params.INSTANT_DISPATCH_RANGE == pytest.approx(201.426)
+    assert metrics != runner.run_day(1, FLEET, request_dir=request_dir)
+    assert metrics == runner.run_day(1, FLEET, params={"TIMEOUT": 3}, request_dir=request_dir)
@@ -0,0 +1,96 @@
+import random
+
+import pytest
+
+from helpers import make_requests, make_world, get_state, write_request_days
+from taxisim import search, utils
+
+
+def test_max_timeouts_is_the_last_count_that_can_meet_the_threshold():
+    rng = random.Random(1)
+    for _ in range(200):
+        sizes = [rng.randint(1, 8) for _ in range(rng.randint(1, 3000))]
+        max_requests = sum(search.get_max_groups(size) for size in sizes)
+        max_timeouts = search.get_max_timeouts(sizes)
+        assert 100 * max_timeouts / max_requests <= search.MAX_TIMEOUT_PERCENT
+        assert 100 * (max_timeouts + 1) / max_requests > search.MAX_TIMEOUT_PERCENT
+
+
+def test_splitting_never_exceeds_max_groups():
+    requests = make_requests(2, 1500)
+    world = make_world(requests, num_taxis=100, ridesharing=True)
+    world.run()
+    assert world.num_requests > len(requests)
+    assert world.num_requests <= sum(search.get_max_groups(req[1]) for req in requests)
+
+
+def test_abort_only_fires_once_the_threshold_is_missed():
+    requests = make_requests(3, 1500)
+    world = make_world(requests, num_taxis=100)
+    world.run()
+    expected = get_state(world)
+    num_timeouts = world.num_timeouts
+    assert num_timeouts > 10
+
+    world = make_world(requests, num_taxis=100)
+    world.run(max_timeouts=num_timeouts)
+    assert not world.aborted
+    assert get_state(world) == expected
+
+    world = make_world(requests, num_taxis=100)
+    world.run(max_timeouts=num_timeouts - 1)
+    assert world.aborted
+    assert world.num_timeouts >= num_timeouts
+
+
+# An aborted run stops with its metrics as they stood, i.e. as a run paused at the same tick.
+def test_aborted_run_reports_partial_metrics():
+    requests = make_requests(4, 1500)
+    aborted = make_world(requests, num_taxis=100)
+    aborted.run(max_timeouts=5)
+    assert aborted.aborted and aborted.num_requests > aborted.num_dropoffs + 5
+    paused = make_world(requests, num_taxis=100)
+    paused.run(until=utils.to_datetime(aborted.clock))
+    assert get_state(aborted) == get_state(paused)
+
+
+def test_aborted_day_reports_its_metrics(tmp_path):
+    request_dir = write_request_days(tmp_path, [1], 1000)
+    passed, metrics = search.run_candidate(20, [1], request_dir=request_dir)
+    assert not passed
+    assert metrics[1]["aborted"]
+    assert metrics[1]["timeouts"] > search.MAX_TIMEOUT_PERCENT
+    assert metrics[1]["wait_time"] > 0
+
+
+# Runs a fake candidate that passes from a fixed fleet size upwards.
+def fake_candidate(boundary, runs):
+    def run_candidate(num_taxis, days, ridesharing=False, **kwargs):
+        runs.append(num_taxis)
+        return num_taxis >= boundary, {}
+    return run_candidate
+
+
+@pytest.mark.parametrize("boundary", [1, 37, 400, 999, 1000, 1001, 1049, 5321])
+@pytest.mark.parametrize("start_taxis, resolution", [(1000, 50), (10, 1), (300, 7)])
+def test_search_finds_the_boundary(monkeypatch, boundary, start_taxis, resolution):
+    runs = []
+    monkeypatch.setattr(search, "run_candidate", fake_candidate(boundary, runs))
+    result = search.find_fleet_size([1], start_taxis=start_taxis, resolution=resolution)
+    assert boundary <= result < boundary + resolution
+    assert len(runs) == len(set(runs))
+
+
+# The search lands on the same boundary as a linear scan of real runs, to within the resolution.
+# The test requests are spread evenly over Manhattan so the thresholds are relaxed to levels a
+# few hundred taxis can meet.
+def test_search_matches_linear_scan(tmp_path, monkeypatch):
+    monkeypatch.setattr(search, "MAX_TIMEOUT_PERCENT", 25)
+    monkeypatch.setattr(search, "MAX_WAIT_TIME", 10)
+    request_dir = write_request_days(tmp_path, [1, 2], 300)
+    days = [1, 2]
+    scan = 100
+    while not search.run_candidate(scan, days, request_dir=request_dir)[0]:
+        scan += 10
+    result = search.find_fleet_size(days, start_taxis=100, resolution=10, request_dir=request_dir)
+    assert scan - 10 < result <= scan
@@ -0,0 +1,48 @@
+import datetime as dt
+
+import pytest
+
+from helpers import make_requests, make_world, get_state, START
+from taxisim import snapshot
+from taxisim.requestfile import RequestFile, write_requests
+
+
+PAUSE = START + dt.timedelta(minutes=25)
+
+
+@pytest.mark.parametrize("settings", [
+    {},
+    {"ridesharing": True},
+    {"ridesharing": True, "event_driven": True},
+], ids=["no-rs", "rs", "rs-events"])
+def test_restored_world_continues_as_the_original(settings):
+    world = make_world(make_requests(1, 1000), **settings)
+    world.run(until=PAUSE)
+    data = snapshot.dumps(world)
+    world.run()
+
+    restored = snapshot.loads(data)
+    restored.run()
+    assert get_state(restored) == get_state(world)
+
+
+def test_snapshot_keeps_request_file_position(tmp_path):
+    path = tmp_path / "requests.requests"
+    write_requests(path, make_requests(2, 1000))
+    with RequestFile(path) as requests:
+        world = make_world(requests, ridesharing=True)
+        world.run(until=PAUSE)
+        data = snapshot.dumps(world)
+        world.run()
+        restored = snapshot.loads(data)
+        restored.run()
+    assert get_state(restored) == get_state(world)
+
+
+def test_forks_with_the_same_seed_agree():
+    world = make_world(make_requests(3, 1000), ridesharing=True)
+    world.run(until=PAUSE)
+    data = snapshot.dumps(world)
+    variants = [{"seed": 1}, {"seed": 2}, {"seed": 1}]
+    metrics = dict(snapshot.iter_forks(data, variants, workers=1))
+    assert metrics[0] == metrics[2]
@@ -0,0 +1,60 @@
+import csv
+
+import pytest
+
+from helpers import write_request_days
+from taxisim import params, runner, sweep
+
+
+GRID = {"num_taxis": [150, 300], "TIMEOUT": [10, 5]}
+DAYS = [1, 2]
+
+
+@pytest.fixture
+def request_dir(tmp_path):
+    return write_request_days(tmp_path / "requests", DAYS, 400)
+
+
+def run(grid, store, request_dir, workers):
+    results = sweep.run_sweep(grid, DAYS, store, workers=workers, request_dir=request_dir)
+    return {(tuple(config.items()), day): metrics for config, day, metrics in results}
+
+
+def test_sweep_results_match_single_runs(tmp_path, request_dir):
+    results = run(GRID, sweep.ResultStore(tmp_path / "one.csv", GRID), request_dir, 1)
+    assert len(results) == 8
+    assert run(GRID, sweep.ResultStore(tmp_path / "two.csv", GRID), request_dir, 2) == results
+    for (config, day), metrics in results.items():
+        fleet, ridesharing, values = sweep.get_run_args(dict(config))
+        expected = runner.run_day(day, fleet, ridesharing, params=values, request_dir=request_dir)
+        assert metrics == expected
+    assert params.TIMEOUT == 10
+
+
+def test_sweep_resumes_from_store(tmp_path, request_dir):
+    path = tmp_path / "results.csv"
+    results = sweep.run_sweep(GRID, DAYS, sweep.ResultStore(path, GRID), workers=1,
+        request_dir=request_dir)
+    first = [next(results)[:2] for _ in range(3)]
+    results.close()
+
+    store = sweep.ResultStore(path, GRID)
+    rest = [result[:2] for result in sweep.run_sweep(GRID, DAYS, store, workers=1,
+        request_dir=request_dir)]
+    assert len(rest) == 5
+    assert not any(result in first for result in rest)
+    with open(path, newline='') as file:
+        rows = list(csv.DictReader(file))
+    assert len(rows) == 8
+    assert len({(row["num_taxis"], row["TIMEOUT"], row["day"]) for row in rows}) == 8
+
+
+@pytest.mark.parametrize("name", params.DERIVED)
+def test_derived_params_are_rejected(name):
+    with pytest.raises(ValueError):
+        sweep.get_configs({"num_taxis": [100], name: [1]})
+    with pytest.raises(ValueError):
+        with runner.override_params({name: 1}):
+            pass
+    with pytest.raises(ValueError):
+        sweep.get_configs({"num_taxis": [100], "TIMOUT": [1]})
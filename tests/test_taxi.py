@@ -0,0 +1,39 @@
+import random
+
+from taxisim import manhattan, utils
+from taxisim.taxi import Leg
+
+
+# Returns random legs between zone centers, legs that start or end exactly on a zone boundary,
+# and legs that run along or just beside a boundary where rounding decides the zone.
+def get_legs(seed, num):
+    rng = random.Random(seed)
+    legs = []
+    for _ in range(num):
+        (lat1, long1), (lat2, long2) = rng.sample(manhattan.zone_centers, 2)
+        boundary = rng.choice([lat1, lat2]) // 0.01 / 100
+        edge = rng.choice([0, 1e-12, -1e-12, 1e-15, -1e-15])
+        legs += [
+            Leg((lat1 + rng.uniform(-0.005, 0.005), long1), (lat2, long2)),
+            Leg((boundary, long1), (lat2, round(long2, 2))),
+            Leg((boundary + edge, long1), (boundary + edge, long2)),
+            Leg((lat1, round(long1, 2) + edge), (lat2, round(long1, 2) + edge)),
+        ]
+    return legs
+
+
+def test_leg_zones_match_positions():
+    for leg in get_legs(1, 300):
+        for step in range(leg.steps + 2):
+            assert leg.get_zone(step) == utils.get_zone(leg.get_position(step))
+
+
+def test_leg_zones_match_positions_out_of_order():
+    rng = random.Random(2)
+    for leg in get_legs(3, 100):
+        for _ in range(20):
+            step = rng.randint(0, leg.steps)
+            assert leg.get_zone(step) == utils.get_zone(leg.get_position(step))
+            next_step = leg.get_next_crossing(step)
+            for between in range(step, next_step):
+                assert utils.get_zone(leg.get_position(between)) == leg.get_zone(step)
@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+import taxisim
+from helpers import write_request_days
+from taxisim import learning, training
+
+np = pytest.importorskip("numpy")
+
+
+def make_tensor():
+    random.seed(1)
+    return learning.QTensor(taxisim.make_taxis(40, size=4))
+
+
+def test_population_updates_shared_values_in_run_order(tmp_path):
+    request_dir = write_request_days(tmp_path, [1, 2], 300)
+    tensor = make_tensor()
+    trainer = training.PopulationTrainer.from_tensor(
+        tensor, 3, [1, 2], seed=5, workers=1, request_dir=request_dir
+    )
+    replicas = [learning.QTensor.from_state(r.get_state()) for r in trainer.replicas]
+    for replica in replicas[1:]:
+        replica.values, replica.visited = replicas[0].values, replicas[0].visited
+    for index, replica in enumerate(trainer.replicas):
+        replica.rng = np.random.default_rng(index)
+    with trainer:
+        log = trainer.run_round(4)
+    assert [run_num for run_num, stats in log] == [5, 6, 7]
+    assert [stats["day"] for run_num, stats in log] == [1, 2, 1]
+
+    # Replay the round one run at a time, then apply the rewards to copies of the Q-values in
+    # run order and in reverse.
+    for index, replica in enumerate(replicas):
+        replica.rng = np.random.default_rng(index)
+        replica.choose_actions()
+    chosen = replicas[0].values.copy(), replicas[0].visited.copy()
+    results = []
+    for run_num, replica in zip([5, 6, 7], replicas):
+        sizes = [taxi.size for taxi in replica.taxis]
+        day = training.get_run_day([1, 2], run_num)
+        seed = training.get_run_seed(5, run_num)
+        results.append(training.run_episode(day, sizes, False, seed, request_dir=request_dir))
+    assert [stats for rewards, stats in results] == [stats for run_num, stats in log]
+
+    def apply(order):
+        values, visited = chosen[0].copy(), chosen[1].copy()
+        for index in order:
+            replica = replicas[index]
+            replica.values, replica.visited = values, visited
+            replica.update(results[index][0])
+        return values
+
+    expected = apply([0, 1, 2])
+    assert np.array_equal(trainer.values, expected)
+    assert all(replica.values is trainer.values for replica in trainer.replicas)
+    assert not np.array_equal(apply([2, 1, 0]), expected)
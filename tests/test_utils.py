@@ -0,0 +1,65 @@
+import math
+import random
+
+import pytest
+
+from taxisim import utils
+
+
+def random_positions(rng, num):
+    return [(40.70 + 0.17 * rng.random(), -74.02 + 0.11 * rng.random()) for _ in range(num)]
+
+
+@pytest.fixture(params=["spherical", "planar"])
+def geometry(request):
+    utils.set_geometry(request.param)
+    yield request.param
+    utils.set_geometry("spherical")
+
+
+# Sizes either side of MIN_BATCH so both the pure-Python and NumPy paths are covered.
+@pytest.mark.parametrize("num", [5, 200])
+def test_distances_match_distance(geometry, num):
+    rng = random.Random(1)
+    pos = random_positions(rng, 1)[0]
+    positions = random_positions(rng, num) + [pos]
+    expected = [utils.distance(pos, other) for other in positions]
+    assert utils.distances(pos, positions) == expected
+
+
+@pytest.mark.parametrize("num", [5, 200])
+def test_pairwise_distances_match_distance(geometry, num):
+    rng = random.Random(2)
+    positions_1 = random_positions(rng, num)
+    positions_2 = random_positions(rng, num)
+    expected = [utils.distance(pos1, pos2) for pos1, pos2 in zip(positions_1, positions_2)]
+    result = utils.pairwise_distances(positions_1, positions_2)
+    assert result == expected
+
+
+@pytest.mark.parametrize("num", [3, 50])
+def test_path_distances_match_total_distance(geometry, num):
+    rng = random.Random(3)
+    paths = [random_positions(rng, rng.randint(2, 6)) for _ in range(num)]
+    expected = [utils.total_distance(*path) for path in paths]
+    assert utils.path_distances(paths) == expected
+
+
+def test_distance_arrays_matches_distance(geometry):
+    pytest.importorskip("numpy")
+    rng = random.Random(4)
+    positions_1 = random_positions(rng, 1000)
+    positions_2 = random_positions(rng, 1000)
+    lat_1, long_1 = utils.to_arrays(positions_1)
+    lat_2, long_2 = utils.to_arrays(positions_2)
+    result = utils.distance_arrays(lat_1, long_1, lat_2, long_2)
+    expected = [utils.distance(p1, p2) for p1, p2 in zip(positions_1, positions_2)]
+    assert result.tolist() == expected
+
+
+# The element-by-element fallback for NumPy functions that differ from the math module's.
+def test_distance_arrays_with_elementwise_functions(monkeypatch):
+    pytest.importorskip("numpy")
+    functions = [utils.get_elementwise(func) for func in (math.sin, math.cos, math.atan2)]
+    monkeypatch.setattr(utils, "exact_functions", functions)
+    test_distance_arrays_matches_distance("spherical")
@@ -0,0 +1,55 @@
+import math
+
+import pytest
+
+import taxisim
+from taxisim import params, utils
+from taxisim.taxi import Status
+from helpers import make_requests, make_world
+
+
+def test_active_taxis_stay_in_master_list_order():
+    world = make_world(make_requests(1, 400, minutes=30), num_taxis=100)
+    for _ in range(60):
+        world.tick()
+        expected = [index for index, taxi in enumerate(world.taxis) if taxi.tasks]
+        assert world.active == expected
+        assert world.is_active == [bool(taxi.tasks) for taxi in world.taxis]
+
+
+def test_dispatch_cancels_pending_wake_up(monkeypatch):
+    monkeypatch.setattr(utils, "geometric", lambda p: 5)
+    world = make_world(make_requests(1, 1, minutes=1, max_size=1), num_taxis=3)
+    world.tick()
+    [index] = world.active
+    assert world.taxis[index].status == Status.pickup
+    assert world.wake_up_ticks[index] is None
+    assert (6, index) in world.wake_ups
+
+    # The stale wake-up is skipped while the other taxis start repositioning.
+    for _ in range(5):
+        world.tick()
+    assert world.taxis[index].status != Status.repositioning
+    others = [taxi for i, taxi in enumerate(world.taxis) if i != index]
+    assert [taxi.status for taxi in others] == [Status.repositioning] * 2
+    assert world.active == [0, 1, 2]
+
+
+def test_taxis_never_wake_without_repositioning(monkeypatch):
+    monkeypatch.setattr(params, "MEAN_REPO_TIME", math.inf)
+    params.derive()
+    try:
+        assert params.REPO_PROB == 0
+
+        def start_repositioning(self):
+            raise AssertionError("idle taxi woke up")
+
+        monkeypatch.setattr(taxisim.Taxi, "start_repositioning", start_repositioning)
+        world = make_world(make_requests(3, 200, minutes=20), num_taxis=50)
+        world.run()
+        assert world.num_dropoffs > 0
+        assert world.wake_ups == []
+        assert world.wake_up_ticks == [None] * len(world.taxis)
+    finally:
+        monkeypatch.undo()
+        params.derive()